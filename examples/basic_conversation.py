@@ -27,8 +27,17 @@ def main():
     # Conversation loop
     while True:
         try:
-            # Get user input
-            user_input = input("You: ").strip()
+            # Get user input (readline so piped stdin works for scripted runs)
+            sys.stdout.write("You: ")
+            sys.stdout.flush()
+            line = sys.stdin.readline()
+            
+            if not line:
+                # EOF on stdin
+                print("\nAssistant: Goodbye!")
+                break
+            
+            user_input = line.strip()
             
             if not user_input:
                 continue
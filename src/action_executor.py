@@ -4,7 +4,12 @@ Handles execution of commands extracted from NLU responses
 """
 
 import asyncio
-from typing import Dict, Any, List, Callable, Optional
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, List, Callable, Mapping, Optional, Tuple
 
 from src.utils.logging import get_logger
 from src.utils.config import Config
@@ -33,8 +38,17 @@ class ActionExecutor:
         """
         self.config = config
         
-        # Action handlers registry
-        self.handlers: Dict[str, Callable] = {}
+        # Action handler registry; dispatch entries resolved at registration:
+        # (handler, is_coro, is_fast)
+        self._dispatch: Dict[str, Tuple[Callable, bool, bool]] = {}
+        
+        # Action type -> handler, kept in step with _dispatch for the
+        # read-only handlers view
+        self._handlers: Dict[str, Callable] = {}
+        self._handlers_view: Mapping[str, Callable] = MappingProxyType(self._handlers)
+        
+        # Small dedicated pool for blocking sync handlers (created on first use)
+        self._executor: Optional[ThreadPoolExecutor] = None
         
         # Register default handlers
         self._register_default_handlers()
@@ -43,23 +57,46 @@ class ActionExecutor:
     
     def _register_default_handlers(self):
         """Register default action handlers"""
-        self.register_handler("smart_home", self._handle_smart_home)
-        self.register_handler("information", self._handle_information)
-        self.register_handler("reminder", self._handle_reminder)
-        self.register_handler("media", self._handle_media)
-        self.register_handler("communication", self._handle_communication)
-        self.register_handler("search", self._handle_search)
+        defaults = {
+            "smart_home": self._handle_smart_home,
+            "information": self._handle_information,
+            "reminder": self._handle_reminder,
+            "media": self._handle_media,
+            "communication": self._handle_communication,
+            "search": self._handle_search,
+        }
+        
+        # Built-in handlers are all fast, synchronous functions
+        self._dispatch.update(
+            (action_type, (handler, False, True))
+            for action_type, handler in defaults.items()
+        )
+        self._handlers.update(defaults)
+        
+        logger.info("Registered %d default handlers", len(defaults))
     
-    def register_handler(self, action_type: str, handler: Callable):
+    @property
+    def handlers(self) -> Mapping[str, Callable]:
+        """Read-only mapping of action type to handler; use register_handler to change it"""
+        return self._handlers_view
+    
+    def register_handler(self, action_type: str, handler: Callable, fast: bool = False):
         """
         Register an action handler
         
         Args:
             action_type: Type of action
             handler: Handler function (async or sync)
+            fast: Sync handler is quick and non-blocking; run it inline on
+                the event loop instead of in a worker thread
         """
-        self.handlers[action_type] = handler
-        logger.info(f"Registered handler for action type: {action_type}")
+        self._dispatch[action_type] = (
+            handler,
+            asyncio.iscoroutinefunction(handler),
+            fast
+        )
+        self._handlers[action_type] = handler
+        logger.info("Registered handler for action type: %s", action_type)
     
     def execute(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -72,57 +109,93 @@ class ActionExecutor:
             Result dictionary
         """
         action_type = action.get("action_type")
-        parameters = action.get("parameters", {})
-        
         if not action_type:
             return {"success": False, "error": "No action_type specified"}
         
-        handler = self.handlers.get(action_type)
-        if not handler:
-            logger.warning(f"No handler for action type: {action_type}")
+        try:
+            handler = self._dispatch[action_type][0]
+        except KeyError:
+            logger.warning("No handler for action type: %s", action_type)
             return {
                 "success": False,
                 "error": f"Unknown action type: {action_type}"
             }
         
+        parameters = action.get("parameters", {})
+        
         try:
-            logger.info(f"Executing action: {action_type} with params: {parameters}")
+            logger.info("Executing action: %s with params: %s", action_type, parameters)
             result = handler(parameters)
             return {"success": True, "result": result, "action_type": action_type}
         except Exception as e:
-            logger.error(f"Action execution error: {e}", exc_info=True)
+            logger.error("Action execution error: %s", e)
+            logger.debug("Action execution error traceback", exc_info=True)
             return {"success": False, "error": str(e), "action_type": action_type}
     
     async def execute_async(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """Async version of execute"""
         action_type = action.get("action_type")
-        parameters = action.get("parameters", {})
-        
         if not action_type:
             return {"success": False, "error": "No action_type specified"}
         
-        handler = self.handlers.get(action_type)
-        if not handler:
-            logger.warning(f"No handler for action type: {action_type}")
+        try:
+            handler, is_coro, is_fast = self._dispatch[action_type]
+        except KeyError:
+            logger.warning("No handler for action type: %s", action_type)
             return {
                 "success": False,
                 "error": f"Unknown action type: {action_type}"
             }
         
+        parameters = action.get("parameters", {})
+        
         try:
-            logger.info(f"Executing action: {action_type} with params: {parameters}")
+            logger.info("Executing action: %s with params: %s", action_type, parameters)
             
-            # Check if handler is async
-            if asyncio.iscoroutinefunction(handler):
+            if is_coro:
                 result = await handler(parameters)
+            elif is_fast:
+                result = handler(parameters)
             else:
-                result = await asyncio.to_thread(handler, parameters)
+                result = await self._run_in_thread(handler, parameters)
             
             return {"success": True, "result": result, "action_type": action_type}
         except Exception as e:
-            logger.error(f"Action execution error: {e}", exc_info=True)
+            logger.error("Action execution error: %s", e)
+            logger.debug("Action execution error traceback", exc_info=True)
             return {"success": False, "error": str(e), "action_type": action_type}
     
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the handler thread pool, creating it on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config.action_threads or 4,
+                thread_name_prefix="action"
+            )
+        return self._executor
+    
+    async def _run_in_thread(self, handler: Callable, parameters: Dict[str, Any]) -> Any:
+        """Run a sync handler in the action thread pool"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        ctx = contextvars.copy_context()
+        
+        # Only wrap in ctx.run when there are context variables to carry over
+        if not ctx:
+            return await loop.run_in_executor(executor, handler, parameters)
+        
+        return await loop.run_in_executor(
+            executor, functools.partial(ctx.run, handler, parameters)
+        )
+    
+    def _needs_event_loop(self, actions: List[Dict[str, Any]]) -> bool:
+        """Check whether any action has a coroutine or blocking sync handler"""
+        for action in actions:
+            entry = self._dispatch.get(action.get("action_type"))
+            if entry is not None and (entry[1] or not entry[2]):
+                return True
+        return False
+    
     def execute_batch(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Execute multiple actions
@@ -133,6 +206,22 @@ class ActionExecutor:
         Returns:
             List of result dictionaries
         """
+        # Blocking or coroutine handlers need an event loop: run them
+        # concurrently so independent actions take max(latency) rather than
+        # sum(latency). Fast handlers gain nothing from a loop and run inline.
+        if self._needs_event_loop(actions):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # A private loop leaves this thread's current event loop
+                # untouched (asyncio.run resets it on Python 3.9)
+                loop = asyncio.new_event_loop()
+                try:
+                    return loop.run_until_complete(self.execute_batch_async(actions))
+                finally:
+                    loop.run_until_complete(loop.shutdown_asyncgens())
+                    loop.close()
+        
         results = []
         for action in actions:
             result = self.execute(action)
@@ -142,11 +231,60 @@ class ActionExecutor:
     async def execute_batch_async(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Async version of execute_batch"""
         tasks = [self.execute_async(action) for action in actions]
-        results = await asyncio.gather(*tasks)
-        return list(results)
+        # Collect failures in place rather than cancelling sibling actions
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for i, result in enumerate(results):
+            if isinstance(result, BaseException):
+                results[i] = {
+                    "success": False,
+                    "error": str(result),
+                    "action_type": actions[i].get("action_type")
+                }
+        
+        return results
+    
+    def cleanup(self):
+        """Shut down the handler thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
     
     # Default Action Handlers
     
+    # Response formatters for the default handlers, keyed by action/type
+    _SMART_HOME_ACTIONS: Dict[str, Callable[..., str]] = {
+        "on": lambda device, location, value: f"Turned on {device} in {location}",
+        "off": lambda device, location, value: f"Turned off {device} in {location}",
+        "set": lambda device, location, value: f"Set {device} in {location} to {value}",
+    }
+    
+    _INFORMATION_TYPES: Dict[str, Callable[..., str]] = {
+        "weather": lambda location: "The current weather is 72°F and sunny",
+        "news": lambda location: "Here are the top news headlines...",
+        "time": lambda location: f"The current time is {datetime.now().strftime('%I:%M %p')}",
+    }
+    
+    _REMINDER_ACTIONS: Dict[str, Callable[..., str]] = {
+        "set": lambda time, message: f"I'll remind you {message} at {time}",
+        "list": lambda time, message: "You have 3 upcoming reminders",
+        "cancel": lambda time, message: "Reminder cancelled",
+    }
+    
+    _MEDIA_ACTIONS: Dict[str, Callable[..., str]] = {
+        "play": lambda media_type, title: f"Playing {title}" if title else f"Playing {media_type}",
+        "pause": lambda media_type, title: "Media paused",
+        "stop": lambda media_type, title: "Media stopped",
+        "next": lambda media_type, title: "Playing next track",
+        "previous": lambda media_type, title: "Playing previous track",
+    }
+    
+    _COMMUNICATION_ACTIONS: Dict[str, Callable[..., str]] = {
+        "send_message": lambda recipient, message: f"Message sent to {recipient}",
+        "call": lambda recipient, message: f"Calling {recipient}",
+        "email": lambda recipient, message: f"Email sent to {recipient}",
+    }
+    
     def _handle_smart_home(self, params: Dict[str, Any]) -> str:
         """Handle smart home control actions"""
         device = params.get("device", "device")
@@ -157,16 +295,12 @@ class ActionExecutor:
         # In production, integrate with actual smart home API
         # (HomeKit, Google Home, Alexa, Home Assistant, etc.)
         
-        logger.info(f"Smart home action: {action} {device} in {location}")
+        logger.info("Smart home action: %s %s in %s", action, device, location)
         
-        if action == "on":
-            return f"Turned on {device} in {location}"
-        elif action == "off":
-            return f"Turned off {device} in {location}"
-        elif action == "set" and value:
-            return f"Set {device} in {location} to {value}"
-        else:
+        respond = self._SMART_HOME_ACTIONS.get(action)
+        if respond is None or (action == "set" and not value):
             return f"Executed {action} on {device}"
+        return respond(device, location, value)
     
     def _handle_information(self, params: Dict[str, Any]) -> str:
         """Handle information retrieval actions"""
@@ -176,17 +310,12 @@ class ActionExecutor:
         # In production, integrate with actual APIs
         # (Weather API, News API, etc.)
         
-        logger.info(f"Information request: {info_type} for {location}")
+        logger.info("Information request: %s for %s", info_type, location)
         
-        if info_type == "weather":
-            return "The current weather is 72°F and sunny"
-        elif info_type == "news":
-            return "Here are the top news headlines..."
-        elif info_type == "time":
-            from datetime import datetime
-            return f"The current time is {datetime.now().strftime('%I:%M %p')}"
-        else:
+        respond = self._INFORMATION_TYPES.get(info_type)
+        if respond is None:
             return f"Retrieved information about {info_type}"
+        return respond(location)
     
     def _handle_reminder(self, params: Dict[str, Any]) -> str:
         """Handle reminder and scheduling actions"""
@@ -196,16 +325,12 @@ class ActionExecutor:
         
         # In production, integrate with calendar/reminder system
         
-        logger.info(f"Reminder action: {action} at {time} - {message}")
+        logger.info("Reminder action: %s at %s - %s", action, time, message)
         
-        if action == "set":
-            return f"I'll remind you {message} at {time}"
-        elif action == "list":
-            return "You have 3 upcoming reminders"
-        elif action == "cancel":
-            return "Reminder cancelled"
-        else:
+        respond = self._REMINDER_ACTIONS.get(action)
+        if respond is None:
             return "Reminder action completed"
+        return respond(time, message)
     
     def _handle_media(self, params: Dict[str, Any]) -> str:
         """Handle media control actions"""
@@ -216,20 +341,12 @@ class ActionExecutor:
         # In production, integrate with media player APIs
         # (Spotify, Apple Music, YouTube, etc.)
         
-        logger.info(f"Media action: {action} {media_type} - {title}")
-        
-        if action == "play":
-            return f"Playing {title}" if title else f"Playing {media_type}"
-        elif action == "pause":
-            return "Media paused"
-        elif action == "stop":
-            return "Media stopped"
-        elif action == "next":
-            return "Playing next track"
-        elif action == "previous":
-            return "Playing previous track"
-        else:
+        logger.info("Media action: %s %s - %s", action, media_type, title)
+        
+        respond = self._MEDIA_ACTIONS.get(action)
+        if respond is None:
             return "Media action completed"
+        return respond(media_type, title)
     
     def _handle_communication(self, params: Dict[str, Any]) -> str:
         """Handle communication actions"""
@@ -239,16 +356,12 @@ class ActionExecutor:
         
         # In production, integrate with messaging/phone APIs
         
-        logger.info(f"Communication action: {action} to {recipient}")
+        logger.info("Communication action: %s to %s", action, recipient)
         
-        if action == "send_message":
-            return f"Message sent to {recipient}"
-        elif action == "call":
-            return f"Calling {recipient}"
-        elif action == "email":
-            return f"Email sent to {recipient}"
-        else:
+        respond = self._COMMUNICATION_ACTIONS.get(action)
+        if respond is None:
             return "Communication action completed"
+        return respond(recipient, message)
     
     def _handle_search(self, params: Dict[str, Any]) -> str:
         """Handle search actions"""
@@ -256,6 +369,6 @@ class ActionExecutor:
         
         # In production, integrate with search APIs
         
-        logger.info(f"Search query: {query}")
+        logger.info("Search query: %s", query)
         
         return f"Here's what I found about {query}..."
@@ -4,16 +4,131 @@ Maintains conversation history and user context across sessions
 """
 
 import json
+import logging
+import queue
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Deque, Iterator, List, Dict, Any, Optional, Tuple
 
 from src.utils.logging import get_logger
 from src.utils.config import Config
 
 logger = get_logger(__name__)
 
+# Background writer batching limits
+WRITE_BATCH_SIZE = 64
+WRITE_BATCH_INTERVAL = 0.05  # seconds
+
+# Rows fetched per round trip when loading history
+LOAD_BATCH_SIZE = 500
+
+# Messages trimmed from memory between database prunes
+PRUNE_INTERVAL = 1000
+
+# Free pages reclaimed by the incremental vacuum after a prune
+VACUUM_PAGES = 1000
+
+# SQL statements (kept byte-identical so SQLite's statement cache is hit)
+CREATE_CONVERSATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        metadata TEXT
+    )
+"""
+
+CREATE_PREFERENCES_SQL = """
+    CREATE TABLE IF NOT EXISTS preferences (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+"""
+
+CREATE_TIMESTAMP_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_timestamp
+    ON conversations(timestamp)
+"""
+
+INSERT_MESSAGE_SQL = """
+    INSERT INTO conversations (timestamp, role, content, metadata)
+    VALUES (?, ?, ?, ?)
+"""
+
+SELECT_RECENT_MESSAGES_SQL = """
+    SELECT timestamp, role, content, metadata
+    FROM conversations
+    WHERE timestamp > ?
+    ORDER BY timestamp ASC
+"""
+
+INSERT_PREFERENCE_SQL = """
+    INSERT OR REPLACE INTO preferences (key, value, updated_at)
+    VALUES (?, ?, ?)
+"""
+
+SELECT_PREFERENCES_SQL = "SELECT key, value FROM preferences"
+
+DELETE_OLD_MESSAGES_SQL = "DELETE FROM conversations WHERE timestamp < ?"
+
+INCREMENTAL_VACUUM_SQL = f"PRAGMA incremental_vacuum({VACUUM_PAGES})"
+
+# Full-text index over message content (external-content FTS5 table)
+CREATE_FTS_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts
+    USING fts5(content, content='conversations', content_rowid='id')
+"""
+
+CREATE_FTS_INSERT_TRIGGER_SQL = """
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_insert
+    AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversations_fts (rowid, content) VALUES (new.id, new.content);
+    END
+"""
+
+CREATE_FTS_DELETE_TRIGGER_SQL = """
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_delete
+    AFTER DELETE ON conversations BEGIN
+        INSERT INTO conversations_fts (conversations_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+"""
+
+SEARCH_MESSAGES_SQL = """
+    SELECT c.timestamp, c.role, c.content, c.metadata
+    FROM conversations_fts
+    JOIN conversations AS c ON c.id = conversations_fts.rowid
+    WHERE conversations_fts MATCH ?
+      AND (c.timestamp > ? OR c.id IN (
+          SELECT id FROM conversations WHERE timestamp = ? ORDER BY id DESC LIMIT ?
+      ))
+    ORDER BY c.id DESC
+    LIMIT ?
+"""
+
+
+def _iso_to_epoch_ms(timestamp: str) -> int:
+    """Convert an ISO-8601 timestamp string to epoch milliseconds"""
+    return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+
+
+def _row_to_message(row: Tuple[int, str, str, Optional[str]]) -> Dict[str, Any]:
+    """Convert a conversations row into an in-memory message dict"""
+    timestamp_ms, role, content, metadata_str = row
+    return {
+        "timestamp": datetime.fromtimestamp(timestamp_ms / 1000).isoformat(),
+        "role": role,
+        "content": content,
+        "metadata": json.loads(metadata_str) if metadata_str else {}
+    }
+
 
 class ContextManager:
     """
@@ -37,18 +152,45 @@ class ContextManager:
         self.max_context_length = config.max_context_length
         self.context_window_hours = config.context_window_hours
         
-        # In-memory conversation history
-        self.conversation_history: List[Dict[str, Any]] = []
+        # In-memory conversation history. Without a time window the history
+        # is bounded by length instead.
+        max_history = None if self.context_window_hours else self.max_context_length * 4
+        self.conversation_history: Deque[Dict[str, Any]] = deque(maxlen=max_history)
+        
+        # Epoch seconds of each message, parallel to conversation_history
+        self._timestamps: Deque[float] = deque(maxlen=max_history)
+        
+        # Lowercased message contents, parallel to conversation_history
+        self._lower_contents: Deque[str] = deque(maxlen=max_history)
+        
+        # Running count of user messages (the rest are assistant messages)
+        self._user_count = 0
+        
+        # Messages trimmed from memory since the database was last pruned
+        self._trimmed_since_prune = 0
         
         # User preferences
         self.user_preferences: Dict[str, Any] = {}
         
+        # Long-lived database connection (shared across threads)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._fts_enabled = False
+        
+        # Background writer for message persistence. Items are
+        # (timestamp_ms, message); a None message prunes rows older than
+        # timestamp_ms.
+        self._write_q: "queue.Queue[Optional[Tuple[int, Optional[Dict[str, Any]]]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        
         # Initialize persistent storage
         if config.enable_persistent_memory:
             self.db_path = Path(config.memory_db_path)
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
             self._init_database()
             self._load_from_database()
+            self._start_writer()
+            self._prune_database()
         else:
             self.db_path = None
         
@@ -57,40 +199,85 @@ class ContextManager:
     def _init_database(self):
         """Initialize SQLite database for persistent memory"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
+            # Single connection reused for all reads/writes. Autocommit mode
+            # plus WAL journaling keeps per-message writes cheap.
+            self._conn = sqlite3.connect(
+                str(self.db_path),
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=128
+            )
+            # Must precede table creation to apply to a new database
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA temp_store=MEMORY")
+            
+            cursor = self._conn.cursor()
             
             # Create tables
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    metadata TEXT
-                )
-            """)
+            cursor.execute(CREATE_CONVERSATIONS_SQL)
+            cursor.execute(CREATE_PREFERENCES_SQL)
             
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS preferences (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
-                )
-            """)
+            # Upgrade databases created with ISO-8601 TEXT timestamps
+            self._migrate_timestamps(cursor)
             
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_timestamp 
-                ON conversations(timestamp)
-            """)
+            cursor.execute(CREATE_TIMESTAMP_INDEX_SQL)
             
-            conn.commit()
-            conn.close()
+            self._init_fts(cursor)
             
-            logger.info(f"Database initialized: {self.db_path}")
+            logger.info("Database initialized: %s", self.db_path)
             
         except Exception as e:
-            logger.error(f"Database initialization error: {e}", exc_info=True)
+            logger.error("Database initialization error: %s", e, exc_info=True)
+    
+    def _migrate_timestamps(self, cursor: sqlite3.Cursor):
+        """Convert legacy TEXT timestamps to INTEGER epoch milliseconds"""
+        columns = {
+            row[1]: row[2]
+            for row in cursor.execute("PRAGMA table_info(conversations)")
+        }
+        if columns.get("timestamp", "").upper() != "TEXT":
+            return
+        
+        logger.info("Migrating conversation timestamps to epoch milliseconds")
+        
+        rows = cursor.execute(
+            "SELECT timestamp, role, content, metadata FROM conversations ORDER BY id"
+        ).fetchall()
+        converted = [
+            (_iso_to_epoch_ms(timestamp), role, content, metadata)
+            for timestamp, role, content, metadata in rows
+        ]
+        
+        with self._conn:
+            cursor.execute("BEGIN")
+            cursor.execute("ALTER TABLE conversations RENAME TO conversations_legacy")
+            cursor.execute(CREATE_CONVERSATIONS_SQL)
+            cursor.executemany(INSERT_MESSAGE_SQL, converted)
+            cursor.execute("DROP TABLE conversations_legacy")
+    
+    def _init_fts(self, cursor: sqlite3.Cursor):
+        """Create the FTS5 search index, if SQLite supports it"""
+        try:
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'conversations_fts'"
+            ).fetchone()
+            
+            cursor.execute(CREATE_FTS_SQL)
+            cursor.execute(CREATE_FTS_INSERT_TRIGGER_SQL)
+            cursor.execute(CREATE_FTS_DELETE_TRIGGER_SQL)
+            
+            # Index rows written before the FTS table existed
+            if not exists:
+                cursor.execute(
+                    "INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')"
+                )
+            
+            self._fts_enabled = True
+            
+        except sqlite3.OperationalError as e:
+            logger.warning("FTS5 unavailable, using in-memory search: %s", e)
     
     def _load_from_database(self):
         """Load recent context from database"""
@@ -98,45 +285,40 @@ class ContextManager:
             return
         
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
             # Load recent conversations (within context window)
-            cutoff_time = datetime.now() - timedelta(hours=self.context_window_hours)
-            cutoff_str = cutoff_time.isoformat()
+            cutoff_ms = int((time.time() - self.context_window_hours * 3600) * 1000)
             
-            cursor.execute("""
-                SELECT timestamp, role, content, metadata
-                FROM conversations
-                WHERE timestamp > ?
-                ORDER BY timestamp ASC
-            """, (cutoff_str,))
-            
-            for row in cursor.fetchall():
-                timestamp, role, content, metadata_str = row
-                metadata = json.loads(metadata_str) if metadata_str else {}
+            with self._db_lock:
+                cursor = self._conn.cursor()
+                cursor.arraysize = LOAD_BATCH_SIZE
+                cursor.execute(SELECT_RECENT_MESSAGES_SQL, (cutoff_ms,))
+                
+                # Stream rows in batches straight into the history deques
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    self.conversation_history.extend(map(_row_to_message, rows))
+                    self._timestamps.extend(row[0] / 1000 for row in rows)
+                    self._lower_contents.extend(row[2].lower() for row in rows)
                 
-                self.conversation_history.append({
-                    "timestamp": timestamp,
-                    "role": role,
-                    "content": content,
-                    "metadata": metadata
-                })
+                preference_rows = self._conn.execute(SELECT_PREFERENCES_SQL).fetchall()
+            
+            self._user_count = sum(
+                1 for msg in self.conversation_history if msg["role"] == "user"
+            )
             
             # Load preferences
-            cursor.execute("SELECT key, value FROM preferences")
-            for key, value_str in cursor.fetchall():
+            for key, value_str in preference_rows:
                 try:
                     self.user_preferences[key] = json.loads(value_str)
                 except json.JSONDecodeError:
                     self.user_preferences[key] = value_str
             
-            conn.close()
-            
-            logger.info(f"Loaded {len(self.conversation_history)} messages from database")
+            logger.info("Loaded %d messages from database", len(self.conversation_history))
             
         except Exception as e:
-            logger.error(f"Database load error: {e}", exc_info=True)
+            logger.error("Database load error: %s", e, exc_info=True)
     
     def add_message(
         self,
@@ -152,7 +334,9 @@ class ContextManager:
             content: Message content
             metadata: Optional metadata dictionary
         """
-        timestamp = datetime.now().isoformat()
+        now = time.time()
+        now_ms = int(now * 1000)
+        timestamp = datetime.fromtimestamp(now).isoformat()
         
         message = {
             "timestamp": timestamp,
@@ -161,38 +345,133 @@ class ContextManager:
             "metadata": metadata or {}
         }
         
-        self.conversation_history.append(message)
+        history = self.conversation_history
+        
+        # A full bounded history evicts its oldest message on append
+        if len(history) == history.maxlen and history[0]["role"] == "user":
+            self._user_count -= 1
+        
+        history.append(message)
+        # Millisecond precision, matching the persisted timestamp
+        self._timestamps.append(now_ms / 1000)
+        self._lower_contents.append(content.lower())
+        
+        if role == "user":
+            self._user_count += 1
         
         # Persist to database
         if self.db_path:
-            self._save_message_to_db(message)
+            self._save_message_to_db(message, now_ms)
         
         # Trim history if needed
         self._trim_history()
         
-        logger.debug(f"Added {role} message: {content[:50]}...")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Added %s message: %s...", role, content[:50])
     
-    def _save_message_to_db(self, message: Dict[str, Any]):
-        """Save message to database"""
-        try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
+    def _save_message_to_db(self, message: Dict[str, Any], timestamp_ms: int):
+        """Queue message for the background writer"""
+        # Without a writer (database unavailable or closed) nothing would
+        # drain the queue
+        if self._writer is None or not self._writer.is_alive():
+            logger.warning("Database writer not running; message not persisted")
+            return
+        
+        self._write_q.put((timestamp_ms, message))
+    
+    def _prune_database(self):
+        """Queue deletion of messages older than the retention period"""
+        retention_days = self.config.auto_delete_context_days
+        if self._writer is None or retention_days <= 0:
+            return
+        
+        # Never delete messages that are still inside the context window
+        retention = max(retention_days * 86400, self.context_window_hours * 3600)
+        cutoff_ms = int((time.time() - retention) * 1000)
+        self._write_q.put((cutoff_ms, None))
+    
+    def _start_writer(self):
+        """Start the background writer thread"""
+        if self._conn is None:
+            return
+        
+        self._writer = threading.Thread(
+            target=self._writer_loop,
+            name="context-writer",
+            daemon=True
+        )
+        self._writer.start()
+    
+    def _writer_loop(self):
+        """Drain queued messages and write them in batches"""
+        write_q = self._write_q
+        
+        while True:
+            # Block for the first message, then collect more for a short window
+            batch = [write_q.get()]
+            deadline = time.monotonic() + WRITE_BATCH_INTERVAL
+            
+            while batch[-1] is not None and len(batch) < WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(write_q.get(timeout=remaining))
+                except queue.Empty:
+                    break
             
-            cursor.execute("""
-                INSERT INTO conversations (timestamp, role, content, metadata)
-                VALUES (?, ?, ?, ?)
-            """, (
-                message["timestamp"],
-                message["role"],
-                message["content"],
-                json.dumps(message["metadata"])
-            ))
+            self._write_messages(batch)
             
-            conn.commit()
-            conn.close()
+            for _ in batch:
+                write_q.task_done()
+            
+            # None is the shutdown sentinel
+            if batch[-1] is None:
+                return
+    
+    def _write_messages(self, batch: List[Optional[Tuple[int, Optional[Dict[str, Any]]]]]):
+        """Write a batch of messages to the database in one transaction"""
+        # Empty metadata (the common case) is stored as NULL without encoding
+        rows = [
+            (
+                item[0],
+                item[1]["role"],
+                item[1]["content"],
+                json.dumps(item[1]["metadata"]) if item[1]["metadata"] else None
+            )
+            for item in batch
+            if item is not None and item[1] is not None
+        ]
+        prune_before = max(
+            (item[0] for item in batch if item is not None and item[1] is None),
+            default=None
+        )
+        if not rows and prune_before is None:
+            return
+        
+        try:
+            with self._db_lock, self._conn:
+                self._conn.execute("BEGIN")
+                if rows:
+                    self._conn.executemany(INSERT_MESSAGE_SQL, rows)
+                if prune_before is not None:
+                    self._conn.execute(DELETE_OLD_MESSAGES_SQL, (prune_before,))
+            
+            # Reclaim a bounded number of freed pages outside the transaction.
+            # execute() would step the pragma once (one page); executescript
+            # runs it to completion.
+            if prune_before is not None:
+                with self._db_lock:
+                    self._conn.executescript(INCREMENTAL_VACUUM_SQL)
             
         except Exception as e:
-            logger.error(f"Database save error: {e}", exc_info=True)
+            logger.error("Database save error: %s", e)
+            logger.debug("Database save error traceback", exc_info=True)
+    
+    def flush(self):
+        """Block until all queued messages have been written"""
+        if self._writer is not None:
+            self._write_q.join()
     
     def get_recent_context(self, last_n: Optional[int] = None) -> List[Dict[str, str]]:
         """
@@ -207,7 +486,8 @@ class ContextManager:
         n = last_n or self.max_context_length
         
         # Get last N messages
-        recent_messages = self.conversation_history[-n:]
+        recent_messages = list(islice(reversed(self.conversation_history), n))
+        recent_messages.reverse()
         
         # Format for GPT-4
         formatted = [
@@ -222,12 +502,21 @@ class ContextManager:
     
     def get_full_history(self) -> List[Dict[str, Any]]:
         """Get complete conversation history"""
-        return self.conversation_history.copy()
+        return list(self.conversation_history)
+    
+    def iter_history(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over conversation history without copying it"""
+        return iter(self.conversation_history)
     
     def search_history(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Search conversation history
         
+        Only messages still in the context window are searched; cleared or
+        trimmed messages never match. With the FTS5 index, the query matches
+        whole words in order and its last word also matches as a prefix
+        ("kitch" finds "kitchen"); without it, any substring matches.
+        
         Args:
             query: Search query
             limit: Maximum results to return
@@ -235,15 +524,64 @@ class ContextManager:
         Returns:
             List of matching messages
         """
+        # Direct edits to the history aren't reflected in the database
+        if (self._fts_enabled and self._conn is not None and query.strip()
+                and len(self._timestamps) == len(self.conversation_history)):
+            return self._search_database(query, limit)
+        
+        history = self.conversation_history
+        lower_contents = self._lower_contents
+        
+        # History was modified directly; rebuild the lowercase cache
+        if len(lower_contents) != len(history):
+            lower_contents.clear()
+            lower_contents.extend(msg["content"].lower() for msg in history)
+        
         query_lower = query.lower()
         
         matches = [
-            msg for msg in self.conversation_history
-            if query_lower in msg["content"].lower()
+            msg for content, msg in zip(lower_contents, history)
+            if query_lower in content
         ]
         
         return matches[-limit:]
     
+    def _search_database(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Search persisted history through the FTS5 index"""
+        timestamps = self._timestamps
+        if not timestamps:
+            return []
+        
+        # Rows older than the oldest in-memory message were cleared or
+        # trimmed. Within its millisecond, only the newest rows are live.
+        oldest_ms = round(timestamps[0] * 1000)
+        live_at_oldest = 0
+        for ts in timestamps:
+            if round(ts * 1000) != oldest_ms:
+                break
+            live_at_oldest += 1
+        
+        # Make sure queued messages are searchable
+        self.flush()
+        
+        # Quote as a phrase so punctuation isn't parsed as FTS syntax; the
+        # trailing * keeps partial-word matches on the last word
+        phrase = '"' + query.replace('"', '""') + '"*'
+        
+        try:
+            with self._db_lock:
+                rows = self._conn.execute(
+                    SEARCH_MESSAGES_SQL,
+                    (phrase, oldest_ms, oldest_ms, live_at_oldest, limit)
+                ).fetchall()
+        except Exception as e:
+            logger.error("Database search error: %s", e)
+            logger.debug("Database search error traceback", exc_info=True)
+            return []
+        
+        # Oldest first, matching the in-memory search order
+        return [_row_to_message(row) for row in reversed(rows)]
+    
     def set_preference(self, key: str, value: Any):
         """
         Set user preference
@@ -258,24 +596,53 @@ class ContextManager:
         if self.db_path:
             self._save_preference_to_db(key, value)
         
-        logger.info(f"Set preference: {key} = {value}")
+        logger.info("Set preference: %s = %s", key, value)
+    
+    def set_preferences(self, items: Dict[str, Any]):
+        """
+        Set several user preferences at once
+        
+        Args:
+            items: Mapping of preference keys to values
+        """
+        if not items:
+            return
+        
+        self.user_preferences.update(items)
+        
+        # Persist all preferences in a single transaction
+        if self.db_path:
+            self._save_preferences_to_db(items)
+        
+        logger.info("Set %d preferences", len(items))
+    
+    def _save_preferences_to_db(self, items: Dict[str, Any]):
+        """Save several preferences to database in one transaction"""
+        now = datetime.now().isoformat()
+        try:
+            with self._db_lock, self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    INSERT_PREFERENCE_SQL,
+                    [(key, json.dumps(value), now) for key, value in items.items()]
+                )
+            
+        except Exception as e:
+            logger.error("Preference save error: %s", e)
+            logger.debug("Preference save error traceback", exc_info=True)
     
     def _save_preference_to_db(self, key: str, value: Any):
         """Save preference to database"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO preferences (key, value, updated_at)
-                VALUES (?, ?, ?)
-            """, (key, json.dumps(value), datetime.now().isoformat()))
-            
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                self._conn.execute(
+                    INSERT_PREFERENCE_SQL,
+                    (key, json.dumps(value), datetime.now().isoformat())
+                )
             
         except Exception as e:
-            logger.error(f"Preference save error: {e}", exc_info=True)
+            logger.error("Preference save error: %s", e)
+            logger.debug("Preference save error traceback", exc_info=True)
     
     def get_preference(self, key: str, default: Any = None) -> Any:
         """Get user preference"""
@@ -285,27 +652,67 @@ class ContextManager:
         """Clear conversation history"""
         logger.info("Clearing conversation context")
         self.conversation_history.clear()
+        self._timestamps.clear()
+        self._lower_contents.clear()
+        self._user_count = 0
     
     def _trim_history(self):
         """Trim history to context window"""
         if not self.context_window_hours:
             return
         
-        cutoff_time = datetime.now() - timedelta(hours=self.context_window_hours)
+        history = self.conversation_history
+        timestamps = self._timestamps
+        lower_contents = self._lower_contents
         
-        # Remove old messages
-        self.conversation_history = [
-            msg for msg in self.conversation_history
-            if datetime.fromisoformat(msg["timestamp"]) > cutoff_time
-        ]
+        # History was modified directly; rebuild the parallel indexes and counts
+        if len(timestamps) != len(history) or len(lower_contents) != len(history):
+            timestamps.clear()
+            timestamps.extend(
+                datetime.fromisoformat(msg["timestamp"]).timestamp()
+                for msg in history
+            )
+            lower_contents.clear()
+            lower_contents.extend(msg["content"].lower() for msg in history)
+            self._user_count = sum(1 for msg in history if msg["role"] == "user")
+        
+        # Messages are appended in time order, so old ones form a prefix
+        cutoff = time.time() - self.context_window_hours * 3600
+        trimmed = 0
+        while timestamps and timestamps[0] <= cutoff:
+            if history.popleft()["role"] == "user":
+                self._user_count -= 1
+            timestamps.popleft()
+            lower_contents.popleft()
+            trimmed += 1
+        
+        # Occasionally drop expired rows from the database as well
+        if trimmed:
+            self._trimmed_since_prune += trimmed
+            if self._trimmed_since_prune >= PRUNE_INTERVAL:
+                self._trimmed_since_prune = 0
+                self._prune_database()
     
     def save(self):
         """Save current state (called on shutdown)"""
         if self.db_path:
+            self.close()
             logger.info("Context saved to database")
         else:
             logger.info("No persistent storage configured")
     
+    def close(self):
+        """Flush pending writes and close the database connection"""
+        if self._writer is not None:
+            self._write_q.put(None)
+            self._writer.join()
+            self._writer = None
+        
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get context statistics"""
         if not self.conversation_history:
@@ -318,13 +725,12 @@ class ContextManager:
                 "preferences_count": len(self.user_preferences)
             }
         
-        user_count = sum(1 for msg in self.conversation_history if msg["role"] == "user")
-        assistant_count = len(self.conversation_history) - user_count
+        total = len(self.conversation_history)
         
         return {
-            "total_messages": len(self.conversation_history),
-            "user_messages": user_count,
-            "assistant_messages": assistant_count,
+            "total_messages": total,
+            "user_messages": self._user_count,
+            "assistant_messages": total - self._user_count,
             "oldest_message": self.conversation_history[0]["timestamp"],
             "newest_message": self.conversation_history[-1]["timestamp"],
             "preferences_count": len(self.user_preferences)
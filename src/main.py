@@ -6,10 +6,9 @@ A voice-first, screenless AI interface that processes natural language commands.
 import asyncio
 import signal
 import sys
+import threading
 from typing import Optional
 
-from dotenv import load_dotenv
-
 from src.voice_input import VoiceInput
 from src.voice_output import VoiceOutput
 from src.nlu_core import NLUCore
@@ -17,10 +16,7 @@ from src.context_manager import ContextManager
 from src.state_machine import StateMachine
 from src.action_executor import ActionExecutor
 from src.utils.logging import setup_logging, get_logger
-from src.utils.config import Config
-
-# Load environment variables
-load_dotenv()
+from src.utils.config import Config, get_config
 
 # Set up logging
 setup_logging()
@@ -44,11 +40,15 @@ class AmbientAI:
         Initialize the Ambient AI system
         
         Args:
-            config: Optional configuration object. If None, loads from environment.
+            config: Optional configuration object. If None, uses the shared
+                configuration loaded from the environment.
         """
-        self.config = config or Config()
+        self.config = config or get_config()
         self.running = False
         
+        # Set on shutdown to end a wake word listen running in a worker thread
+        self._wake_stop = threading.Event()
+        
         # Initialize components
         logger.info("Initializing Ambient AI components...")
         
@@ -67,13 +67,14 @@ class AmbientAI:
     
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully"""
-        logger.info(f"Received signal {signum}, initiating shutdown...")
+        logger.info("Received signal %s, initiating shutdown...", signum)
         self.stop()
         sys.exit(0)
     
     async def start(self):
         """Start the Ambient AI system in continuous listening mode"""
         self.running = True
+        self._wake_stop.clear()
         logger.info("Starting Ambient AI system...")
         
         # Welcome message
@@ -86,7 +87,11 @@ class AmbientAI:
             try:
                 # Listen for wake word or continuous input
                 if self.config.enable_wake_word:
-                    wake_detected = await self.voice_input.wait_for_wake_word_async()
+                    # Only after the previous reply, so the assistant's own
+                    # voice can't trigger it; stop() ends a pending listen
+                    wake_detected = await self.voice_input.wait_for_wake_word_async(
+                        stop_event=self._wake_stop
+                    )
                     if not wake_detected:
                         continue
                     
@@ -105,7 +110,7 @@ class AmbientAI:
                 if not text or text.strip() == "":
                     continue
                 
-                logger.info(f"User said: {text}")
+                logger.info("User said: %s", text)
                 
                 # Add to context
                 self.context.add_message("user", text)
@@ -113,40 +118,54 @@ class AmbientAI:
                 # Update state machine
                 self.state_machine.process_input(text)
                 
-                # Process with NLU
+                # Process with NLU, speaking each sentence as it streams in
                 conversation_history = self.context.get_recent_context()
-                response = await self.nlu.process_async(
+                chunks = []
+                async for chunk in self.nlu.process_stream_async(
                     text,
                     context=conversation_history,
                     state=self.state_machine.get_current_state()
-                )
+                ):
+                    chunks.append(chunk)
+                    speech = self.nlu.strip_actions(chunk)
+                    if speech:
+                        await self.voice_output.speak_async(speech)
+                
+                response = " ".join(chunks)
                 
-                logger.info(f"Assistant response: {response}")
+                logger.info("Assistant response: %s", response)
                 
-                # Execute any actions
+                # Execute any actions (on the complete response)
                 actions = self.nlu.extract_actions(response)
                 if actions:
                     action_results = await self.action_executor.execute_batch_async(actions)
                     
                     # Incorporate action results into response
                     if action_results:
-                        response = self._enhance_response_with_actions(response, action_results)
+                        enhanced = self._enhance_response_with_actions(response, action_results)
+                        
+                        # Speak anything the action results added
+                        if enhanced != response:
+                            await self.voice_output.speak_async(enhanced[len(response):].strip())
+                        response = enhanced
                 
                 # Add response to context
                 self.context.add_message("assistant", response)
                 
-                # Speak response
-                await self.voice_output.speak_async(response)
-                
             except KeyboardInterrupt:
                 logger.info("Keyboard interrupt received")
                 break
             except Exception as e:
-                logger.error(f"Error in main loop: {e}", exc_info=True)
+                logger.error("Error in main loop: %s", e)
+                logger.debug("Main loop error traceback", exc_info=True)
                 await self.voice_output.speak_async(
                     "I'm sorry, I encountered an error. Please try again."
                 )
                 continue
+        
+        # Release pooled API connections while the event loop is still running
+        await self.nlu.aclose()
+        await self.voice_output.aclose()
     
     def start_sync(self):
         """Synchronous wrapper for start() method"""
@@ -156,10 +175,12 @@ class AmbientAI:
         """Stop the Ambient AI system"""
         logger.info("Stopping Ambient AI system...")
         self.running = False
+        self._wake_stop.set()
         
         # Clean up resources
         self.voice_input.cleanup()
         self.voice_output.cleanup()
+        self.action_executor.cleanup()
         self.context.save()
         
         logger.info("Ambient AI system stopped")
@@ -226,6 +247,13 @@ class AmbientAI:
 
 def main():
     """Main entry point"""
+    # Prefer the libuv event loop when available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     try:
         # Initialize system
         ai = AmbientAI()
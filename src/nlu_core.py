@@ -3,17 +3,218 @@ Natural Language Understanding Core
 Uses GPT-4 for intent recognition and response generation
 """
 
-import json
 import re
-from typing import Optional, List, Dict, Any
+from itertools import chain, islice
+from types import MappingProxyType
+from typing import AsyncIterator, Optional, List, Dict, Any, Hashable, Tuple
 
+import orjson
 from openai import OpenAI, AsyncOpenAI
 
+from src.semantic_cache import SemanticCache
+from src.utils.http_client import build_http_client
 from src.utils.logging import get_logger
 from src.utils.config import Config
 
 logger = get_logger(__name__)
 
+# Messages before the current input (the previous user/assistant exchange)
+# that must match for a semantic cache hit
+CACHE_CONTEXT_MESSAGES = 2
+
+# Precompiled patterns for response/entity parsing
+ACTION_START_RE = re.compile(r'ACTION:\s*\{')
+BAREWORD_KEY_RE = re.compile(r'([{,]\s*)([A-Za-z_]\w*)\s*:')
+NUMBER_RE = re.compile(r'\b\d+\b')
+SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+')
+WORD_RE = re.compile(r'[a-z]+')
+PLAIN_PHRASE_RE = re.compile(r"[\w' ]+")
+UNCERTAIN_RE = re.compile(
+    r"i'm not sure|i don't know|maybe|perhaps|i think",
+    re.IGNORECASE
+)
+
+# Marker that starts an action block in generated responses
+ACTION_MARKER = "ACTION:"
+
+# Reply used when the model call fails
+ERROR_RESPONSE = "I'm sorry, I had trouble understanding that. Could you please rephrase?"
+
+# Canned replies for trivial commands, answered without calling the model.
+# Keys are matched against the lowercased input without trailing punctuation.
+TRIVIAL_RESPONSES = {
+    "stop": "Okay, stopping.",
+    "cancel": "Cancelled.",
+    "help": "I can control smart home devices, set reminders, play media, and answer questions.",
+}
+
+# Regex patterns (full match on the same normalized input) with canned replies
+TRIVIAL_PATTERNS = (
+    (
+        r"what time is it|what's the time",
+        'Let me check the time. ACTION: {"action_type": "information", "parameters": {"type": "time"}}'
+    ),
+)
+
+# Used when NLU_SYSTEM_PROMPT is not set
+DEFAULT_SYSTEM_PROMPT = """You are a helpful ambient AI assistant that responds naturally to voice commands.
+
+Key behaviors:
+- Be conversational and natural
+- Keep responses concise (1-3 sentences usually)
+- Acknowledge commands with confirmation
+- Ask for clarification when needed
+- Remember context from previous exchanges
+- When executing actions, describe what you're doing
+- Be proactive in offering help
+
+For actionable commands, include structured data in your response using this format:
+ACTION: {action_type: "action_name", parameters: {...}}
+
+Available actions:
+- smart_home: Control lights, temperature, security
+- information: Get weather, news, time, etc.
+- reminder: Set reminders and alarms
+- communication: Send messages, make calls
+- media: Play music, videos, podcasts
+- search: Search for information
+- custom: Custom user-defined actions
+
+Example responses:
+User: "Turn on the living room lights"
+Assistant: "I'll turn on the living room lights for you. ACTION: {action_type: "smart_home", parameters: {device: "lights", location: "living room", action: "on"}}"
+
+User: "What's the weather like?"
+Assistant: "Let me check the weather for you. ACTION: {action_type: "information", parameters: {type: "weather", location: "current"}}"
+
+Be helpful, friendly, and efficient!"""
+
+
+def _confidence_score(response: str) -> float:
+    """Estimate response confidence from uncertain phrasing"""
+    # Simple heuristic-based confidence
+    # In production, use model's confidence scores
+    
+    confidence = 0.8  # Default high confidence
+    
+    # Lower confidence for uncertain phrases (single regex scan)
+    if UNCERTAIN_RE.search(response):
+        confidence = 0.5
+    
+    return confidence
+
+
+def _build_intent_table(intent_keywords: tuple) -> Tuple[str, ...]:
+    """
+    Map every intent bitmask to its highest priority intent
+    
+    Bit i stands for intent_keywords[i]; the lowest set bit wins and an
+    empty mask is "general".
+    """
+    intents = [intent for intent, _ in intent_keywords]
+    return ("general",) + tuple(
+        intents[(mask & -mask).bit_length() - 1]
+        for mask in range(1, 1 << len(intents))
+    )
+
+
+def _state_fingerprint(state: Dict[str, Any]) -> tuple:
+    """Flatten a state dict (and nested mappings) into comparable pairs"""
+    return tuple(
+        (key, tuple(value.items()) if isinstance(value, (dict, MappingProxyType)) else value)
+        for key, value in state.items()
+    )
+
+
+def _parse_action(json_str: str) -> Any:
+    """
+    Parse an action blob, quoting bareword keys if strict parsing fails
+    
+    The model often copies the unquoted-key style of the system prompt
+    examples (e.g. {action_type: "smart_home"}).
+    """
+    try:
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError:
+        return orjson.loads(BAREWORD_KEY_RE.sub(r'\1"\2":', json_str))
+
+
+def _scan_balanced_braces(text: str, start: int) -> int:
+    """
+    Find the end of the brace group opening at text[start]
+    
+    Jumps between brace offsets with str.find instead of visiting every
+    character.
+    
+    Returns:
+        Index just past the matching closing brace, or -1 if unbalanced
+    """
+    depth = 0
+    pos = start
+    next_open = start
+    
+    while True:
+        if next_open != -1 and next_open < pos:
+            next_open = text.find('{', pos)
+        next_close = text.find('}', pos)
+        if next_close == -1:
+            return -1
+        
+        if next_open != -1 and next_open < next_close:
+            depth += 1
+            pos = next_open + 1
+        else:
+            depth -= 1
+            pos = next_close + 1
+            if depth == 0:
+                return pos
+
+
+def _extract_actions(response_text: str) -> List[Dict[str, Any]]:
+    """Extract action dictionaries from the ACTION blocks in response text"""
+    actions = []
+    
+    # Find all ACTION: markers
+    for match in ACTION_START_RE.finditer(response_text):
+        # Find the matching closing brace by counting braces
+        json_start = match.end() - 1
+        json_end = _scan_balanced_braces(response_text, json_start)
+        if json_end == -1:
+            continue
+        
+        json_str = response_text[json_start:json_end]
+        try:
+            action = _parse_action(json_str)
+            actions.append(action)
+            logger.info("Extracted action: %s", action)
+        except orjson.JSONDecodeError as e:
+            logger.warning("Failed to parse action: %s (%s)", json_str, e)
+    
+    return actions
+
+
+def _strip_actions(response_text: str) -> str:
+    """Remove ACTION blocks from response text, leaving the spoken part"""
+    if ACTION_MARKER not in response_text:
+        return response_text.strip()
+    
+    pieces = []
+    pos = 0
+    for match in ACTION_START_RE.finditer(response_text):
+        if match.start() < pos:
+            continue
+        json_end = _scan_balanced_braces(response_text, match.end() - 1)
+        if json_end == -1:
+            # Unterminated block; drop the rest
+            pieces.append(response_text[pos:match.start()])
+            pos = len(response_text)
+            break
+        pieces.append(response_text[pos:match.start()])
+        pos = json_end
+    pieces.append(response_text[pos:])
+    
+    return " ".join(" ".join(pieces).split())
+
 
 class NLUCore:
     """
@@ -26,6 +227,35 @@ class NLUCore:
     - Maintain conversational flow
     """
     
+    # Keyword tables for the heuristic entity extractor, in output order
+    ENTITY_KEYWORDS = (
+        ("devices", ("light", "lights", "thermostat", "temperature", "door", "lock", "camera")),
+        ("locations", ("living room", "bedroom", "kitchen", "bathroom", "garage")),
+        ("times", ("morning", "afternoon", "evening", "tonight", "today", "tomorrow")),
+    )
+    
+    # Keyword tables for the heuristic intent classifier, in priority order
+    INTENT_KEYWORDS = (
+        ("control", ("turn on", "turn off", "set", "adjust")),
+        ("query", ("what", "when", "where", "how", "who")),
+        ("reminder", ("remind me", "set alarm", "schedule")),
+        ("media", ("play", "stop", "pause", "next", "previous")),
+        ("communication", ("send", "message", "call", "text")),
+    )
+    
+    # Word/bigram -> intent bit (bit i is INTENT_KEYWORDS[i])
+    INTENT_LOOKUP = {
+        phrase: 1 << priority
+        for priority, (intent, phrases) in enumerate(INTENT_KEYWORDS)
+        for phrase in phrases
+    }
+    
+    # Keyword phrases, for matching a whole utterance with one set intersection
+    INTENT_PHRASES = frozenset(INTENT_LOOKUP)
+    
+    # Intent bitmask -> highest priority intent present
+    INTENT_TABLE = _build_intent_table(INTENT_KEYWORDS)
+    
     def __init__(self, config: Config):
         """
         Initialize NLU core
@@ -35,9 +265,14 @@ class NLUCore:
         """
         self.config = config
         
-        # Initialize OpenAI clients
-        self.client = OpenAI(api_key=config.openai_api_key)
-        self.async_client = AsyncOpenAI(api_key=config.openai_api_key)
+        # Initialize OpenAI clients; the sync client is only built if the
+        # sync path is used, and the async one keeps connections warm
+        self._client: Optional[OpenAI] = None
+        self._http_client = build_http_client()
+        self.async_client = AsyncOpenAI(
+            api_key=config.openai_api_key,
+            http_client=self._http_client
+        )
         
         # Model configuration
         self.model = config.openai_model
@@ -47,41 +282,45 @@ class NLUCore:
         # System prompt
         self.system_prompt = config.nlu_system_prompt or self._get_default_system_prompt()
         
-        logger.info(f"NLU core initialized (model: {self.model})")
+        # Canned replies for trivial commands (see register_trivial)
+        self.trivial_responses: Dict[str, str] = dict(TRIVIAL_RESPONSES)
+        self._trivial_patterns = [
+            (re.compile(pattern, re.IGNORECASE), response)
+            for pattern, response in TRIVIAL_PATTERNS
+        ]
+        
+        # Semantic response cache (skips the LLM call for equivalent requests)
+        self.semantic_cache: Optional[SemanticCache] = None
+        if config.enable_semantic_cache:
+            self.semantic_cache = SemanticCache(
+                threshold=config.semantic_cache_threshold,
+                max_entries=config.semantic_cache_size
+            )
+        
+        # Last state fingerprint and the state message built for it
+        self._state_message_cache: Tuple[Optional[tuple], Optional[Dict[str, str]]] = (None, None)
+        
+        logger.info("NLU core initialized (model: %s)", self.model)
     
     def _get_default_system_prompt(self) -> str:
         """Get default system prompt"""
-        return """You are a helpful ambient AI assistant that responds naturally to voice commands.
-
-Key behaviors:
-- Be conversational and natural
-- Keep responses concise (1-3 sentences usually)
-- Acknowledge commands with confirmation
-- Ask for clarification when needed
-- Remember context from previous exchanges
-- When executing actions, describe what you're doing
-- Be proactive in offering help
-
-For actionable commands, include structured data in your response using this format:
-ACTION: {action_type: "action_name", parameters: {...}}
-
-Available actions:
-- smart_home: Control lights, temperature, security
-- information: Get weather, news, time, etc.
-- reminder: Set reminders and alarms
-- communication: Send messages, make calls
-- media: Play music, videos, podcasts
-- search: Search for information
-- custom: Custom user-defined actions
-
-Example responses:
-User: "Turn on the living room lights"
-Assistant: "I'll turn on the living room lights for you. ACTION: {action_type: "smart_home", parameters: {device: "lights", location: "living room", action: "on"}}"
-
-User: "What's the weather like?"
-Assistant: "Let me check the weather for you. ACTION: {action_type: "information", parameters: {type: "weather", location: "current"}}"
-
-Be helpful, friendly, and efficient!"""
+        return DEFAULT_SYSTEM_PROMPT
+    
+    @property
+    def client(self) -> OpenAI:
+        """Sync OpenAI client, created on first use"""
+        if self._client is None:
+            self._client = OpenAI(api_key=self.config.openai_api_key)
+        return self._client
+    
+    @client.setter
+    def client(self, value: OpenAI):
+        self._client = value
+    
+    async def aclose(self):
+        """Close the pooled HTTP connections of the async client"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
     
     def process(
         self,
@@ -100,12 +339,25 @@ Be helpful, friendly, and efficient!"""
         Returns:
             Generated response text
         """
+        trivial = self._match_trivial(user_input)
+        if trivial is not None:
+            return trivial
+        
         try:
+            # Check semantic cache
+            embedding = None
+            if self.semantic_cache is not None:
+                scope = self._cache_scope(user_input, context, state)
+                embedding = self._embed(user_input)
+                cached = self._cache_lookup(scope, embedding)
+                if cached is not None:
+                    return cached
+            
             # Build messages
             messages = self._build_messages(user_input, context, state)
             
             # Call GPT-4
-            logger.info(f"Processing input: {user_input[:50]}...")
+            logger.info("Processing input: %s...", user_input[:50])
             
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -117,13 +369,17 @@ Be helpful, friendly, and efficient!"""
             # Extract response text
             response_text = response.choices[0].message.content.strip()
             
-            logger.info(f"Generated response: {response_text[:50]}...")
+            logger.info("Generated response: %s...", response_text[:50])
+            
+            if embedding is not None:
+                self._cache_store(scope, embedding, response_text)
             
             return response_text
             
         except Exception as e:
-            logger.error(f"NLU processing error: {e}", exc_info=True)
-            return "I'm sorry, I had trouble understanding that. Could you please rephrase?"
+            logger.error("NLU processing error: %s", e)
+            logger.debug("NLU processing error traceback", exc_info=True)
+            return ERROR_RESPONSE
     
     async def process_async(
         self,
@@ -132,12 +388,25 @@ Be helpful, friendly, and efficient!"""
         state: Optional[Dict[str, Any]] = None
     ) -> str:
         """Async version of process"""
+        trivial = self._match_trivial(user_input)
+        if trivial is not None:
+            return trivial
+        
         try:
+            # Check semantic cache
+            embedding = None
+            if self.semantic_cache is not None:
+                scope = self._cache_scope(user_input, context, state)
+                embedding = await self._embed_async(user_input)
+                cached = self._cache_lookup(scope, embedding)
+                if cached is not None:
+                    return cached
+            
             # Build messages
             messages = self._build_messages(user_input, context, state)
             
             # Call GPT-4
-            logger.info(f"Processing input: {user_input[:50]}...")
+            logger.info("Processing input: %s...", user_input[:50])
             
             response = await self.async_client.chat.completions.create(
                 model=self.model,
@@ -149,13 +418,208 @@ Be helpful, friendly, and efficient!"""
             # Extract response text
             response_text = response.choices[0].message.content.strip()
             
-            logger.info(f"Generated response: {response_text[:50]}...")
+            logger.info("Generated response: %s...", response_text[:50])
+            
+            if embedding is not None:
+                self._cache_store(scope, embedding, response_text)
             
             return response_text
             
         except Exception as e:
-            logger.error(f"NLU processing error: {e}", exc_info=True)
-            return "I'm sorry, I had trouble understanding that. Could you please rephrase?"
+            logger.error("NLU processing error: %s", e)
+            logger.debug("NLU processing error traceback", exc_info=True)
+            return ERROR_RESPONSE
+    
+    async def process_stream_async(
+        self,
+        user_input: str,
+        context: Optional[List[Dict[str, str]]] = None,
+        state: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response sentence by sentence
+        
+        Yields each complete sentence as soon as it is generated so speech
+        synthesis can start before the whole response is ready. Text from
+        the first ACTION marker onward is held back and yielded as the final
+        chunk, so action JSON is never split.
+        
+        Args:
+            user_input: User's text input
+            context: Conversation history (list of {role, content} dicts)
+            state: Current system state
+            
+        Yields:
+            Response text chunks, in order
+        """
+        trivial = self._match_trivial(user_input)
+        if trivial is not None:
+            yield trivial
+            return
+        
+        yielded = False
+        try:
+            # Check semantic cache
+            embedding = None
+            if self.semantic_cache is not None:
+                scope = self._cache_scope(user_input, context, state)
+                embedding = await self._embed_async(user_input)
+                cached = self._cache_lookup(scope, embedding)
+                if cached is not None:
+                    yield cached
+                    return
+            
+            # Build messages
+            messages = self._build_messages(user_input, context, state)
+            
+            # Call GPT-4
+            logger.info("Processing input (streaming): %s...", user_input[:50])
+            
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True
+            )
+            
+            parts = []
+            buffer = ""
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                
+                parts.append(delta)
+                buffer += delta
+                
+                # Only text before an action block is split into sentences
+                action_pos = buffer.find(ACTION_MARKER)
+                head = buffer if action_pos == -1 else buffer[:action_pos]
+                
+                sentences = SENTENCE_BOUNDARY_RE.split(head)
+                if len(sentences) > 1:
+                    for sentence in sentences[:-1]:
+                        if sentence.strip():
+                            yielded = True
+                            yield sentence.strip()
+                    buffer = sentences[-1] + buffer[len(head):]
+            
+            if buffer.strip():
+                yielded = True
+                yield buffer.strip()
+            
+            response_text = "".join(parts).strip()
+            
+            logger.info("Generated response: %s...", response_text[:50])
+            
+            if embedding is not None and response_text:
+                self._cache_store(scope, embedding, response_text)
+            
+        except Exception as e:
+            logger.error("NLU processing error: %s", e)
+            logger.debug("NLU processing error traceback", exc_info=True)
+            if not yielded:
+                yield ERROR_RESPONSE
+    
+    def register_trivial(self, pattern: str, response: str):
+        """
+        Register a canned reply that skips the model call
+        
+        Args:
+            pattern: Exact phrase or regular expression, matched against the
+                whole lowercased input with trailing punctuation removed
+            response: Reply text (may include an ACTION block)
+        """
+        if PLAIN_PHRASE_RE.fullmatch(pattern):
+            # Plain phrase: constant-time dict lookup
+            self.trivial_responses[pattern.lower()] = response
+        else:
+            # Case-insensitive: the input is lowercased before matching
+            self._trivial_patterns.append((re.compile(pattern, re.IGNORECASE), response))
+        
+        logger.debug("Registered trivial command: %s", pattern)
+    
+    def _match_trivial(self, user_input: str) -> Optional[str]:
+        """Return the canned reply for a trivial command, if any"""
+        key = user_input.strip().lower().rstrip("!.?")
+        
+        response = self.trivial_responses.get(key)
+        if response is None:
+            for pattern, canned in self._trivial_patterns:
+                if pattern.fullmatch(key):
+                    response = canned
+                    break
+        
+        if response is not None:
+            logger.info("Trivial command, skipping model call: %s", key)
+        return response
+    
+    def _cache_scope(
+        self,
+        user_input: str,
+        context: Optional[List[Dict[str, str]]],
+        state: Optional[Dict[str, Any]]
+    ) -> Hashable:
+        """Build the semantic cache scope from system state and the previous exchange"""
+        history = context or []
+        
+        # Callers may already have added the current input to the context;
+        # it is what the embedding matches on, so keep it out of the scope
+        if (history and history[-1]["role"] == "user"
+                and history[-1]["content"] == user_input):
+            history = history[:-1]
+        
+        recent = tuple(
+            (msg["role"], msg["content"])
+            for msg in history[-CACHE_CONTEXT_MESSAGES:]
+        )
+        return ((state or {}).get("state"), recent)
+    
+    def _cache_lookup(self, scope: Hashable, embedding: Optional[List[float]]) -> Optional[str]:
+        """Look up a cached response, if the input could be embedded"""
+        if embedding is None:
+            return None
+        
+        cached = self.semantic_cache.lookup(scope, embedding)
+        if cached is not None:
+            logger.info("Semantic cache hit")
+        return cached
+    
+    def _cache_store(self, scope: Hashable, embedding: List[float], response_text: str):
+        """Cache a response unless it carries actions"""
+        # Near-duplicate requests ("set it to 72" / "set it to 73") clear the
+        # similarity threshold, so replaying an action would use stale values
+        if ACTION_MARKER in response_text:
+            return
+        
+        self.semantic_cache.store(scope, embedding, response_text)
+    
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Embed text for the semantic cache (None on failure)"""
+        try:
+            response = self.client.embeddings.create(
+                model=self.config.embedding_model,
+                input=text
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            logger.warning("Embedding error, skipping semantic cache: %s", e)
+            return None
+    
+    async def _embed_async(self, text: str) -> Optional[List[float]]:
+        """Async version of _embed"""
+        try:
+            response = await self.async_client.embeddings.create(
+                model=self.config.embedding_model,
+                input=text
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            logger.warning("Embedding error, skipping semantic cache: %s", e)
+            return None
     
     def _build_messages(
         self,
@@ -164,26 +628,30 @@ Be helpful, friendly, and efficient!"""
         state: Optional[Dict[str, Any]]
     ) -> List[Dict[str, str]]:
         """Build messages array for GPT-4"""
+        # The system prompt and history come first and stay byte-identical
+        # between calls so the API's prompt cache can reuse the prefix
         messages = [
             {"role": "system", "content": self.system_prompt}
         ]
         
-        # Add state information if available
-        if state:
-            state_info = self._format_state_info(state)
-            if state_info:
-                messages.append({
-                    "role": "system",
-                    "content": f"Current system state: {state_info}"
-                })
-        
-        # Add context (conversation history)
+        # Add context (conversation history) without copying it; messages
+        # already in {role, content} form are reused as-is
         if context:
-            for msg in context[-self.config.max_context_length:]:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            start = max(0, len(context) - self.config.max_context_length)
+            for msg in islice(context, start, None):
+                if len(msg) == 2:
+                    messages.append(msg)
+                else:
+                    messages.append({
+                        "role": msg["role"],
+                        "content": msg["content"]
+                    })
+        
+        # Add state information if available (changes often, so after history)
+        if state:
+            state_message = self._state_message(state)
+            if state_message:
+                messages.append(state_message)
         
         # Add current user input
         messages.append({
@@ -193,17 +661,41 @@ Be helpful, friendly, and efficient!"""
         
         return messages
     
+    def _state_message(self, state: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """Build the state message, reusing the last one while state is unchanged"""
+        key = _state_fingerprint(state)
+        try:
+            hash(key)
+        except TypeError:
+            # Mutable values could change in place; don't cache
+            key = None
+        
+        cached_key, cached_message = self._state_message_cache
+        if key is not None and key == cached_key:
+            return cached_message
+        
+        state_info = self._format_state_info(state)
+        message = {
+            "role": "system",
+            "content": f"Current system state: {state_info}"
+        } if state_info else None
+        
+        if key is not None:
+            self._state_message_cache = (key, message)
+        return message
+    
     def _format_state_info(self, state: Dict[str, Any]) -> str:
         """Format state information for system prompt"""
         if not state:
             return ""
         
-        # Format state dict as readable text
-        state_parts = []
-        for key, value in state.items():
-            state_parts.append(f"{key}: {value}")
-        
-        return ", ".join(state_parts)
+        # Format state dict as readable text; read-only views render as dicts.
+        # Not memoized here: _state_message already reuses the last message
+        # while the state is unchanged
+        return ", ".join(
+            f"{key}: {dict(value) if isinstance(value, MappingProxyType) else value}"
+            for key, value in state.items()
+        )
     
     def extract_actions(self, response_text: str) -> List[Dict[str, Any]]:
         """
@@ -215,33 +707,19 @@ Be helpful, friendly, and efficient!"""
         Returns:
             List of action dictionaries
         """
-        actions = []
-        
-        # Find all ACTION: markers
-        action_starts = [m.start() for m in re.finditer(r'ACTION:\s*\{', response_text)]
-        
-        for start_pos in action_starts:
-            # Find the matching closing brace by counting braces
-            brace_count = 0
-            json_start = response_text.find('{', start_pos)
-            
-            for i in range(json_start, len(response_text)):
-                if response_text[i] == '{':
-                    brace_count += 1
-                elif response_text[i] == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        # Found matching close brace
-                        json_str = response_text[json_start:i+1]
-                        try:
-                            action = json.loads(json_str)
-                            actions.append(action)
-                            logger.info(f"Extracted action: {action}")
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to parse action: {json_str} ({e})")
-                        break
-        
-        return actions
+        return _extract_actions(response_text)
+    
+    def strip_actions(self, response_text: str) -> str:
+        """
+        Remove ACTION blocks from response text
+        
+        Args:
+            response_text: The generated response text
+            
+        Returns:
+            The text meant to be spoken
+        """
+        return _strip_actions(response_text)
     
     def extract_entities(self, text: str) -> Dict[str, List[str]]:
         """
@@ -256,34 +734,16 @@ Be helpful, friendly, and efficient!"""
         # Simple entity extraction
         # In production, use spaCy or similar NLP library
         
+        text_lower = text.lower()
+        
+        # Extract device, location and time mentions
         entities = {
-            "devices": [],
-            "locations": [],
-            "times": [],
-            "numbers": []
+            kind: [keyword for keyword in keywords if keyword in text_lower]
+            for kind, keywords in self.ENTITY_KEYWORDS
         }
         
-        # Extract device mentions
-        device_keywords = ["light", "lights", "thermostat", "temperature", "door", "lock", "camera"]
-        for keyword in device_keywords:
-            if keyword in text.lower():
-                entities["devices"].append(keyword)
-        
-        # Extract location mentions
-        location_keywords = ["living room", "bedroom", "kitchen", "bathroom", "garage"]
-        for location in location_keywords:
-            if location in text.lower():
-                entities["locations"].append(location)
-        
-        # Extract time references
-        time_keywords = ["morning", "afternoon", "evening", "tonight", "today", "tomorrow"]
-        for time_ref in time_keywords:
-            if time_ref in text.lower():
-                entities["times"].append(time_ref)
-        
         # Extract numbers
-        numbers = re.findall(r'\b\d+\b', text)
-        entities["numbers"] = numbers
+        entities["numbers"] = NUMBER_RE.findall(text)
         
         return entities
     
@@ -300,20 +760,18 @@ Be helpful, friendly, and efficient!"""
         # Simple keyword-based intent classification
         # In production, train an intent classifier
         
-        text_lower = text.lower()
+        # Intersect the words and adjacent word pairs with the keyword set
+        # in C, OR the intent bits of the few hits, then map the mask to
+        # the highest priority intent present
+        tokens = WORD_RE.findall(text.lower())
+        bigrams = map(" ".join, zip(tokens, tokens[1:]))
         
-        if any(word in text_lower for word in ["turn on", "turn off", "set", "adjust"]):
-            return "control"
-        elif any(word in text_lower for word in ["what", "when", "where", "how", "who"]):
-            return "query"
-        elif any(word in text_lower for word in ["remind me", "set alarm", "schedule"]):
-            return "reminder"
-        elif any(word in text_lower for word in ["play", "stop", "pause", "next", "previous"]):
-            return "media"
-        elif any(word in text_lower for word in ["send", "message", "call", "text"]):
-            return "communication"
-        else:
-            return "general"
+        lookup = self.INTENT_LOOKUP
+        mask = 0
+        for phrase in self.INTENT_PHRASES.intersection(chain(tokens, bigrams)):
+            mask |= lookup[phrase]
+        
+        return self.INTENT_TABLE[mask]
     
     def get_confidence_score(self, response: str) -> float:
         """
@@ -325,24 +783,4 @@ Be helpful, friendly, and efficient!"""
         Returns:
             Confidence score (0.0 to 1.0)
         """
-        # Simple heuristic-based confidence
-        # In production, use model's confidence scores
-        
-        confidence = 0.8  # Default high confidence
-        
-        # Lower confidence for uncertain phrases
-        uncertain_phrases = [
-            "i'm not sure",
-            "i don't know",
-            "maybe",
-            "perhaps",
-            "i think"
-        ]
-        
-        response_lower = response.lower()
-        for phrase in uncertain_phrases:
-            if phrase in response_lower:
-                confidence = 0.5
-                break
-        
-        return confidence
+        return _confidence_score(response)
@@ -0,0 +1,137 @@
+"""
+Semantic Cache - Embedding-based response cache
+Reuses responses for semantically equivalent requests
+"""
+
+import threading
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Rows allocated for the first stored embedding
+INITIAL_CAPACITY = 16
+
+
+class SemanticCache:
+    """
+    In-memory semantic response cache
+    
+    Stores L2-normalized embeddings in a fixed-size matrix. A lookup
+    returns the cached response of the most similar entry in the same
+    scope when its cosine similarity reaches the threshold. When the
+    cache is full, the least recently used entry is replaced.
+    """
+    
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256):
+        """
+        Initialize semantic cache
+        
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum number of cached responses
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        
+        # Contiguous embedding matrix, allocated once the dimension is known
+        # and grown by doubling up to max_entries rows
+        self._vectors: Optional[np.ndarray] = None
+        
+        # Per-slot scope hash, response and last-use tick
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        self._responses: List[str] = []
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._clock = 0
+        
+        # Shared by the sync and async NLU paths
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._responses)
+    
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _allocate(self, rows: int, dim: int) -> np.ndarray:
+        """Allocate an uninitialized embedding matrix capped at max_entries rows"""
+        return np.empty((min(rows, self.max_entries), dim), dtype=np.float32)
+    
+    def lookup(self, scope: Hashable, embedding: Sequence[float]) -> Optional[str]:
+        """
+        Find a cached response for a similar request
+        
+        Args:
+            scope: Key that cached entries must match exactly
+            embedding: Embedding of the request
+            
+        Returns:
+            Cached response text, or None on a miss
+        """
+        with self._lock:
+            count = len(self._responses)
+            if not count:
+                return None
+            
+            vector = self._normalize(embedding)
+            if vector.shape[0] != self._vectors.shape[1]:
+                return None
+            
+            scores = self._vectors[:count] @ vector
+            scores[self._scopes[:count] != hash(scope)] = -np.inf
+            
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            self._clock += 1
+            self._last_used[best] = self._clock
+            return self._responses[best]
+    
+    def store(self, scope: Hashable, embedding: Sequence[float], response: str):
+        """
+        Cache a response
+        
+        Args:
+            scope: Key that later lookups must match exactly
+            embedding: Embedding of the request
+            response: Response text to cache
+        """
+        vector = self._normalize(embedding)
+        
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = self._allocate(INITIAL_CAPACITY, vector.shape[0])
+            elif vector.shape[0] != self._vectors.shape[1]:
+                logger.warning("Embedding dimension changed; clearing semantic cache")
+                self._vectors = self._allocate(INITIAL_CAPACITY, vector.shape[0])
+                self._responses.clear()
+            
+            count = len(self._responses)
+            if count < self.max_entries:
+                if count == self._vectors.shape[0]:
+                    grown = self._allocate(count * 2, vector.shape[0])
+                    grown[:count] = self._vectors
+                    self._vectors = grown
+                slot = count
+                self._responses.append(response)
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._responses[slot] = response
+            
+            self._vectors[slot] = vector
+            self._scopes[slot] = hash(scope)
+            self._clock += 1
+            self._last_used[slot] = self._clock
+    
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._responses.clear()
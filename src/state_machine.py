@@ -3,8 +3,9 @@ State Machine - System State Management
 Tracks system state and handles state transitions
 """
 
+import types
 from enum import Enum
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable
 
 from src.utils.logging import get_logger
 from src.utils.config import Config
@@ -22,6 +23,11 @@ class SystemState(Enum):
     ERROR = "error"
 
 
+# States in definition order; a state's position is its callback slot
+STATES = tuple(SystemState)
+STATE_ORDINALS: Dict[SystemState, int] = {state: i for i, state in enumerate(STATES)}
+
+
 class StateMachine:
     """
     State Machine for Ambient AI System
@@ -29,6 +35,12 @@ class StateMachine:
     Manages system state transitions and triggers appropriate callbacks
     """
     
+    # States in which the system counts as busy
+    BUSY_STATES = frozenset({
+        SystemState.PROCESSING,
+        SystemState.EXECUTING_ACTION
+    })
+    
     def __init__(self, config: Config):
         """
         Initialize state machine
@@ -41,10 +53,12 @@ class StateMachine:
         self.previous_state = None
         self.state_data: Dict[str, Any] = {}
         
-        # State transition callbacks
-        self.state_callbacks: Dict[SystemState, list] = {
-            state: [] for state in SystemState
-        }
+        # Read-only live view handed out by get_current_state
+        self._state_data_view = types.MappingProxyType(self.state_data)
+        
+        # State transition callbacks, indexed by state ordinal
+        self._ordinals = STATE_ORDINALS
+        self.state_callbacks: List[List[Callable]] = [[] for _ in STATES]
         
         logger.info("State machine initialized")
     
@@ -53,7 +67,7 @@ class StateMachine:
         return {
             "state": self.current_state.value,
             "previous_state": self.previous_state.value if self.previous_state else None,
-            "data": self.state_data.copy()
+            "data": self._state_data_view
         }
     
     def transition_to(self, new_state: SystemState, data: Optional[Dict[str, Any]] = None):
@@ -67,7 +81,7 @@ class StateMachine:
         if new_state == self.current_state:
             return
         
-        logger.info(f"State transition: {self.current_state.value} -> {new_state.value}")
+        logger.info("State transition: %s -> %s", self.current_state.value, new_state.value)
         
         # Store previous state
         self.previous_state = self.current_state
@@ -80,7 +94,7 @@ class StateMachine:
             self.state_data.update(data)
         
         # Execute callbacks
-        self._execute_callbacks(new_state)
+        self._execute_callbacks(self._ordinals[new_state])
     
     def set_state_data(self, key: str, value: Any):
         """Set state data"""
@@ -102,17 +116,17 @@ class StateMachine:
             state: State to monitor
             callback: Callback function (receives state_data dict)
         """
-        self.state_callbacks[state].append(callback)
-        logger.debug(f"Registered callback for state: {state.value}")
+        self.state_callbacks[self._ordinals[state]].append(callback)
+        logger.debug("Registered callback for state: %s", state.value)
     
-    def _execute_callbacks(self, state: SystemState):
-        """Execute registered callbacks for a state"""
-        callbacks = self.state_callbacks.get(state, [])
-        for callback in callbacks:
+    def _execute_callbacks(self, state_idx: int):
+        """Execute registered callbacks for a state (by ordinal)"""
+        for callback in self.state_callbacks[state_idx]:
             try:
                 callback(self.state_data)
             except Exception as e:
-                logger.error(f"Callback error for state {state.value}: {e}", exc_info=True)
+                logger.error("Callback error for state %s: %s", STATES[state_idx].value, e)
+                logger.debug("Callback error traceback", exc_info=True)
     
     def process_input(self, user_input: str):
         """
@@ -139,10 +153,7 @@ class StateMachine:
     
     def is_busy(self) -> bool:
         """Check if system is busy processing"""
-        return self.current_state in [
-            SystemState.PROCESSING,
-            SystemState.EXECUTING_ACTION
-        ]
+        return self.current_state in self.BUSY_STATES
     
     def set_error(self, error_message: str):
         """Set error state"""
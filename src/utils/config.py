@@ -4,7 +4,9 @@ Loads and validates configuration from environment variables
 """
 
 import os
+import sys
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Optional
 
 from dotenv import load_dotenv
@@ -12,6 +14,23 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# String settings reused as dict keys and header values; interned so later
+# lookups compare by identity
+_INTERNED_FIELDS = (
+    "openai_model", "openai_whisper_model", "tts_model", "tts_voice",
+    "default_language", "log_level", "deployment_env", "cloud_provider",
+)
+
+
+def _normalize_origins(origins) -> tuple:
+    """Strip and lowercase origins, dropping empty entries"""
+    return tuple(origin.strip().lower() for origin in origins if origin.strip())
+
+
+def _parse_origins(value: str) -> tuple:
+    """Split a comma-separated origin list into stripped, lowercased entries"""
+    return _normalize_origins(value.split(","))
+
 
 @dataclass
 class Config:
@@ -32,11 +51,13 @@ class Config:
     mic_channels: int = field(default_factory=lambda: int(os.getenv("MIC_CHANNELS", "1")))
     silence_threshold: int = field(default_factory=lambda: int(os.getenv("SILENCE_THRESHOLD", "500")))
     silence_duration: float = field(default_factory=lambda: float(os.getenv("SILENCE_DURATION", "2.0")))
+    min_transcribe_rms: float = field(default_factory=lambda: float(os.getenv("MIN_TRANSCRIBE_RMS", "0.0001")))
     
     # Voice Output Configuration
     tts_model: str = field(default_factory=lambda: os.getenv("TTS_MODEL", "tts-1-hd"))
     tts_voice: str = field(default_factory=lambda: os.getenv("TTS_VOICE", "alloy"))
     tts_speed: float = field(default_factory=lambda: float(os.getenv("TTS_SPEED", "1.0")))
+    tts_response_format: str = field(default_factory=lambda: os.getenv("TTS_RESPONSE_FORMAT", "pcm"))
     
     # Context and Memory Configuration
     max_context_length: int = field(default_factory=lambda: int(os.getenv("MAX_CONTEXT_LENGTH", "10")))
@@ -77,8 +98,18 @@ class Config:
     # Performance Optimization
     enable_caching: bool = field(default_factory=lambda: os.getenv("ENABLE_CACHING", "true").lower() == "true")
     cache_ttl_seconds: int = field(default_factory=lambda: int(os.getenv("CACHE_TTL_SECONDS", "300")))
+    max_audio_cache_entries: int = field(default_factory=lambda: int(os.getenv("MAX_AUDIO_CACHE_ENTRIES", "128")))
+    tts_disk_cache: bool = field(default_factory=lambda: os.getenv("TTS_DISK_CACHE", "false").lower() == "true")
+    use_local_tts: bool = field(default_factory=lambda: os.getenv("USE_LOCAL_TTS", "false").lower() == "true")
+    local_tts_model: str = field(default_factory=lambda: os.getenv("LOCAL_TTS_MODEL", ""))
+    local_tts_max_chars: int = field(default_factory=lambda: int(os.getenv("LOCAL_TTS_MAX_CHARS", "40")))
     use_local_whisper: bool = field(default_factory=lambda: os.getenv("USE_LOCAL_WHISPER", "false").lower() == "true")
     local_whisper_model_size: str = field(default_factory=lambda: os.getenv("LOCAL_WHISPER_MODEL_SIZE", "base"))
+    action_threads: int = field(default_factory=lambda: int(os.getenv("ACTION_THREADS", "4")))
+    enable_semantic_cache: bool = field(default_factory=lambda: os.getenv("ENABLE_SEMANTIC_CACHE", "false").lower() == "true")
+    semantic_cache_threshold: float = field(default_factory=lambda: float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")))
+    semantic_cache_size: int = field(default_factory=lambda: int(os.getenv("SEMANTIC_CACHE_SIZE", "256")))
+    embedding_model: str = field(default_factory=lambda: os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"))
     
     # Advanced Features
     enable_spatial_audio: bool = field(default_factory=lambda: os.getenv("ENABLE_SPATIAL_AUDIO", "false").lower() == "true")
@@ -97,7 +128,7 @@ class Config:
     api_port: int = field(default_factory=lambda: int(os.getenv("API_PORT", "8000")))
     api_workers: int = field(default_factory=lambda: int(os.getenv("API_WORKERS", "1")))
     enable_cors: bool = field(default_factory=lambda: os.getenv("ENABLE_CORS", "true").lower() == "true")
-    allowed_origins: list = field(default_factory=lambda: os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(","))
+    allowed_origins: tuple = field(default_factory=lambda: _parse_origins(os.getenv("ALLOWED_ORIGINS", "http://localhost:3000")))
     
     # Database Configuration
     database_url: str = field(default_factory=lambda: os.getenv("DATABASE_URL", "sqlite:///./data/ambient_ai.db"))
@@ -129,11 +160,43 @@ class Config:
         if self.tts_speed < 0.25 or self.tts_speed > 4.0:
             raise ValueError("TTS_SPEED must be between 0.25 and 4.0")
         
+        if self.tts_response_format not in ("pcm", "wav", "mp3"):
+            raise ValueError("TTS_RESPONSE_FORMAT must be pcm, wav or mp3")
+        
         if self.nlu_temperature < 0 or self.nlu_temperature > 2.0:
             raise ValueError("NLU_TEMPERATURE must be between 0 and 2.0")
         
+        if self.semantic_cache_threshold <= 0 or self.semantic_cache_threshold > 1.0:
+            raise ValueError("SEMANTIC_CACHE_THRESHOLD must be between 0 and 1.0")
+        
         return True
     
     def __post_init__(self):
         """Validate configuration after initialization"""
         self.validate()
+        
+        for name in _INTERNED_FIELDS:
+            setattr(self, name, sys.intern(getattr(self, name)))
+        
+        # Origins passed in directly (not parsed from the environment) are
+        # normalized too, so is_origin_allowed stays case-insensitive
+        if isinstance(self.allowed_origins, str):
+            self.allowed_origins = _parse_origins(self.allowed_origins)
+        else:
+            self.allowed_origins = _normalize_origins(self.allowed_origins)
+    
+    def is_origin_allowed(self, origin: str) -> bool:
+        """Check a request origin against allowed_origins (case-insensitive)"""
+        # Read the current tuple so later reassignment is honoured
+        return origin.strip().lower() in self.allowed_origins
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """
+    Get the shared configuration, loading it on first use
+    
+    Environment changes after the first call are not picked up; call
+    get_config.cache_clear() to reload (e.g. in tests).
+    """
+    return Config()
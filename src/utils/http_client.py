@@ -0,0 +1,36 @@
+"""
+HTTP Client Configuration
+Shared keep-alive connection pools for the OpenAI clients
+"""
+
+import importlib.util
+from typing import Optional
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - installed with openai
+    httpx = None
+
+
+def build_http_client(timeout: float = 15.0) -> Optional["httpx.AsyncClient"]:
+    """
+    Build a keep-alive connection pool for an async OpenAI client
+    
+    Uses HTTP/2 when the h2 package is installed. Returns None (the
+    OpenAI default client) if httpx is unavailable.
+    
+    Args:
+        timeout: Read/write timeout in seconds
+    """
+    if httpx is None:
+        return None
+    
+    return httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        timeout=httpx.Timeout(timeout, connect=3.0),
+        limits=httpx.Limits(
+            max_keepalive_connections=20,
+            max_connections=40,
+            keepalive_expiry=60
+        )
+    )
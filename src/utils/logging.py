@@ -5,11 +5,85 @@ Structured logging with JSON support and Prometheus metrics
 
 import logging
 import sys
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
+import orjson
 import structlog
-from pythonjsonlogger import jsonlogger
+
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class OrjsonFormatter(logging.Formatter):
+    """Format log records as single-line JSON, serialized with orjson"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "@timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "name": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        
+        # Extra values may not be JSON types; fall back to their str()
+        return orjson.dumps(entry, default=str).decode()
+
+
+# structlog method names mapped to stdlib levels and the level names logged
+_METHOD_LEVELS = {
+    "debug": (logging.DEBUG, "debug"),
+    "info": (logging.INFO, "info"),
+    "warning": (logging.WARNING, "warning"),
+    "warn": (logging.WARNING, "warning"),
+    "error": (logging.ERROR, "error"),
+    "exception": (logging.ERROR, "error"),
+    "critical": (logging.CRITICAL, "critical"),
+    "fatal": (logging.CRITICAL, "critical"),
+}
+
+_exception_formatter = logging.Formatter()
+
+
+def _fast_processor(logger, method_name, event_dict):
+    """
+    Single structlog processor doing the work of the stock chain in one call
+    
+    Drops events below the logger's level, then adds the logger name, level
+    and UTC timestamp, applies positional arguments and renders exc_info.
+    """
+    level, level_name = _METHOD_LEVELS.get(method_name, (logging.NOTSET, method_name))
+    if not logger.isEnabledFor(level):
+        raise structlog.DropEvent
+    
+    event_dict["logger"] = logger.name
+    event_dict["level"] = level_name
+    event_dict["timestamp"] = datetime.now(timezone.utc).isoformat()
+    
+    args = event_dict.pop("positional_args", None)
+    if args:
+        if len(args) == 1 and isinstance(args[0], dict) and args[0]:
+            args = args[0]
+        event_dict["event"] = event_dict["event"] % args
+    
+    exc_info = event_dict.pop("exc_info", None)
+    if exc_info:
+        if isinstance(exc_info, BaseException):
+            exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+        elif not isinstance(exc_info, tuple):
+            exc_info = sys.exc_info()
+        event_dict["exception"] = _exception_formatter.formatException(exc_info)
+    
+    return event_dict
 
 
 def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None):
@@ -35,10 +109,7 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None):
     console_handler.setLevel(numeric_level)
     
     # JSON formatter for structured logging
-    json_formatter = jsonlogger.JsonFormatter(
-        '%(timestamp)s %(level)s %(name)s %(message)s',
-        rename_fields={'level': 'severity', 'timestamp': '@timestamp'}
-    )
+    json_formatter = OrjsonFormatter()
     console_handler.setFormatter(json_formatter)
     root_logger.addHandler(console_handler)
     
@@ -55,14 +126,7 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None):
     # Configure structlog
     structlog.configure(
         processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
+            _fast_processor,
             structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         context_class=dict,
@@ -71,9 +135,10 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None):
     )
 
 
+@lru_cache(maxsize=None)
 def get_logger(name: str) -> logging.Logger:
     """
-    Get a logger instance
+    Get a logger instance (cached; logging keeps one logger per name anyway)
     
     Args:
         name: Logger name (typically __name__)
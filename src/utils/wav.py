@@ -0,0 +1,9 @@
+"""
+WAV Helpers
+Header layout shared by audio capture and playback
+"""
+
+import struct
+
+# 44-byte PCM WAV header: RIFF chunk, fmt chunk, data chunk header
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
@@ -5,8 +5,12 @@ Uses OpenAI Whisper for high-accuracy speech recognition
 
 import asyncio
 import io
-import wave
-from typing import Optional, Tuple
+import struct
+import threading
+import time
+from collections import deque
+from functools import cached_property
+from typing import List, Optional, Tuple
 
 import numpy as np
 import sounddevice as sd
@@ -14,9 +18,20 @@ from openai import OpenAI, AsyncOpenAI
 
 from src.utils.logging import get_logger
 from src.utils.config import Config
+from src.utils.wav import WAV_HEADER
 
 logger = get_logger(__name__)
 
+# Initial recording buffer length; grown by doubling if speech runs longer
+RECORD_BUFFER_SECONDS = 10
+
+# Whisper works on 16 kHz mono; faster or multichannel audio is reduced first
+WHISPER_SAMPLE_RATE = 16000
+
+# Wake word listening: stream block length and blocks per detection window
+WAKE_WORD_BLOCK_SECONDS = 0.25
+WAKE_WORD_BLOCKS = 4
+
 
 class VoiceInput:
     """
@@ -31,7 +46,8 @@ class VoiceInput:
         Initialize voice input
         
         Args:
-            config: Configuration object
+            config: Configuration object (injected, or the shared one from
+                get_config())
         """
         self.config = config
         self.sample_rate = config.mic_sample_rate
@@ -40,21 +56,53 @@ class VoiceInput:
         self.silence_threshold = config.silence_threshold
         self.silence_duration = config.silence_duration
         
-        # Initialize OpenAI clients
-        self.client = OpenAI(api_key=config.openai_api_key)
-        self.async_client = AsyncOpenAI(api_key=config.openai_api_key)
+        # Silence detection: a chunk is quiet when its absolute sum is below
+        # the silence level (normalized to the float32 range) times its
+        # sample count, and recording stops after this many quiet chunks
+        self._silence_limit = self.silence_threshold / 32768.0 * self.chunk_size * self.channels
+        self._silence_chunks_needed = int(self.silence_duration * self.sample_rate / self.chunk_size)
+        
+        # Audio handed to Whisper is mono at no more than WHISPER_SAMPLE_RATE
+        self._whisper_rate = min(self.sample_rate, WHISPER_SAMPLE_RATE)
+        self._needs_resample = self.sample_rate != self._whisper_rate
+        
+        # WAV header for the upload format; only the lengths vary per call
+        self._wav_header = WAV_HEADER.pack(
+            b"RIFF", 0, b"WAVE",
+            b"fmt ", 16, 1, 1, self._whisper_rate,
+            self._whisper_rate * 2, 2, 16,
+            b"data", 0
+        )
         
         # Audio buffer
         self.audio_buffer = []
         self.is_recording = False
         
+        # Set once a device check succeeds; devices are not re-enumerated
+        self._devices_ok = False
+        
         # Wake word detection (if enabled)
         self.wake_word_detector = None
         if config.enable_wake_word:
             self._init_wake_word_detector()
         
+        # Local Whisper model (if enabled); None means use the OpenAI API
+        self.local_model = None
+        if config.use_local_whisper:
+            self._init_local_whisper()
+        
         logger.info("Voice input initialized")
     
+    @cached_property
+    def client(self) -> OpenAI:
+        """Sync OpenAI client, created on first use"""
+        return OpenAI(api_key=self.config.openai_api_key)
+    
+    @cached_property
+    def async_client(self) -> AsyncOpenAI:
+        """Async OpenAI client, created on first use"""
+        return AsyncOpenAI(api_key=self.config.openai_api_key)
+    
     def _init_wake_word_detector(self):
         """Initialize wake word detection model"""
         try:
@@ -69,13 +117,34 @@ class VoiceInput:
             logger.error(f"Failed to initialize wake word detector: {e}")
             self.wake_word_detector = None
     
-    def is_ready(self) -> bool:
-        """Check if voice input is ready"""
+    def _init_local_whisper(self):
+        """Load the local faster-whisper model with int8 weights"""
         try:
-            devices = sd.query_devices()
-            return len(devices) > 0
-        except Exception:
-            return False
+            from faster_whisper import WhisperModel
+            
+            self.local_model = WhisperModel(
+                self.config.local_whisper_model_size,
+                compute_type="int8"
+            )
+            logger.info(f"Local Whisper enabled: '{self.config.local_whisper_model_size}'")
+        except ImportError:
+            logger.warning("faster-whisper not installed; using the OpenAI Whisper API")
+        except Exception as e:
+            logger.error(f"Failed to load local Whisper model: {e}")
+            self.local_model = None
+    
+    def is_ready(self) -> bool:
+        """Check if voice input is ready (a successful device check is remembered)"""
+        if not self._devices_ok:
+            try:
+                self._devices_ok = len(sd.query_devices()) > 0
+            except Exception:
+                return False
+        return self._devices_ok
+    
+    def invalidate_device_cache(self):
+        """Re-query audio devices on the next is_ready() call"""
+        self._devices_ok = False
     
     def capture_audio(self, duration: Optional[float] = None) -> np.ndarray:
         """
@@ -109,27 +178,36 @@ class VoiceInput:
     
     def _record_until_silence(self) -> np.ndarray:
         """Record audio until silence is detected"""
-        audio_chunks = []
-        silence_chunks = 0
-        silence_threshold_chunks = int(
-            self.silence_duration * self.sample_rate / self.chunk_size
+        # Blocks are written into one buffer (grown by doubling) rather
+        # than collected and concatenated at the end
+        recording = np.empty(
+            (int(RECORD_BUFFER_SECONDS * self.sample_rate), self.channels),
+            dtype=np.float32
         )
+        recorded = 0
+        silence_chunks = 0
+        silence_threshold_chunks = self._silence_chunks_needed
+        silence_limit = self._silence_limit
+        frame = self.chunk_size
+        checked = 0
         
         logger.info("Recording... (speak now)")
         
+        # The audio thread only copies blocks in; silence is checked by
+        # the polling loop below
         def audio_callback(indata, frames, time, status):
+            nonlocal recording, recorded
+            
             if status:
                 logger.warning(f"Audio callback status: {status}")
             
-            audio_chunks.append(indata.copy())
-            
-            # Check for silence
-            volume = np.abs(indata).mean()
-            if volume < self.silence_threshold / 32768.0:  # Normalize to float32 range
-                nonlocal silence_chunks
-                silence_chunks += 1
-            else:
-                silence_chunks = 0
+            end = recorded + len(indata)
+            if end > len(recording):
+                grown = np.empty((max(end, 2 * len(recording)), self.channels), dtype=np.float32)
+                grown[:recorded] = recording[:recorded]
+                recording = grown
+            recording[recorded:end] = indata
+            recorded = end
         
         # Start recording
         with sd.InputStream(
@@ -141,15 +219,31 @@ class VoiceInput:
             # Wait for silence
             while silence_chunks < silence_threshold_chunks:
                 sd.sleep(100)
+                
+                # Read the length before the buffer: a concurrent grow
+                # copies everything up to the old length first
+                end = recorded
+                buffer = recording
+                
+                # Score all whole chunks recorded since the last poll at once
+                count = (end - checked) // frame
+                if not count:
+                    continue
+                chunks = buffer[checked:checked + count * frame].reshape(count, -1)
+                loud = np.flatnonzero(np.abs(chunks).sum(axis=1) >= silence_limit)
+                if len(loud):
+                    silence_chunks = count - 1 - loud[-1]
+                else:
+                    silence_chunks += count
+                checked += count * frame
         
         logger.info("Recording finished")
         
-        # Concatenate chunks
-        if not audio_chunks:
+        if not recorded:
             return np.array([])
         
-        audio_data = np.concatenate(audio_chunks)
-        return audio_data.flatten()
+        # Contiguous slice, so this is a view rather than a copy
+        return recording[:recorded].ravel()
     
     def transcribe(self, audio_data: np.ndarray) -> str:
         """
@@ -165,6 +259,14 @@ class VoiceInput:
             return ""
         
         try:
+            # Short clips can decimate to nothing
+            audio_data = self._to_whisper_format(audio_data)
+            if len(audio_data) == 0 or self._is_silent(audio_data):
+                return ""
+            
+            if self.local_model:
+                return self._transcribe_local(audio_data)
+            
             # Convert numpy array to WAV bytes
             wav_bytes = self._numpy_to_wav(audio_data)
             
@@ -195,6 +297,14 @@ class VoiceInput:
             return ""
         
         try:
+            # Short clips can decimate to nothing
+            audio_data = self._to_whisper_format(audio_data)
+            if len(audio_data) == 0 or self._is_silent(audio_data):
+                return ""
+            
+            if self.local_model:
+                return await asyncio.to_thread(self._transcribe_local, audio_data)
+            
             # Convert numpy array to WAV bytes
             wav_bytes = self._numpy_to_wav(audio_data)
             
@@ -219,60 +329,164 @@ class VoiceInput:
             logger.error(f"Transcription error: {e}", exc_info=True)
             return ""
     
+    def _transcribe_local(self, audio_data: np.ndarray) -> str:
+        """Transcribe with the local model; it takes float32 samples directly"""
+        try:
+            logger.info("Transcribing audio locally...")
+            segments, _ = self.local_model.transcribe(
+                np.asarray(audio_data, dtype=np.float32).ravel(),
+                language=self.config.default_language
+            )
+            
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+            logger.info(f"Transcription: {text}")
+            
+            return text
+            
+        except Exception as e:
+            logger.error(f"Transcription error: {e}", exc_info=True)
+            return ""
+    
+    async def transcribe_batch_async(self, audio_clips: List[np.ndarray]) -> List[str]:
+        """
+        Transcribe several clips concurrently
+        
+        Requests share the async client's connection pool and overlap on
+        the network, so the batch takes about as long as the slowest clip.
+        
+        Args:
+            audio_clips: Audio data arrays
+            
+        Returns:
+            Transcribed text per clip, in order ("" for failed clips)
+        """
+        return list(await asyncio.gather(
+            *(self.transcribe_async(audio_data) for audio_data in audio_clips)
+        ))
+    
+    def _to_whisper_format(self, audio_data: np.ndarray) -> np.ndarray:
+        """Downmix to mono and downsample to the Whisper rate if needed"""
+        audio_data = np.asarray(audio_data, dtype=np.float32).ravel()
+        
+        # Recordings are interleaved frame by frame; drop a trailing partial frame
+        if self.channels > 1:
+            usable = len(audio_data) - len(audio_data) % self.channels
+            audio_data = audio_data[:usable].reshape(-1, self.channels).mean(axis=1)
+        
+        if not self._needs_resample:
+            return audio_data
+        
+        # Integer ratios (48 kHz, 32 kHz) average each group of samples, which
+        # also low-passes; other rates (44.1 kHz) interpolate linearly
+        factor, remainder = divmod(self.sample_rate, self._whisper_rate)
+        if not remainder:
+            usable = len(audio_data) - len(audio_data) % factor
+            return audio_data[:usable].reshape(-1, factor).mean(axis=1)
+        
+        count = len(audio_data) * self._whisper_rate // self.sample_rate
+        positions = np.arange(count) * (self.sample_rate / self._whisper_rate)
+        return np.interp(positions, np.arange(len(audio_data)), audio_data).astype(np.float32)
+    
+    def _is_silent(self, audio_data: np.ndarray) -> bool:
+        """Check whether audio is below the RMS floor worth transcribing"""
+        rms = float(np.sqrt(np.mean(np.square(audio_data), dtype=np.float64)))
+        if rms < self.config.min_transcribe_rms:
+            logger.debug("Skipping transcription of silent audio (RMS %.2e)", rms)
+            return True
+        return False
+    
     def _numpy_to_wav(self, audio_data: np.ndarray) -> bytes:
         """Convert numpy array to WAV format bytes"""
-        # Ensure audio is in correct format
-        audio_data = audio_data.astype(np.float32)
+        # Ensure audio is in correct format (no copy if already float32)
+        audio_data = np.asarray(audio_data, dtype=np.float32)
         
-        # Convert to 16-bit PCM
-        audio_int16 = (audio_data * 32767).astype(np.int16)
+        # Convert to 16-bit PCM, scaling straight into the int16 output
+        # instead of through a temporary float array
+        audio_int16 = np.multiply(
+            audio_data, np.float32(32767),
+            out=np.empty(audio_data.shape, dtype=np.int16),
+            casting='unsafe'
+        )
         
-        # Create WAV file in memory
-        wav_buffer = io.BytesIO()
-        with wave.open(wav_buffer, 'wb') as wav_file:
-            wav_file.setnchannels(self.channels)
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_int16.tobytes())
+        # Prepend the precomputed header with the length fields filled in
+        pcm = audio_int16.tobytes()
+        header = bytearray(self._wav_header)
+        struct.pack_into("<I", header, 4, 36 + len(pcm))
+        struct.pack_into("<I", header, 40, len(pcm))
         
-        return wav_buffer.getvalue()
+        return b"".join((header, pcm))
     
-    def wait_for_wake_word(self, timeout: Optional[float] = None) -> bool:
+    def wait_for_wake_word(
+        self,
+        timeout: Optional[float] = None,
+        stop_event: Optional[threading.Event] = None
+    ) -> bool:
         """
         Wait for wake word detection
         
         Args:
             timeout: Maximum time to wait in seconds
+            stop_event: Event that ends the wait early when set
             
         Returns:
-            True if wake word detected, False if timeout
+            True if wake word detected, False if timeout or stopped
         """
         if not self.wake_word_detector:
             return True  # If no wake word detector, always return True
         
         logger.info(f"Listening for wake word: '{self.config.wake_word}'")
         
-        start_time = asyncio.get_event_loop().time() if timeout else None
+        # Blocks queued by the audio thread; the newest WAKE_WORD_BLOCKS of
+        # them form the sliding window handed to the detector
+        pending = deque(maxlen=WAKE_WORD_BLOCKS)
+        window = deque(maxlen=WAKE_WORD_BLOCKS)
         
-        while True:
-            # Capture short audio chunk
-            audio_chunk = self.capture_audio(duration=1.0)
-            
-            # Check for wake word
-            if self.wake_word_detector.detect(audio_chunk):
-                logger.info("Wake word detected!")
-                return True
-            
-            # Check timeout
-            if timeout and start_time:
-                elapsed = asyncio.get_event_loop().time() - start_time
-                if elapsed >= timeout:
+        def callback(indata, frames, time_info, status):
+            if status:
+                logger.warning(f"Audio callback status: {status}")
+            pending.append(indata.copy())
+        
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        with sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            blocksize=int(self.sample_rate * WAKE_WORD_BLOCK_SECONDS),
+            callback=callback
+        ):
+            while True:
+                sd.sleep(50)
+                
+                if pending:
+                    while pending:
+                        window.append(pending.popleft())
+                    
+                    # Check for wake word
+                    if self.wake_word_detector.detect(np.concatenate(window).flatten()):
+                        logger.info("Wake word detected!")
+                        return True
+                
+                # Check timeout
+                if deadline is not None and time.monotonic() >= deadline:
                     logger.info("Wake word detection timeout")
                     return False
+                
+                if stop_event is not None and stop_event.is_set():
+                    logger.info("Wake word detection stopped")
+                    return False
     
-    async def wait_for_wake_word_async(self, timeout: Optional[float] = None) -> bool:
-        """Async version of wait_for_wake_word"""
-        return await asyncio.to_thread(self.wait_for_wake_word, timeout)
+    async def wait_for_wake_word_async(
+        self,
+        timeout: Optional[float] = None,
+        stop_event: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Async version of wait_for_wake_word
+        
+        Cancelling the awaiting task does not stop the worker thread; set
+        stop_event to end the wait.
+        """
+        return await asyncio.to_thread(self.wait_for_wake_word, timeout, stop_event)
     
     def cleanup(self):
         """Clean up resources"""
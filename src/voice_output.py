@@ -4,20 +4,84 @@ Uses OpenAI TTS for natural-sounding speech output
 """
 
 import asyncio
+import hashlib
 import io
+import math
+import shutil
+import subprocess
+import threading
+import unicodedata
+import wave
+from collections import OrderedDict, deque
+from functools import cached_property
 from pathlib import Path
 from typing import Optional
 
-import sounddevice as sd
 import numpy as np
-from pydub import AudioSegment
 from openai import OpenAI, AsyncOpenAI
 
 from src.utils.logging import get_logger
 from src.utils.config import Config
+from src.utils.http_client import build_http_client
+from src.utils.wav import WAV_HEADER
 
 logger = get_logger(__name__)
 
+# sounddevice initializes PortAudio (and probes ALSA) on import, so it and
+# soundfile are only imported once playback or MP3 decoding is needed.
+# sf is False once soundfile is known to be unavailable
+sd = None
+sf = None
+
+
+def _sounddevice():
+    """Import sounddevice on first use"""
+    global sd
+    if sd is None:
+        import sounddevice
+        sd = sounddevice
+    return sd
+
+
+def _soundfile():
+    """Import soundfile on first use; None if it or libsndfile is missing"""
+    global sf
+    if sf is None:
+        try:
+            import soundfile
+        except (ImportError, OSError):
+            sf = False
+        else:
+            sf = soundfile
+    return sf or None
+
+
+def _resolve(future: asyncio.Future) -> None:
+    """Complete a playback future unless its waiter already gave up"""
+    if not future.done():
+        future.set_result(None)
+
+
+# OpenAI TTS returns 24 kHz mono audio; PCM responses are signed 16-bit
+TTS_SAMPLE_RATE = 24000
+
+# Chime tones (Hz): A5, C6, A4
+CHIME_FREQUENCIES = {"wake": 880, "success": 1046, "error": 440}
+
+# Maximum concurrent TTS requests while preloading phrases
+PRELOAD_CONCURRENCY = 8
+
+# Uncached speech and text longer than this is streamed while it downloads
+STREAM_TEXT_LENGTH = 200
+STREAM_CHUNK_BYTES = 4096
+
+# Frames per buffer of the shared playback stream
+PLAYBACK_BLOCKSIZE = 1024
+
+# Extra seconds to wait beyond an utterance's length before assuming the
+# output device has stopped pulling samples
+PLAYBACK_TIMEOUT_MARGIN = 2.0
+
 
 class VoiceOutput:
     """
@@ -35,32 +99,105 @@ class VoiceOutput:
             config: Configuration object
         """
         self.config = config
-        self.sample_rate = config.mic_sample_rate  # Use same sample rate as input
+        self.sample_rate = TTS_SAMPLE_RATE  # Play at the TTS native rate
         
-        # Initialize OpenAI clients
-        self.client = OpenAI(api_key=config.openai_api_key)
-        self.async_client = AsyncOpenAI(api_key=config.openai_api_key)
+        # OpenAI clients are created on first use (see client/async_client)
+        self._http_client = None
         
         # TTS configuration
         self.tts_model = config.tts_model
         self.tts_voice = config.tts_voice
         self.tts_speed = config.tts_speed
+        self.tts_response_format = config.tts_response_format
+        
+        # MP3 fallback decoder when soundfile is not installed
+        self._ffmpeg = shutil.which("ffmpeg")
+        
+        # Polyphase filters by source rate (None: scipy missing, interpolate)
+        self._resample_filters = {}
+        
+        # Local Piper voice for short phrases and API failures (optional)
+        self.local_tts = None
+        if config.use_local_tts:
+            self._init_local_tts()
+        
+        # Settings that shape the audio, hashed into every cache key
+        self._cache_key_prefix = f"{self.tts_model}:{self.tts_voice}:{self.tts_speed}:".encode("utf-8")
         
-        # Audio cache for frequently used phrases
-        self.audio_cache = {}
+        # Audio cache for frequently used phrases, least recently used first
+        self.audio_cache = OrderedDict()
+        self.max_cache_entries = config.max_audio_cache_entries
+        
+        # Optional on-disk copy of the cache, reused across restarts
+        self._cache_dir = None
+        if config.tts_disk_cache:
+            self._cache_dir = Path(config.audio_save_path) / "tts_cache"
+        
+        # Chime waveforms, rendered once in the playback stream's format
+        self._chimes = {
+            name: self._to_int16(self._render_chime(frequency))
+            for name, frequency in CHIME_FREQUENCIES.items()
+        }
         
         # Playback queue for streaming
         self.playback_queue = asyncio.Queue()
         
+        # Set once a device check succeeds; devices are not re-enumerated
+        self._devices_ok = False
+        
+        # Output stream kept open across utterances, opened on first playback.
+        # Its callback drains queued [samples, position, on_done] entries in
+        # order and plays silence when the queue is empty
+        self._stream = None
+        self._stream_lock = threading.Lock()
+        self._pending_audio = deque()
+        
         logger.info(f"Voice output initialized (voice: {self.tts_voice})")
     
-    def is_ready(self) -> bool:
-        """Check if voice output is ready"""
+    @cached_property
+    def client(self) -> OpenAI:
+        """Sync OpenAI client, created on first use"""
+        return OpenAI(api_key=self.config.openai_api_key)
+    
+    @cached_property
+    def async_client(self) -> AsyncOpenAI:
+        """Async OpenAI client on a pooled keep-alive connection, created on first use"""
+        self._http_client = build_http_client(timeout=30.0)
+        return AsyncOpenAI(
+            api_key=self.config.openai_api_key,
+            http_client=self._http_client
+        )
+    
+    def _init_local_tts(self):
+        """Load the local Piper voice model"""
         try:
-            devices = sd.query_devices()
-            return len(devices) > 0
-        except Exception:
-            return False
+            from piper import PiperVoice
+            
+            self.local_tts = PiperVoice.load(self.config.local_tts_model)
+            logger.info(f"Local TTS enabled: '{self.config.local_tts_model}'")
+        except ImportError:
+            logger.warning("piper-tts not installed; using the OpenAI TTS API")
+        except Exception as e:
+            logger.error(f"Failed to load local TTS model: {e}")
+            self.local_tts = None
+    
+    async def aclose(self):
+        """Close the pooled HTTP connections of the async client"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+    
+    def is_ready(self) -> bool:
+        """Check if voice output is ready (a successful device check is remembered)"""
+        if not self._devices_ok:
+            try:
+                self._devices_ok = len(_sounddevice().query_devices()) > 0
+            except Exception:
+                return False
+        return self._devices_ok
+    
+    def invalidate_device_cache(self):
+        """Re-query audio devices on the next is_ready() call"""
+        self._devices_ok = False
     
     def speak(self, text: str, use_cache: bool = True) -> None:
         """
@@ -74,11 +211,16 @@ class VoiceOutput:
             return
         
         try:
+            if self._should_stream(text, use_cache):
+                logger.info(f"Streaming speech: {text[:50]}...")
+                self._stream_speech(text)
+                return
+            
             # Check cache first
             cache_key = self._get_cache_key(text)
-            if use_cache and cache_key in self.audio_cache:
+            audio_data = self._cache_get(cache_key) if use_cache else None
+            if audio_data is not None:
                 logger.info(f"Using cached audio for: {text[:50]}...")
-                audio_data = self.audio_cache[cache_key]
             else:
                 # Generate speech
                 logger.info(f"Generating speech: {text[:50]}...")
@@ -86,7 +228,7 @@ class VoiceOutput:
                 
                 # Cache if enabled
                 if use_cache and self.config.enable_caching:
-                    self.audio_cache[cache_key] = audio_data
+                    self._cache_put(cache_key, audio_data)
             
             # Play audio
             self._play_audio(audio_data)
@@ -100,11 +242,16 @@ class VoiceOutput:
             return
         
         try:
+            if self._should_stream(text, use_cache):
+                logger.info(f"Streaming speech: {text[:50]}...")
+                await self._stream_speech_async(text)
+                return
+            
             # Check cache first
             cache_key = self._get_cache_key(text)
-            if use_cache and cache_key in self.audio_cache:
+            audio_data = self._cache_get(cache_key) if use_cache else None
+            if audio_data is not None:
                 logger.info(f"Using cached audio for: {text[:50]}...")
-                audio_data = self.audio_cache[cache_key]
             else:
                 # Generate speech
                 logger.info(f"Generating speech: {text[:50]}...")
@@ -112,7 +259,7 @@ class VoiceOutput:
                 
                 # Cache if enabled
                 if use_cache and self.config.enable_caching:
-                    self.audio_cache[cache_key] = audio_data
+                    self._cache_put(cache_key, audio_data)
             
             # Play audio
             await self._play_audio_async(audio_data)
@@ -120,92 +267,349 @@ class VoiceOutput:
         except Exception as e:
             logger.error(f"Speech synthesis error: {e}", exc_info=True)
     
+    def _should_stream(self, text: str, use_cache: bool) -> bool:
+        """Stream speech that won't be cached or is long; short phrases stay cached"""
+        return (
+            self.tts_response_format == "pcm"
+            and not self._use_local_tts(text)
+            and (not use_cache or len(text) > STREAM_TEXT_LENGTH)
+        )
+    
+    def _use_local_tts(self, text: str) -> bool:
+        """Short phrases are synthesized locally when a local voice is loaded"""
+        return self.local_tts is not None and len(text) <= self.config.local_tts_max_chars
+    
+    def _stream_speech(self, text: str) -> None:
+        """Play PCM speech chunk by chunk as it downloads"""
+        with self.client.audio.speech.with_streaming_response.create(
+            model=self.tts_model,
+            voice=self.tts_voice,
+            input=text,
+            speed=self.tts_speed,
+            response_format="pcm"
+        ) as response:
+            # Fixed-size chunks are whole 16-bit frames
+            queued = 0
+            for chunk in response.iter_bytes(chunk_size=STREAM_CHUNK_BYTES):
+                samples = np.frombuffer(chunk, dtype=np.int16)
+                self._enqueue(samples)
+                queued += len(samples)
+        
+        # An empty entry marks the end of the speech in the queue
+        done = threading.Event()
+        self._enqueue(np.zeros(0, dtype=np.int16), done.set)
+        if not done.wait(self._playback_timeout(queued)):
+            self._close_stream()
+            raise TimeoutError("Audio device stopped consuming samples")
+        
+        logger.info("Audio playback complete")
+    
+    async def _stream_speech_async(self, text: str) -> None:
+        """Async version of _stream_speech; downloads on the pooled async client"""
+        async with self.async_client.audio.speech.with_streaming_response.create(
+            model=self.tts_model,
+            voice=self.tts_voice,
+            input=text,
+            speed=self.tts_speed,
+            response_format="pcm"
+        ) as response:
+            # Fixed-size chunks are whole 16-bit frames
+            queued = 0
+            async for chunk in response.iter_bytes(chunk_size=STREAM_CHUNK_BYTES):
+                samples = np.frombuffer(chunk, dtype=np.int16)
+                self._enqueue(samples)
+                queued += len(samples)
+        
+        # An empty entry marks the end of the speech in the queue
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        self._enqueue(np.zeros(0, dtype=np.int16), lambda: loop.call_soon_threadsafe(_resolve, done))
+        try:
+            await asyncio.wait_for(done, self._playback_timeout(queued))
+        except asyncio.TimeoutError:
+            self._close_stream()
+            raise TimeoutError("Audio device stopped consuming samples") from None
+        
+        logger.info("Audio playback complete")
+    
     def _generate_speech(self, text: str) -> np.ndarray:
-        """Generate speech from text using OpenAI TTS"""
+        """Generate speech from text using OpenAI TTS (or the local voice, see _use_local_tts)"""
+        if self._use_local_tts(text):
+            return self._generate_speech_local(text)
+        
         try:
             # Call OpenAI TTS API
             response = self.client.audio.speech.create(
                 model=self.tts_model,
                 voice=self.tts_voice,
                 input=text,
-                speed=self.tts_speed
+                speed=self.tts_speed,
+                response_format=self.tts_response_format
             )
             
-            # Get MP3 audio bytes
+            # Get audio bytes
             audio_bytes = response.content
             
             # Convert to numpy array
-            audio_data = self._mp3_to_numpy(audio_bytes)
+            audio_data = self._decode_audio(audio_bytes)
             
             return audio_data
             
         except Exception as e:
             logger.error(f"TTS generation error: {e}", exc_info=True)
-            raise
+            if self.local_tts is None:
+                raise
+            logger.warning("Falling back to local TTS")
+            return self._generate_speech_local(text)
     
     async def _generate_speech_async(self, text: str) -> np.ndarray:
         """Async version of _generate_speech"""
+        if self._use_local_tts(text):
+            return await asyncio.to_thread(self._generate_speech_local, text)
+        
         try:
             # Call OpenAI TTS API
             response = await self.async_client.audio.speech.create(
                 model=self.tts_model,
                 voice=self.tts_voice,
                 input=text,
-                speed=self.tts_speed
+                speed=self.tts_speed,
+                response_format=self.tts_response_format
             )
             
-            # Get MP3 audio bytes
+            # Get audio bytes
             audio_bytes = response.content
             
             # Convert to numpy array
-            audio_data = self._mp3_to_numpy(audio_bytes)
+            audio_data = self._decode_audio(audio_bytes)
             
             return audio_data
             
         except Exception as e:
             logger.error(f"TTS generation error: {e}", exc_info=True)
-            raise
+            if self.local_tts is None:
+                raise
+            logger.warning("Falling back to local TTS")
+            return await asyncio.to_thread(self._generate_speech_local, text)
     
-    def _mp3_to_numpy(self, mp3_bytes: bytes) -> np.ndarray:
-        """Convert MP3 bytes to numpy array"""
-        # Load MP3 with pydub
-        audio = AudioSegment.from_mp3(io.BytesIO(mp3_bytes))
+    def _generate_speech_local(self, text: str) -> np.ndarray:
+        """Synthesize speech with the local Piper voice as int16 at the playback rate"""
+        chunks = list(self.local_tts.synthesize(text))
+        if not chunks:
+            return np.zeros(0, dtype=np.int16)
+        
+        audio = np.concatenate([chunk.audio_int16_array for chunk in chunks])
+        rate = chunks[0].sample_rate
+        
+        # Piper voices are usually 22.05 kHz
+        return audio if rate == self.sample_rate else self._resample(audio, rate)
+    
+    def _decode_audio(self, audio_bytes: bytes) -> np.ndarray:
+        """
+        Convert TTS response bytes to samples for the configured format
+        
+        PCM and WAV responses stay int16 (sounddevice plays them as-is,
+        at half the memory of float32); MP3 decodes to float32.
+        """
+        if self.tts_response_format == "pcm":
+            return self._pcm_to_numpy(audio_bytes)
+        elif self.tts_response_format == "wav":
+            return self._wav_to_numpy(audio_bytes)
+        return self._mp3_to_numpy(audio_bytes)
+    
+    @staticmethod
+    def _pcm_to_numpy(pcm_bytes: bytes) -> np.ndarray:
+        """Wrap raw signed 16-bit PCM as an int16 array; no decoding or copy"""
+        return np.frombuffer(pcm_bytes, dtype=np.int16)
+    
+    @staticmethod
+    def _to_int16(audio_data: np.ndarray) -> np.ndarray:
+        """Quantize float samples to int16 (int16 input is returned as-is)"""
+        if audio_data.dtype == np.int16:
+            return audio_data
         
-        # Convert to numpy array
-        samples = np.array(audio.get_array_of_samples())
+        # Clip to [-1, 1] so loud frames can't wrap, then scale straight
+        # into an int16 buffer
+        audio_data = np.clip(audio_data, -1.0, 1.0)
+        return np.multiply(
+            audio_data, np.float32(32767),
+            out=np.empty(audio_data.shape, dtype=np.int16),
+            casting='unsafe'
+        )
+    
+    def _wav_to_numpy(self, wav_bytes: bytes) -> np.ndarray:
+        """Convert 16-bit WAV bytes to int16 mono samples"""
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wav_file:
+            samples = self._pcm_to_numpy(wav_file.readframes(wav_file.getnframes()))
+            channels = wav_file.getnchannels()
         
-        # Normalize to float32 range [-1, 1]
-        if audio.sample_width == 1:  # 8-bit
-            samples = samples.astype(np.float32) / 128.0
-        elif audio.sample_width == 2:  # 16-bit
-            samples = samples.astype(np.float32) / 32768.0
-        elif audio.sample_width == 4:  # 32-bit
-            samples = samples.astype(np.float32) / 2147483648.0
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+        return samples
+    
+    def _mp3_to_numpy(self, mp3_bytes: bytes) -> np.ndarray:
+        """
+        Decode MP3 bytes to float32 mono at the playback rate
         
-        # Handle stereo to mono conversion if needed
-        if audio.channels == 2:
-            samples = samples.reshape((-1, 2)).mean(axis=1)
+        libsndfile (through soundfile) decodes in-process; ffmpeg is used
+        when soundfile is not installed.
+        """
+        soundfile = _soundfile()
+        if soundfile is None:
+            if not self._ffmpeg:
+                raise RuntimeError("MP3 decoding needs the soundfile package or ffmpeg")
+            return self._decode_with_ffmpeg(mp3_bytes)
         
+        samples, rate = soundfile.read(io.BytesIO(mp3_bytes), dtype="float32", always_2d=False)
+        if samples.ndim == 2:
+            samples = samples.mean(axis=1, dtype=np.float32)
+        if rate != self.sample_rate:
+            samples = self._resample(samples, rate)
         return samples
     
+    def _resample(self, samples: np.ndarray, rate: int) -> np.ndarray:
+        """
+        Resample from rate to the playback rate
+        
+        Uses a polyphase filter when scipy is installed, with the FIR taps
+        designed once per source rate; otherwise interpolates linearly.
+        """
+        if rate not in self._resample_filters:
+            self._resample_filters[rate] = self._design_resample_filter(rate)
+        design = self._resample_filters[rate]
+        
+        if design is None:
+            count = len(samples) * self.sample_rate // rate
+            positions = np.arange(count) * (rate / self.sample_rate)
+            return np.interp(positions, np.arange(len(samples)), samples).astype(samples.dtype)
+        
+        from scipy.signal import resample_poly
+        
+        up, down, taps = design
+        resampled = resample_poly(samples, up, down, window=taps)
+        if np.issubdtype(samples.dtype, np.integer):
+            limits = np.iinfo(samples.dtype)
+            resampled = np.clip(resampled, limits.min, limits.max)
+        return resampled.astype(samples.dtype)
+    
+    def _design_resample_filter(self, rate: int) -> Optional[tuple]:
+        """Polyphase (up, down, taps) from rate to the playback rate; None without scipy"""
+        try:
+            from scipy.signal import firwin
+        except ImportError:
+            return None
+        
+        divisor = math.gcd(self.sample_rate, rate)
+        up, down = self.sample_rate // divisor, rate // divisor
+        
+        # The low-pass resample_poly would design on every call
+        taps = firwin(20 * max(up, down) + 1, 1.0 / max(up, down), window=("kaiser", 5.0))
+        return up, down, taps
+    
+    def _decode_with_ffmpeg(self, mp3_bytes: bytes) -> np.ndarray:
+        """
+        Decode MP3 bytes with one ffmpeg call, piped in and out
+        
+        ffmpeg downmixes to mono and resamples to the playback rate, so
+        the output can be played as-is.
+        """
+        proc = subprocess.run(
+            [
+                self._ffmpeg, "-v", "quiet",
+                "-i", "pipe:0",
+                "-f", "f32le", "-ac", "1", "-ar", str(self.sample_rate),
+                "pipe:1"
+            ],
+            input=mp3_bytes,
+            stdout=subprocess.PIPE,
+            check=True
+        )
+        return np.frombuffer(proc.stdout, dtype=np.float32)
+    
+    def _output_stream(self):
+        """Open the shared 16-bit mono output stream on first use"""
+        with self._stream_lock:
+            if self._stream is None:
+                stream = _sounddevice().OutputStream(
+                    samplerate=self.sample_rate,
+                    channels=1,
+                    dtype="int16",
+                    blocksize=PLAYBACK_BLOCKSIZE,
+                    latency="low",
+                    callback=self._fill_output
+                )
+                stream.start()
+                self._stream = stream
+            return self._stream
+    
+    def _close_stream(self) -> None:
+        """Close the shared output stream; the next playback reopens it"""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.close(ignore_errors=True)
+        self._pending_audio.clear()
+    
+    def _fill_output(self, outdata, frames: int, time, status) -> None:
+        """Stream callback: copy queued samples into the device buffer"""
+        out = outdata[:, 0]
+        filled = 0
+        while self._pending_audio:
+            entry = self._pending_audio[0]
+            samples, position, on_done = entry
+            count = min(frames - filled, len(samples) - position)
+            out[filled:filled + count] = samples[position:position + count]
+            filled += count
+            entry[1] = position + count
+            if entry[1] < len(samples):
+                break
+            self._pending_audio.popleft()
+            if on_done is not None:
+                on_done()
+        out[filled:] = 0
+    
+    def _enqueue(self, audio_data: np.ndarray, on_done=None) -> None:
+        """Queue samples for playback; on_done runs on the audio thread once all are consumed"""
+        self._output_stream()
+        self._pending_audio.append([self._to_int16(audio_data), 0, on_done])
+    
+    def _playback_timeout(self, samples: int) -> float:
+        """Seconds to wait for an utterance of this many samples to be consumed"""
+        return samples / self.sample_rate + PLAYBACK_TIMEOUT_MARGIN
+    
     def _play_audio(self, audio_data: np.ndarray) -> None:
         """Play audio through default audio device"""
         try:
             logger.info("Playing audio...")
             
-            # Play audio
-            sd.play(audio_data, samplerate=self.sample_rate)
-            sd.wait()  # Wait until audio finishes playing
+            done = threading.Event()
+            self._enqueue(audio_data, done.set)
+            if not done.wait(self._playback_timeout(len(audio_data))):
+                raise TimeoutError("Audio device stopped consuming samples")
             
             logger.info("Audio playback complete")
             
         except Exception as e:
             logger.error(f"Audio playback error: {e}", exc_info=True)
+            # Reopen on the next call, e.g. after the device went away
+            self._close_stream()
             raise
     
     async def _play_audio_async(self, audio_data: np.ndarray) -> None:
-        """Async version of _play_audio"""
-        await asyncio.to_thread(self._play_audio, audio_data)
+        """Async version of _play_audio; awaits the stream callback instead of blocking a thread"""
+        try:
+            logger.info("Playing audio...")
+            
+            loop = asyncio.get_running_loop()
+            done = loop.create_future()
+            self._enqueue(audio_data, lambda: loop.call_soon_threadsafe(_resolve, done))
+            await asyncio.wait_for(done, self._playback_timeout(len(audio_data)))
+            
+            logger.info("Audio playback complete")
+            
+        except Exception as e:
+            logger.error(f"Audio playback error: {e}", exc_info=True)
+            self._close_stream()
+            raise
     
     def play_chime(self, chime_type: str = "wake") -> None:
         """
@@ -214,35 +618,115 @@ class VoiceOutput:
         Args:
             chime_type: Type of chime ('wake', 'success', 'error')
         """
-        # Generate simple tone
-        duration = 0.2  # seconds
-        frequency = {
-            "wake": 880,  # A5
-            "success": 1046,  # C6
-            "error": 440  # A4
-        }.get(chime_type, 880)
-        
-        t = np.linspace(0, duration, int(self.sample_rate * duration))
-        tone = 0.3 * np.sin(2 * np.pi * frequency * t)
+        self._play_audio(self._chimes.get(chime_type, self._chimes["wake"]))
+    
+    def _render_chime(self, frequency: float, duration: float = 0.2) -> np.ndarray:
+        """Render a faded sine tone as float32"""
+        t = np.arange(int(self.sample_rate * duration), dtype=np.float32) / self.sample_rate
+        tone = np.float32(0.3) * np.sin(np.float32(2 * np.pi * frequency) * t)
         
         # Apply fade in/out
         fade_samples = int(0.01 * self.sample_rate)
-        tone[:fade_samples] *= np.linspace(0, 1, fade_samples)
-        tone[-fade_samples:] *= np.linspace(1, 0, fade_samples)
+        tone[:fade_samples] *= np.linspace(0, 1, fade_samples, dtype=np.float32)
+        tone[-fade_samples:] *= np.linspace(1, 0, fade_samples, dtype=np.float32)
         
-        self._play_audio(tone)
+        return tone
     
     async def play_chime_async(self, chime_type: str = "wake") -> None:
         """Async version of play_chime"""
-        await asyncio.to_thread(self.play_chime, chime_type)
+        await self._play_audio_async(self._chimes.get(chime_type, self._chimes["wake"]))
+    
+    async def chime_then_speak(self, text: str, chime_type: str = "wake", use_cache: bool = True) -> None:
+        """
+        Play a chime, then speak text, synthesizing during the chime
+        
+        The TTS request is started before the chime plays, so its network
+        latency overlaps the chime instead of following it.
+        
+        Args:
+            text: Text to speak
+            chime_type: Type of chime ('wake', 'success', 'error')
+            use_cache: Whether to use cached audio for this text
+        """
+        if not text or text.strip() == "":
+            await self.play_chime_async(chime_type)
+            return
+        
+        cache_key = self._get_cache_key(text)
+        audio_data = self._cache_get(cache_key) if use_cache else None
+        generation = None
+        if audio_data is None:
+            logger.info(f"Generating speech: {text[:50]}...")
+            generation = asyncio.create_task(self._generate_speech_async(text))
+        
+        try:
+            await self.play_chime_async(chime_type)
+            
+            if generation is not None:
+                audio_data = await generation
+                if use_cache and self.config.enable_caching:
+                    self._cache_put(cache_key, audio_data)
+            
+            await self._play_audio_async(audio_data)
+            
+        except Exception as e:
+            if generation is not None:
+                generation.cancel()
+            logger.error(f"Speech synthesis error: {e}", exc_info=True)
+    
+    def _get_cache_key(self, text: str) -> bytes:
+        """
+        Generate cache key from the full text and the settings that shape the audio
+        
+        Text is NFC-normalized so composed and decomposed spellings of the
+        same phrase share an entry. Keys are raw 16-byte digests.
+        """
+        digest = hashlib.blake2b(self._cache_key_prefix, digest_size=16)
+        digest.update(unicodedata.normalize("NFC", text).encode("utf-8"))
+        return digest.digest()
+    
+    def _cache_get(self, cache_key: bytes) -> Optional[np.ndarray]:
+        """Look up cached audio in memory, then on disk"""
+        audio_data = self.audio_cache.get(cache_key)
+        if audio_data is not None:
+            self.audio_cache.move_to_end(cache_key)
+            return audio_data
+        
+        if self._cache_dir is None:
+            return None
+        
+        cache_path = self._cache_dir / f"{cache_key.hex()}.s16"
+        try:
+            audio_data = np.fromfile(cache_path, dtype=np.int16)
+        except OSError:
+            return None
+        
+        self._remember(cache_key, audio_data)
+        return audio_data
     
-    def _get_cache_key(self, text: str) -> str:
-        """Generate cache key from text"""
-        # Use first 100 chars as key (enough to differentiate)
-        return f"{self.tts_voice}:{text[:100]}"
+    def _cache_put(self, cache_key: bytes, audio_data: np.ndarray) -> None:
+        """Cache audio as int16 in memory and, if enabled, on disk"""
+        audio_data = self._to_int16(audio_data)
+        self._remember(cache_key, audio_data)
+        
+        if self._cache_dir is None:
+            return
+        
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            audio_data.tofile(self._cache_dir / f"{cache_key.hex()}.s16")
+        except OSError as e:
+            logger.warning(f"Failed to write audio cache file: {e}")
+    
+    def _remember(self, cache_key: bytes, audio_data: np.ndarray) -> None:
+        """Add audio to the in-memory cache, evicting the least recently used"""
+        self.audio_cache[cache_key] = audio_data
+        self.audio_cache.move_to_end(cache_key)
+        while len(self.audio_cache) > self.max_cache_entries:
+            self.audio_cache.popitem(last=False)
     
     def clear_cache(self) -> None:
-        """Clear audio cache"""
+        """Clear in-memory audio cache (files on disk are kept)"""
         logger.info(f"Clearing audio cache ({len(self.audio_cache)} items)")
         self.audio_cache.clear()
     
@@ -258,17 +742,48 @@ class VoiceOutput:
         for phrase in phrases:
             try:
                 cache_key = self._get_cache_key(phrase)
-                if cache_key not in self.audio_cache:
+                if self._cache_get(cache_key) is None:
                     audio_data = self._generate_speech(phrase)
-                    self.audio_cache[cache_key] = audio_data
+                    self._cache_put(cache_key, audio_data)
             except Exception as e:
                 logger.warning(f"Failed to preload phrase '{phrase[:30]}...': {e}")
         
         logger.info(f"Preloading complete ({len(self.audio_cache)} items cached)")
     
     async def preload_phrases_async(self, phrases: list[str]) -> None:
-        """Async version of preload_phrases"""
-        await asyncio.to_thread(self.preload_phrases, phrases)
+        """
+        Async version of preload_phrases
+        
+        Uncached phrases are synthesized concurrently (up to
+        PRELOAD_CONCURRENCY requests at a time), so preloading takes
+        about one round trip rather than one per phrase.
+        """
+        logger.info(f"Preloading {len(phrases)} phrases...")
+        
+        missing = {}
+        for phrase in phrases:
+            cache_key = self._get_cache_key(phrase)
+            if cache_key not in missing and self._cache_get(cache_key) is None:
+                missing[cache_key] = phrase
+        
+        semaphore = asyncio.Semaphore(PRELOAD_CONCURRENCY)
+        
+        async def generate(phrase: str) -> np.ndarray:
+            async with semaphore:
+                return await self._generate_speech_async(phrase)
+        
+        results = await asyncio.gather(
+            *(generate(phrase) for phrase in missing.values()),
+            return_exceptions=True
+        )
+        
+        for (cache_key, phrase), result in zip(missing.items(), results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to preload phrase '{phrase[:30]}...': {result}")
+            else:
+                self._cache_put(cache_key, result)
+        
+        logger.info(f"Preloading complete ({len(self.audio_cache)} items cached)")
     
     def save_audio(self, text: str, filename: str) -> Path:
         """
@@ -290,16 +805,18 @@ class VoiceOutput:
         # Save as WAV
         output_path = output_dir / f"{filename}.wav"
         
-        # Convert to int16
-        audio_int16 = (audio_data * 32767).astype(np.int16)
+        audio_int16 = self._to_int16(audio_data)
         
-        # Save
-        import wave
-        with wave.open(str(output_path), 'wb') as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)
-            wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_int16.tobytes())
+        # Save: 44-byte header, then the samples in one write
+        data_size = audio_int16.nbytes
+        header = WAV_HEADER.pack(
+            b"RIFF", 36 + data_size, b"WAVE",
+            b"fmt ", 16, 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16,
+            b"data", data_size
+        )
+        with open(output_path, 'wb') as wav_file:
+            wav_file.write(header)
+            audio_int16.tofile(wav_file)
         
         logger.info(f"Audio saved to {output_path}")
         return output_path
@@ -308,3 +825,4 @@ class VoiceOutput:
         """Clean up resources"""
         logger.info("Cleaning up voice output")
         self.clear_cache()
+        self._close_stream()
@@ -14,7 +14,5 @@ _mock_sd.rec = MagicMock()
 _mock_sd.play = MagicMock()
 
 sys.modules['sounddevice'] = _mock_sd
-sys.modules['pydub'] = MagicMock()
-sys.modules['pydub.AudioSegment'] = MagicMock()
 
 # These mocks will be available to ALL tests now
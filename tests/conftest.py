@@ -2,10 +2,12 @@
 Pytest configuration and fixtures for ambient-ai-interface tests
 """
 
+import dataclasses
 import os
 import sys
 import gc
 import signal
+import threading
 from pathlib import Path
 from unittest.mock import Mock, MagicMock, AsyncMock, patch
 import pytest
@@ -26,8 +28,6 @@ def pytest_configure(config):
     mock_sd.InputStream = MagicMock()
     
     sys.modules['sounddevice'] = mock_sd
-    sys.modules['pydub'] = MagicMock()
-    sys.modules['pydub.AudioSegment'] = MagicMock()
 
 
 import numpy as np
@@ -63,19 +63,48 @@ os.environ.setdefault("ENABLE_WAKE_WORD", "false")
 os.environ.setdefault("LOG_USER_QUERIES", "false")
 
 
+# Settings every test configuration uses, whatever the environment says
+TEST_CONFIG_OVERRIDES = dict(
+    openai_api_key="test-key-12345",
+    debug_mode=True,
+    enable_wake_word=False,
+    log_user_queries=False,
+    enable_persistent_memory=False,
+)
+
+
+@pytest.fixture(scope="session")
+def base_config():
+    """
+    Configuration parsed from the environment once per session
+    
+    Treat as read-only; derive variants with dataclasses.replace().
+    """
+    from src.utils.config import Config
+    
+    return Config()
+
+
 @pytest.fixture
-def test_config():
+def test_config(base_config):
     """Create a test configuration"""
-    from src.utils.config import Config
+    return dataclasses.replace(base_config, **TEST_CONFIG_OVERRIDES)
+
+
+@pytest.fixture(scope="module")
+def shared_executor(base_config):
+    """
+    One ActionExecutor for a whole test module
     
-    config = Config()
-    config.openai_api_key = "test-key-12345"
-    config.debug_mode = True
-    config.enable_wake_word = False
-    config.log_user_queries = False
-    config.enable_persistent_memory = False
+    Configured like test_config. For tests that only execute the default
+    handlers; tests that register handlers or patch the executor should
+    build their own.
+    """
+    from src.action_executor import ActionExecutor
     
-    return config
+    executor = ActionExecutor(dataclasses.replace(base_config, **TEST_CONFIG_OVERRIDES))
+    yield executor
+    executor.cleanup()
 
 
 @pytest.fixture
@@ -135,6 +164,63 @@ def mock_audio_output():
         yield
 
 
+@pytest.fixture
+def playback_stream():
+    """
+    Stand-in for sounddevice.OutputStream
+    
+    Drains VoiceOutput's stream callback on a background thread and records
+    every array queued for playback in .played
+    """
+    played = []
+    stop = threading.Event()
+    threads = []
+    
+    def open_stream(callback, **kwargs):
+        owner = callback.__self__
+        closed = threading.Event()
+        seen = []
+        
+        def pump():
+            while not (stop.is_set() or closed.is_set()):
+                pending = owner._pending_audio.copy()
+                if not pending:
+                    stop.wait(0.001)
+                    continue
+                for entry in pending:
+                    if not any(entry is known for known in seen):
+                        seen.append(entry)
+                        played.append(entry[0])
+                # Only as many frames as the snapshot holds, so nothing unrecorded is consumed
+                frames = sum(len(samples) - position for samples, position, _ in pending)
+                callback(np.zeros((frames, 1), dtype=np.int16), frames, None, None)
+        
+        def start():
+            thread = threading.Thread(target=pump, daemon=True)
+            threads.append(thread)
+            thread.start()
+        
+        stream = MagicMock()
+        stream.start.side_effect = start
+        stream.close.side_effect = lambda *args, **kwargs: closed.set()
+        return stream
+    
+    factory = MagicMock(side_effect=open_stream)
+    factory.played = played
+    yield factory
+    
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.fixture
+def no_ffmpeg():
+    """Keep MP3 decoding off the ffmpeg subprocess on hosts that have it"""
+    with patch('src.voice_output.shutil.which', return_value=None):
+        yield
+
+
 @pytest.fixture
 def mock_pyaudio():
     """Mock PyAudio"""
@@ -176,19 +262,6 @@ def sample_context_messages():
     ]
 
 
-@pytest.fixture(autouse=True)
-def reset_environment():
-    """Reset environment before each test"""
-    # Store original env vars
-    original_env = os.environ.copy()
-    
-    yield
-    
-    # Restore original env vars
-    os.environ.clear()
-    os.environ.update(original_env)
-
-
 @pytest.fixture
 def mock_redis():
     """Mock Redis client"""
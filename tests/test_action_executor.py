@@ -3,6 +3,10 @@ Unit tests for Action Executor
 Tests action execution, handler registration, and default handlers
 """
 
+import asyncio
+import threading
+from collections.abc import Mapping
+
 import pytest
 from unittest.mock import Mock, patch
 from src.action_executor import ActionExecutor
@@ -16,7 +20,7 @@ class TestActionExecutor:
         executor = ActionExecutor(test_config)
         
         assert executor.config == test_config
-        assert isinstance(executor.handlers, dict)
+        assert isinstance(executor.handlers, Mapping)
         # Check default handlers registered
         assert "smart_home" in executor.handlers
         assert "information" in executor.handlers
@@ -37,6 +41,26 @@ class TestActionExecutor:
         assert "custom" in executor.handlers
         assert executor.handlers["custom"] == custom_handler
     
+    def test_handlers_view_is_live(self, test_config):
+        """Test handlers is one view that reflects later registrations"""
+        executor = ActionExecutor(test_config)
+        handlers = executor.handlers
+        
+        executor.register_handler("custom", str)
+        
+        assert executor.handlers is handlers
+        assert handlers["custom"] is str
+    
+    def test_handlers_is_read_only(self, test_config):
+        """Test handlers can't be changed behind the dispatch table's back"""
+        executor = ActionExecutor(test_config)
+        
+        with pytest.raises(TypeError):
+            executor.handlers["search"] = lambda params: "patched"
+        
+        result = executor.execute({"action_type": "search", "parameters": {"query": "x"}})
+        assert "found" in result["result"].lower()
+    
     def test_execute_success(self, test_config):
         """Test successful action execution"""
         executor = ActionExecutor(test_config)
@@ -97,6 +121,25 @@ class TestActionExecutor:
         assert "error" in result
         assert "Test error" in result["error"]
     
+    def test_execute_handler_exception_logs_traceback_at_debug(self, test_config, caplog):
+        """Test handler failures log the traceback only at DEBUG level"""
+        import logging
+        executor = ActionExecutor(test_config)
+        
+        def failing_handler(params):
+            raise ValueError("Handler failed")
+        
+        executor.register_handler("failing", failing_handler)
+        
+        with caplog.at_level(logging.DEBUG, logger="src.action_executor"):
+            executor.execute({"action_type": "failing", "parameters": {}})
+        
+        error = next(r for r in caplog.records if r.levelno == logging.ERROR)
+        debug = next(r for r in caplog.records if r.levelno == logging.DEBUG)
+        assert error.getMessage() == "Action execution error: Handler failed"
+        assert error.exc_info is None
+        assert debug.exc_info is not None
+    
     @pytest.mark.asyncio
     async def test_execute_async_success(self, test_config):
         """Test async action execution"""
@@ -154,6 +197,94 @@ class TestActionExecutor:
         assert len(results) == 3
         assert all(r["success"] for r in results)
     
+    def test_execute_batch_runs_concurrently(self, test_config):
+        """Test sync batch execution overlaps independent actions"""
+        executor = ActionExecutor(test_config)
+        
+        # Only passes once all three handlers are running at the same time
+        barrier = threading.Barrier(3, timeout=5)
+        
+        def slow_handler(params):
+            barrier.wait()
+            return params["id"]
+        
+        executor.register_handler("slow", slow_handler)
+        actions = [{"action_type": "slow", "parameters": {"id": i}} for i in range(3)]
+        
+        results = executor.execute_batch(actions)
+        
+        assert all(r["success"] for r in results), results
+        assert [r["result"] for r in results] == [0, 1, 2]
+    
+    def test_execute_batch_fast_handlers_skip_event_loop(self, test_config):
+        """Test batches of fast handlers run inline without creating a loop"""
+        executor = ActionExecutor(test_config)
+        
+        actions = [
+            {"action_type": "search", "parameters": {"query": "a"}},
+            {"action_type": "media", "parameters": {"action": "play"}}
+        ]
+        
+        with patch('src.action_executor.asyncio.new_event_loop') as new_loop, \
+             patch.object(executor, 'execute_batch_async') as batch_async:
+            results = executor.execute_batch(actions)
+        
+        new_loop.assert_not_called()
+        batch_async.assert_not_called()
+        assert all(r["success"] for r in results)
+    
+    def test_execute_batch_single_async_handler(self, test_config):
+        """Test a one-action batch awaits a coroutine handler like larger batches"""
+        executor = ActionExecutor(test_config)
+        
+        async def async_handler(params):
+            return "async result"
+        
+        executor.register_handler("async_test", async_handler)
+        
+        results = executor.execute_batch([{"action_type": "async_test", "parameters": {}}])
+        
+        assert results[0]["result"] == "async result"
+    
+    def test_execute_batch_keeps_current_event_loop(self, test_config):
+        """Test running a batch does not clear this thread's current event loop"""
+        executor = ActionExecutor(test_config)
+        executor.register_handler("slow", lambda params: params["id"])
+        
+        seen = []
+        
+        def run_batch():
+            # Own thread so the test leaves pytest's event loop alone
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                executor.execute_batch([{"action_type": "slow", "parameters": {"id": 1}}] * 2)
+                seen.append(asyncio.get_event_loop() is loop)
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
+        
+        thread = threading.Thread(target=run_batch)
+        thread.start()
+        thread.join()
+        
+        assert seen == [True]
+    
+    @pytest.mark.asyncio
+    async def test_execute_batch_inside_event_loop(self, test_config):
+        """Test sync batch execution falls back to sequential inside a running loop"""
+        executor = ActionExecutor(test_config)
+        
+        actions = [
+            {"action_type": "search", "parameters": {"query": "a"}},
+            {"action_type": "search", "parameters": {"query": "b"}}
+        ]
+        
+        results = executor.execute_batch(actions)
+        
+        assert len(results) == 2
+        assert all(r["success"] for r in results)
+    
     @pytest.mark.asyncio
     async def test_execute_batch_async(self, test_config):
         """Test async batch execution"""
@@ -395,3 +526,26 @@ class TestActionExecutor:
         
         assert result["success"] is True
         assert "found" in result["result"].lower()
+    
+    def test_register_handler_precomputes_dispatch(self, test_config):
+        """Test handler async-ness is resolved once at registration"""
+        executor = ActionExecutor(test_config)
+        
+        async def async_handler(params):
+            return "async"
+        
+        def sync_handler(params):
+            return "sync"
+        
+        executor.register_handler("async_custom", async_handler)
+        executor.register_handler("sync_custom", sync_handler, fast=True)
+        
+        assert executor._dispatch["async_custom"] == (async_handler, True, False)
+        assert executor._dispatch["sync_custom"] == (sync_handler, False, True)
+    
+    def test_default_handlers_dispatch_inline(self, test_config):
+        """Test built-in handlers are registered as fast sync handlers"""
+        executor = ActionExecutor(test_config)
+        
+        for action_type, handler in executor.handlers.items():
+            assert executor._dispatch[action_type] == (handler, False, True)
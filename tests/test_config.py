@@ -3,19 +3,22 @@ Unit tests for Config class
 Tests configuration loading, validation, and defaults
 """
 
-import os
+import dataclasses
+import sys
 import pytest
-from src.utils.config import Config
+from src.utils.config import Config, get_config
 
 
 class TestConfig:
     """Test configuration management"""
     
-    def test_config_defaults(self):
+    def test_config_defaults(self, monkeypatch):
         """Test default configuration values"""
-        # Clear environment to get true defaults
-        os.environ.clear()
-        os.environ["OPENAI_API_KEY"] = "test-key"
+        # Unset the variables under test to get true defaults
+        for name in ("OPENAI_MODEL", "MIC_SAMPLE_RATE", "TTS_VOICE",
+                     "MAX_CONTEXT_LENGTH", "ENABLE_WAKE_WORD", "LOG_LEVEL"):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         
         config = Config()
         
@@ -26,12 +29,12 @@ class TestConfig:
         assert config.enable_wake_word is True  # Default is true
         assert config.log_level == "INFO"
     
-    def test_config_from_env_vars(self):
+    def test_config_from_env_vars(self, monkeypatch):
         """Test loading configuration from environment variables"""
-        os.environ["OPENAI_MODEL"] = "gpt-4"
-        os.environ["MIC_SAMPLE_RATE"] = "48000"
-        os.environ["TTS_VOICE"] = "nova"
-        os.environ["MAX_CONTEXT_LENGTH"] = "20"
+        monkeypatch.setenv("OPENAI_MODEL", "gpt-4")
+        monkeypatch.setenv("MIC_SAMPLE_RATE", "48000")
+        monkeypatch.setenv("TTS_VOICE", "nova")
+        monkeypatch.setenv("MAX_CONTEXT_LENGTH", "20")
         
         config = Config()
         
@@ -40,28 +43,28 @@ class TestConfig:
         assert config.tts_voice == "nova"
         assert config.max_context_length == 20
     
-    def test_config_boolean_parsing(self):
+    def test_config_boolean_parsing(self, monkeypatch):
         """Test boolean environment variable parsing"""
         # Test true values
-        os.environ["ENABLE_WAKE_WORD"] = "true"
+        monkeypatch.setenv("ENABLE_WAKE_WORD", "true")
         config1 = Config()
         assert config1.enable_wake_word is True
         
         # Test false values
-        os.environ["ENABLE_WAKE_WORD"] = "false"
+        monkeypatch.setenv("ENABLE_WAKE_WORD", "false")
         config2 = Config()
         assert config2.enable_wake_word is False
         
         # Test case insensitivity
-        os.environ["ENABLE_WAKE_WORD"] = "TRUE"
+        monkeypatch.setenv("ENABLE_WAKE_WORD", "TRUE")
         config3 = Config()
         assert config3.enable_wake_word is True
     
-    def test_config_numeric_parsing(self):
+    def test_config_numeric_parsing(self, monkeypatch):
         """Test numeric environment variable parsing"""
-        os.environ["MIC_SAMPLE_RATE"] = "44100"
-        os.environ["SILENCE_DURATION"] = "3.5"
-        os.environ["TTS_SPEED"] = "1.25"
+        monkeypatch.setenv("MIC_SAMPLE_RATE", "44100")
+        monkeypatch.setenv("SILENCE_DURATION", "3.5")
+        monkeypatch.setenv("TTS_SPEED", "1.25")
         
         config = Config()
         
@@ -69,9 +72,9 @@ class TestConfig:
         assert config.silence_duration == 3.5
         assert config.tts_speed == 1.25
     
-    def test_config_list_parsing(self):
+    def test_config_list_parsing(self, monkeypatch):
         """Test list environment variable parsing"""
-        os.environ["ALLOWED_ORIGINS"] = "http://localhost:3000,http://localhost:8000,https://example.com"
+        monkeypatch.setenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:8000,https://example.com")
         
         config = Config()
         
@@ -79,66 +82,109 @@ class TestConfig:
         assert "http://localhost:3000" in config.allowed_origins
         assert "https://example.com" in config.allowed_origins
     
-    def test_config_validation_success(self):
-        """Test successful configuration validation"""
+    def test_config_allowed_origins_normalized(self, monkeypatch):
+        """Test allowed origins are stripped, lowercased and checked case-insensitively"""
+        monkeypatch.setenv("ALLOWED_ORIGINS", " https://Example.com , http://localhost:3000,, ")
+        
         config = Config()
-        config.openai_api_key = "valid-key"
-        config.mic_sample_rate = 16000
-        config.tts_speed = 1.0
-        config.nlu_temperature = 0.7
+        
+        assert config.allowed_origins == ("https://example.com", "http://localhost:3000")
+        assert config.is_origin_allowed("HTTPS://EXAMPLE.COM")
+        assert not config.is_origin_allowed("https://other.com")
+        
+        config.allowed_origins = ("https://other.com",)
+        assert config.is_origin_allowed("https://other.com")
+        assert not config.is_origin_allowed("https://example.com")
+    
+    def test_config_validation_success(self, base_config):
+        """Test successful configuration validation"""
+        config = dataclasses.replace(
+            base_config,
+            openai_api_key="valid-key",
+            mic_sample_rate=16000,
+            tts_speed=1.0,
+            nlu_temperature=0.7,
+        )
         
         assert config.validate() is True
     
-    def test_config_validation_missing_api_key(self):
+    def test_config_replace_revalidates(self, base_config):
+        """Test derived configurations are validated and normalized like parsed ones"""
+        with pytest.raises(ValueError, match="MIC_SAMPLE_RATE must be between"):
+            dataclasses.replace(base_config, mic_sample_rate=5000)
+        
+        config = dataclasses.replace(base_config, allowed_origins=(" HTTPS://Example.com ",))
+        assert config.allowed_origins == ("https://example.com",)
+        assert config.is_origin_allowed("https://EXAMPLE.com")
+        assert not base_config.is_origin_allowed("https://example.com")
+        
+        config = dataclasses.replace(base_config, allowed_origins="https://A.com, https://b.com")
+        assert config.allowed_origins == ("https://a.com", "https://b.com")
+    
+    def test_config_validation_missing_api_key(self, monkeypatch):
         """Test validation fails with missing API key"""
-        os.environ["OPENAI_API_KEY"] = ""
+        monkeypatch.setenv("OPENAI_API_KEY", "")
         
         with pytest.raises(ValueError, match="OPENAI_API_KEY is required"):
             Config()
     
-    def test_config_validation_invalid_sample_rate(self):
+    def test_config_validation_invalid_sample_rate(self, monkeypatch):
         """Test validation fails with invalid sample rate"""
-        os.environ["MIC_SAMPLE_RATE"] = "5000"  # Too low
+        monkeypatch.setenv("MIC_SAMPLE_RATE", "5000")  # Too low
         
         with pytest.raises(ValueError, match="MIC_SAMPLE_RATE must be between"):
             Config()
         
-        os.environ["MIC_SAMPLE_RATE"] = "50000"  # Too high
+        monkeypatch.setenv("MIC_SAMPLE_RATE", "50000")  # Too high
         
         with pytest.raises(ValueError, match="MIC_SAMPLE_RATE must be between"):
             Config()
     
-    def test_config_validation_invalid_tts_speed(self):
+    def test_config_validation_invalid_tts_speed(self, monkeypatch):
         """Test validation fails with invalid TTS speed"""
-        os.environ["TTS_SPEED"] = "0.1"  # Too low
+        monkeypatch.setenv("TTS_SPEED", "0.1")  # Too low
         
         with pytest.raises(ValueError, match="TTS_SPEED must be between"):
             Config()
         
-        os.environ["TTS_SPEED"] = "5.0"  # Too high
+        monkeypatch.setenv("TTS_SPEED", "5.0")  # Too high
         
         with pytest.raises(ValueError, match="TTS_SPEED must be between"):
             Config()
     
-    def test_config_validation_invalid_temperature(self):
+    def test_config_validation_invalid_tts_response_format(self, monkeypatch):
+        """Test validation fails with an unsupported TTS response format"""
+        monkeypatch.setenv("TTS_RESPONSE_FORMAT", "ogg")
+        
+        with pytest.raises(ValueError, match="TTS_RESPONSE_FORMAT must be"):
+            Config()
+    
+    def test_config_validation_invalid_temperature(self, monkeypatch):
         """Test validation fails with invalid NLU temperature"""
-        os.environ["NLU_TEMPERATURE"] = "-0.5"  # Too low
+        monkeypatch.setenv("NLU_TEMPERATURE", "-0.5")  # Too low
         
         with pytest.raises(ValueError, match="NLU_TEMPERATURE must be between"):
             Config()
         
-        os.environ["NLU_TEMPERATURE"] = "3.0"  # Too high
+        monkeypatch.setenv("NLU_TEMPERATURE", "3.0")  # Too high
         
         with pytest.raises(ValueError, match="NLU_TEMPERATURE must be between"):
             Config()
     
-    def test_config_all_audio_fields(self):
+    def test_config_validation_invalid_semantic_cache_threshold(self, monkeypatch):
+        """Test validation fails with invalid semantic cache threshold"""
+        monkeypatch.setenv("SEMANTIC_CACHE_THRESHOLD", "1.5")  # Too high
+        
+        with pytest.raises(ValueError, match="SEMANTIC_CACHE_THRESHOLD must be between"):
+            Config()
+    
+    def test_config_all_audio_fields(self, monkeypatch):
         """Test all audio configuration fields"""
-        os.environ["MIC_SAMPLE_RATE"] = "48000"
-        os.environ["MIC_CHUNK_SIZE"] = "2048"
-        os.environ["MIC_CHANNELS"] = "2"
-        os.environ["SILENCE_THRESHOLD"] = "1000"
-        os.environ["SILENCE_DURATION"] = "1.5"
+        monkeypatch.setenv("MIC_SAMPLE_RATE", "48000")
+        monkeypatch.setenv("MIC_CHUNK_SIZE", "2048")
+        monkeypatch.setenv("MIC_CHANNELS", "2")
+        monkeypatch.setenv("SILENCE_THRESHOLD", "1000")
+        monkeypatch.setenv("SILENCE_DURATION", "1.5")
         
         config = Config()
         
@@ -148,12 +194,12 @@ class TestConfig:
         assert config.silence_threshold == 1000
         assert config.silence_duration == 1.5
     
-    def test_config_all_security_fields(self):
+    def test_config_all_security_fields(self, monkeypatch):
         """Test all security configuration fields"""
-        os.environ["ENABLE_ENCRYPTION"] = "true"
-        os.environ["ENCRYPTION_KEY"] = "test-encryption-key"
-        os.environ["LOG_USER_QUERIES"] = "false"
-        os.environ["AUTO_DELETE_CONTEXT_DAYS"] = "7"
+        monkeypatch.setenv("ENABLE_ENCRYPTION", "true")
+        monkeypatch.setenv("ENCRYPTION_KEY", "test-encryption-key")
+        monkeypatch.setenv("LOG_USER_QUERIES", "false")
+        monkeypatch.setenv("AUTO_DELETE_CONTEXT_DAYS", "7")
         
         config = Config()
         
@@ -162,13 +208,13 @@ class TestConfig:
         assert config.log_user_queries is False
         assert config.auto_delete_context_days == 7
     
-    def test_config_monitoring_fields(self):
+    def test_config_monitoring_fields(self, monkeypatch):
         """Test monitoring and logging configuration"""
-        os.environ["LOG_LEVEL"] = "DEBUG"
-        os.environ["ENABLE_PROMETHEUS"] = "true"
-        os.environ["PROMETHEUS_PORT"] = "9091"
-        os.environ["ENABLE_HEALTH_CHECK"] = "false"
-        os.environ["HEALTH_CHECK_PORT"] = "8081"
+        monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+        monkeypatch.setenv("ENABLE_PROMETHEUS", "true")
+        monkeypatch.setenv("PROMETHEUS_PORT", "9091")
+        monkeypatch.setenv("ENABLE_HEALTH_CHECK", "false")
+        monkeypatch.setenv("HEALTH_CHECK_PORT", "8081")
         
         config = Config()
         
@@ -178,11 +224,11 @@ class TestConfig:
         assert config.enable_health_check is False
         assert config.health_check_port == 8081
     
-    def test_config_feature_flags(self):
+    def test_config_feature_flags(self, monkeypatch):
         """Test feature flag configuration"""
-        os.environ["ENABLE_CONVERSATION_ANALYTICS"] = "true"
-        os.environ["ENABLE_VOICE_CLONING"] = "false"
-        os.environ["ENABLE_REAL_TIME_TRANSLATION"] = "true"
+        monkeypatch.setenv("ENABLE_CONVERSATION_ANALYTICS", "true")
+        monkeypatch.setenv("ENABLE_VOICE_CLONING", "false")
+        monkeypatch.setenv("ENABLE_REAL_TIME_TRANSLATION", "true")
         
         config = Config()
         
@@ -190,12 +236,12 @@ class TestConfig:
         assert config.enable_voice_cloning is False
         assert config.enable_real_time_translation is True
     
-    def test_config_development_settings(self):
+    def test_config_development_settings(self, monkeypatch):
         """Test development configuration settings"""
-        os.environ["DEBUG_MODE"] = "true"
-        os.environ["ENABLE_MOCK_SENSORS"] = "true"
-        os.environ["SAVE_AUDIO_FILES"] = "true"
-        os.environ["AUDIO_SAVE_PATH"] = "/tmp/audio/"
+        monkeypatch.setenv("DEBUG_MODE", "true")
+        monkeypatch.setenv("ENABLE_MOCK_SENSORS", "true")
+        monkeypatch.setenv("SAVE_AUDIO_FILES", "true")
+        monkeypatch.setenv("AUDIO_SAVE_PATH", "/tmp/audio/")
         
         config = Config()
         
@@ -204,12 +250,34 @@ class TestConfig:
         assert config.save_audio_files is True
         assert config.audio_save_path == "/tmp/audio/"
     
-    def test_config_cloud_deployment(self):
+    def test_config_cloud_deployment(self, monkeypatch):
         """Test cloud deployment configuration"""
-        os.environ["DEPLOYMENT_ENV"] = "production"
-        os.environ["CLOUD_PROVIDER"] = "aws"
+        monkeypatch.setenv("DEPLOYMENT_ENV", "production")
+        monkeypatch.setenv("CLOUD_PROVIDER", "aws")
         
         config = Config()
         
         assert config.deployment_env == "production"
         assert config.cloud_provider == "aws"
+    
+    def test_get_config_is_cached(self):
+        """Test get_config returns one shared instance until cleared"""
+        get_config.cache_clear()
+        try:
+            first = get_config()
+            assert get_config() is first
+            
+            get_config.cache_clear()
+            assert get_config() is not first
+        finally:
+            get_config.cache_clear()
+    
+    def test_config_interns_string_fields(self, monkeypatch):
+        """Test frequently used string settings are interned"""
+        model = "".join(["gpt-", "interned"])
+        monkeypatch.setenv("OPENAI_MODEL", model)
+        
+        config = Config()
+        
+        assert config.openai_model == model
+        assert config.openai_model is sys.intern(model)
@@ -7,6 +7,7 @@ import pytest
 import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
+from unittest.mock import patch
 from src.context_manager import ContextManager
 
 
@@ -81,6 +82,7 @@ class TestContextManager:
         
         context = ContextManager(test_config)
         context.add_message("user", "Test message")
+        context.flush()
         
         # Check database
         conn = sqlite3.connect(temp_db_path)
@@ -133,6 +135,19 @@ class TestContextManager:
         assert "timestamp" in history[0]
         assert "metadata" in history[0]
     
+    def test_iter_history(self, test_config):
+        """Test iterating history without copying"""
+        test_config.enable_persistent_memory = False
+        context = ContextManager(test_config)
+        
+        context.add_message("user", "First")
+        context.add_message("assistant", "Second")
+        
+        messages = list(context.iter_history())
+        
+        assert [m["content"] for m in messages] == ["First", "Second"]
+        assert messages[0] is context.conversation_history[0]
+    
     def test_search_history(self, test_config):
         """Test searching conversation history"""
         test_config.enable_persistent_memory = False
@@ -161,6 +176,23 @@ class TestContextManager:
         
         assert len(results) == 3
     
+    def test_search_history_uses_lowercase_cache(self, test_config):
+        """Test in-memory search stays aligned with history after edits"""
+        test_config.enable_persistent_memory = False
+        context = ContextManager(test_config)
+        
+        context.add_message("user", "Turn ON the Lights")
+        context.add_message("assistant", "Done")
+        
+        assert list(context._lower_contents) == ["turn on the lights", "done"]
+        assert context.search_history("on the lights")[0]["role"] == "user"
+        
+        # Direct edits to the history are picked up on the next search
+        context.conversation_history.popleft()
+        
+        assert context.search_history("lights") == []
+        assert list(context._lower_contents) == ["done"]
+    
     def test_set_preference(self, test_config):
         """Test setting user preferences"""
         test_config.enable_persistent_memory = False
@@ -189,6 +221,25 @@ class TestContextManager:
         
         assert count == 1
     
+    def test_set_preferences_with_persistence(self, test_config, temp_db_path):
+        """Test several preferences are saved and reloaded together"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        context.set_preferences({"theme": "dark", "volume": 50, "voices": ["alloy"]})
+        context.close()
+        
+        assert context.get_preference("volume") == 50
+        
+        reloaded = ContextManager(test_config)
+        assert reloaded.user_preferences == {
+            "theme": "dark",
+            "volume": 50,
+            "voices": ["alloy"]
+        }
+        reloaded.close()
+    
     def test_get_preference(self, test_config):
         """Test retrieving user preferences"""
         test_config.enable_persistent_memory = False
@@ -307,6 +358,7 @@ class TestContextManager:
         context1 = ContextManager(test_config)
         context1.add_message("user", "Persisted message")
         context1.set_preference("test_pref", "test_value")
+        context1.close()
         
         # Create second context - should load data
         context2 = ContextManager(test_config)
@@ -324,3 +376,324 @@ class TestContextManager:
         timestamp = context.conversation_history[0]["timestamp"]
         # Should be parseable as ISO format
         datetime.fromisoformat(timestamp)  # Will raise if invalid
+    
+    def test_database_uses_wal_mode(self, test_config, temp_db_path):
+        """Test the shared connection is opened in WAL journal mode"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        
+        mode = context._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode.lower() == "wal"
+    
+    def test_close_releases_connection(self, test_config, temp_db_path):
+        """Test close() releases the shared connection"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        context.close()
+        
+        assert context._conn is None
+        # Closing twice should be harmless
+        context.close()
+    
+    def test_writer_batches_messages(self, test_config, temp_db_path):
+        """Test queued messages are all written by the background writer"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        for i in range(100):
+            context.add_message("user", f"Message {i}")
+        context.close()
+        
+        conn = sqlite3.connect(temp_db_path)
+        count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        conn.close()
+        
+        assert count == 100
+        assert context._writer is None
+    
+    def test_add_message_after_close_is_not_queued(self, test_config, temp_db_path):
+        """Test messages added after close() are not left in the write queue"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        context.close()
+        context.add_message("user", "Too late")
+        
+        assert context._write_q.empty()
+        assert len(context.conversation_history) == 1
+    
+    def test_add_message_without_database_is_not_queued(self, test_config, temp_db_path):
+        """Test messages are not queued when the database failed to open"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        with patch('src.context_manager.sqlite3.connect', side_effect=sqlite3.OperationalError("locked")):
+            context = ContextManager(test_config)
+        
+        context.add_message("user", "Hello")
+        
+        assert context._writer is None
+        assert context._write_q.empty()
+    
+    def test_timestamps_stored_as_epoch_ms(self, test_config, temp_db_path):
+        """Test messages are persisted with integer epoch-millisecond timestamps"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        context.add_message("user", "Test")
+        context.close()
+        
+        conn = sqlite3.connect(temp_db_path)
+        timestamp = conn.execute("SELECT timestamp FROM conversations").fetchone()[0]
+        conn.close()
+        
+        assert isinstance(timestamp, int)
+        expected = datetime.fromisoformat(context.conversation_history[0]["timestamp"])
+        assert abs(timestamp / 1000 - expected.timestamp()) < 0.01
+    
+    def test_migrates_legacy_text_timestamps(self, test_config, temp_db_path):
+        """Test databases with ISO TEXT timestamps are migrated on startup"""
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute("""
+            CREATE TABLE conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO conversations (timestamp, role, content, metadata) VALUES (?, ?, ?, ?)",
+            (datetime.now().isoformat(), "user", "Legacy message", "{}")
+        )
+        conn.commit()
+        conn.close()
+        
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        context = ContextManager(test_config)
+        
+        assert len(context.conversation_history) == 1
+        assert context.conversation_history[0]["content"] == "Legacy message"
+        
+        columns = {
+            row[1]: row[2]
+            for row in context._conn.execute("PRAGMA table_info(conversations)")
+        }
+        assert columns["timestamp"] == "INTEGER"
+        
+        # Pre-existing rows are added to the search index
+        assert len(context.search_history("legacy")) == 1
+    
+    def test_search_history_with_persistence(self, test_config, temp_db_path):
+        """Test search uses the FTS index when persistence is enabled"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        context.add_message("user", "What's the weather like?")
+        context.add_message("assistant", "It's sunny today")
+        context.add_message("user", "How about the weather tomorrow?")
+        
+        results = context.search_history("weather")
+        
+        assert [msg["content"] for msg in results] == [
+            "What's the weather like?",
+            "How about the weather tomorrow?"
+        ]
+        assert results[0]["role"] == "user"
+        assert results[0]["metadata"] == {}
+        
+        # Punctuation must not be interpreted as FTS query syntax
+        assert len(context.search_history("what's the")) == 1
+        assert len(context.search_history("weather", limit=1)) == 1
+        
+        # The last word also matches as a prefix
+        assert len(context.search_history("weath")) == 2
+        assert len(context.search_history("sunny tod")) == 1
+    
+    def test_search_history_with_persistence_skips_removed_messages(self, test_config, temp_db_path):
+        """Test cleared and evicted messages are not found in the FTS index"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        test_config.context_window_hours = 0
+        test_config.max_context_length = 1
+        
+        context = ContextManager(test_config)
+        context.add_message("user", "My password is hunter2")
+        context.clear_context()
+        
+        assert context.search_history("hunter2") == []
+        
+        # Length-bounded history evicts the oldest message
+        for i in range(5):
+            context.add_message("user", f"Note {i}")
+        
+        assert [msg["content"] for msg in context.search_history("note")] == [
+            "Note 1", "Note 2", "Note 3", "Note 4"
+        ]
+        assert context.search_history("hunter2") == []
+    
+    def test_trim_history_keeps_timestamps_in_sync(self, test_config):
+        """Test trimming removes the same prefix from history and timestamps"""
+        test_config.enable_persistent_memory = False
+        test_config.context_window_hours = 1
+        context = ContextManager(test_config)
+        
+        for i in range(5):
+            context.add_message("user", f"Message {i}")
+        
+        # Age the first two messages past the window
+        context._timestamps[0] -= 7200
+        context._timestamps[1] -= 7200
+        context._trim_history()
+        
+        assert len(context.conversation_history) == 3
+        assert len(context._timestamps) == 3
+        assert context.conversation_history[0]["content"] == "Message 2"
+    
+    def test_history_bounded_without_time_window(self, test_config):
+        """Test history is capped by length when no time window is set"""
+        test_config.enable_persistent_memory = False
+        test_config.context_window_hours = 0
+        test_config.max_context_length = 2
+        context = ContextManager(test_config)
+        
+        for i in range(20):
+            context.add_message("user", f"Message {i}")
+        
+        assert len(context.conversation_history) == 8
+        assert context.conversation_history[0]["content"] == "Message 12"
+        assert [m["content"] for m in context.get_recent_context()] == [
+            "Message 18",
+            "Message 19"
+        ]
+    
+    def test_get_stats_counts_follow_trimming(self, test_config):
+        """Test running message counts stay correct as history is trimmed"""
+        test_config.enable_persistent_memory = False
+        test_config.context_window_hours = 0
+        test_config.max_context_length = 1
+        context = ContextManager(test_config)
+        
+        # Bounded history keeps only the 4 newest messages
+        for role in ["user", "user", "user", "assistant", "user", "assistant"]:
+            context.add_message(role, "message")
+        
+        stats = context.get_stats()
+        
+        assert stats["total_messages"] == 4
+        assert stats["user_messages"] == 2
+        assert stats["assistant_messages"] == 2
+        
+        context.clear_context()
+        assert context.get_stats()["user_messages"] == 0
+    
+    def test_empty_metadata_stored_as_null(self, test_config, temp_db_path):
+        """Test empty metadata is persisted as NULL and loaded back as {}"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        context = ContextManager(test_config)
+        context.add_message("user", "No metadata")
+        context.add_message("user", "With metadata", metadata={"intent": "test"})
+        context.close()
+        
+        conn = sqlite3.connect(temp_db_path)
+        stored = [row[0] for row in conn.execute("SELECT metadata FROM conversations ORDER BY id")]
+        conn.close()
+        
+        assert stored == [None, '{"intent": "test"}']
+        
+        reloaded = ContextManager(test_config)
+        assert reloaded.conversation_history[0]["metadata"] == {}
+        assert reloaded.conversation_history[1]["metadata"] == {"intent": "test"}
+    
+    def test_load_from_database_in_batches(self, test_config, temp_db_path, monkeypatch):
+        """Test history larger than one fetch batch is fully loaded in order"""
+        import src.context_manager as context_module
+        monkeypatch.setattr(context_module, "LOAD_BATCH_SIZE", 3)
+        
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        
+        writer = ContextManager(test_config)
+        for i in range(10):
+            writer.add_message("user", f"Message {i}")
+        writer.close()
+        
+        context = ContextManager(test_config)
+        
+        assert [m["content"] for m in context.conversation_history] == [
+            f"Message {i}" for i in range(10)
+        ]
+        assert len(context._timestamps) == 10
+    
+    def test_prunes_expired_rows_on_startup(self, test_config, temp_db_path):
+        """Test rows older than the retention period are deleted on load"""
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        test_config.auto_delete_context_days = 7
+        
+        context = ContextManager(test_config)
+        context.add_message("user", "Old message")
+        context.add_message("user", "Recent message")
+        context.close()
+        
+        old_ms = int((datetime.now() - timedelta(days=10)).timestamp() * 1000)
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute("UPDATE conversations SET timestamp = ? WHERE content = ?", (old_ms, "Old message"))
+        conn.commit()
+        conn.close()
+        
+        reloaded = ContextManager(test_config)
+        reloaded.close()
+        
+        conn = sqlite3.connect(temp_db_path)
+        contents = [row[0] for row in conn.execute("SELECT content FROM conversations")]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        conn.close()
+        
+        assert contents == ["Recent message"]
+        assert auto_vacuum == 2  # INCREMENTAL
+    
+    def test_trimming_prunes_database(self, test_config, temp_db_path, monkeypatch):
+        """Test trimming enough messages from memory prunes the database"""
+        import src.context_manager as context_module
+        monkeypatch.setattr(context_module, "PRUNE_INTERVAL", 2)
+        
+        test_config.enable_persistent_memory = True
+        test_config.memory_db_path = temp_db_path
+        test_config.context_window_hours = 1
+        test_config.auto_delete_context_days = 1
+        
+        context = ContextManager(test_config)
+        context.add_message("user", "Expired 1")
+        context.add_message("assistant", "Expired 2")
+        context.flush()
+        
+        # Age both messages past the context window and retention period
+        old = datetime.now() - timedelta(days=2)
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute("UPDATE conversations SET timestamp = ?", (int(old.timestamp() * 1000),))
+        conn.commit()
+        conn.close()
+        context._timestamps[0] = context._timestamps[1] = old.timestamp()
+        
+        context.add_message("user", "Fresh")
+        context.close()
+        
+        conn = sqlite3.connect(temp_db_path)
+        contents = [row[0] for row in conn.execute("SELECT content FROM conversations")]
+        conn.close()
+        
+        assert [m["content"] for m in context.conversation_history] == ["Fresh"]
+        assert contents == ["Fresh"]
@@ -87,6 +87,104 @@ class TestSetupLogging:
         assert len(logger.handlers) >= 1
 
 
+class TestOrjsonFormatter:
+    """Test JSON log formatting"""
+    
+    def test_format_record(self):
+        """Test records format as one JSON object per line"""
+        import json
+        from src.utils.logging import OrjsonFormatter
+        
+        record = logging.LogRecord(
+            "test_module", logging.WARNING, __file__, 1, "Value is %s", ("42",), None
+        )
+        entry = json.loads(OrjsonFormatter().format(record))
+        
+        assert entry["severity"] == "WARNING"
+        assert entry["name"] == "test_module"
+        assert entry["message"] == "Value is 42"
+        assert entry["@timestamp"].endswith("+00:00")
+        assert "exc_info" not in entry
+    
+    def test_format_record_with_exception(self):
+        """Test tracebacks are included when present"""
+        import json
+        import sys
+        from src.utils.logging import OrjsonFormatter
+        
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord(
+                "test_module", logging.DEBUG, __file__, 1, "Failed", (), sys.exc_info()
+            )
+        entry = json.loads(OrjsonFormatter().format(record))
+        
+        assert "ValueError: boom" in entry["exc_info"]
+    
+    def test_format_record_with_extra(self):
+        """Test fields passed through extra= are merged into the entry"""
+        import json
+        from pathlib import Path
+        from src.utils.logging import OrjsonFormatter
+        
+        logger = logging.getLogger("test_orjson_extra")
+        record = logger.makeRecord(
+            logger.name, logging.ERROR, __file__, 1, "Failed", (), None,
+            extra={"request_id": "req-42", "path": Path("/tmp/x")}
+        )
+        entry = json.loads(OrjsonFormatter().format(record))
+        
+        assert entry["request_id"] == "req-42"
+        assert entry["path"] == "/tmp/x"
+        assert "levelno" not in entry
+        assert "args" not in entry
+
+
+class TestFastProcessor:
+    """Test the merged structlog processor"""
+    
+    def test_adds_fields_and_formats_args(self):
+        """Test name, level, timestamp and positional args are handled"""
+        from src.utils.logging import _fast_processor
+        
+        logger = logging.getLogger("fast.fields")
+        logger.setLevel(logging.DEBUG)
+        event = _fast_processor(logger, "warn", {"event": "hello %s", "positional_args": ("world",)})
+        
+        assert event["event"] == "hello world"
+        assert event["logger"] == "fast.fields"
+        assert event["level"] == "warning"
+        assert "timestamp" in event
+        assert "positional_args" not in event
+    
+    def test_drops_events_below_level(self):
+        """Test events under the logger's level are dropped"""
+        import structlog
+        from src.utils.logging import _fast_processor
+        
+        logger = logging.getLogger("fast.filtered")
+        logger.setLevel(logging.WARNING)
+        
+        with pytest.raises(structlog.DropEvent):
+            _fast_processor(logger, "info", {"event": "quiet"})
+    
+    def test_renders_exc_info(self):
+        """Test exc_info is rendered to a traceback string"""
+        from src.utils.logging import _fast_processor
+        
+        logger = logging.getLogger("fast.exc")
+        logger.setLevel(logging.DEBUG)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            event = _fast_processor(logger, "exception", {"event": "failed", "exc_info": True})
+        
+        assert event["level"] == "error"
+        assert "ValueError: boom" in event["exception"]
+        assert "exc_info" not in event
+
+
 class TestGetLogger:
     """Test get_logger function"""
     
@@ -99,6 +197,15 @@ class TestGetLogger:
         assert isinstance(logger, logging.Logger)
         assert logger.name == "test_module"
     
+    def test_get_logger_is_cached(self):
+        """Test repeated calls return the same logger as logging.getLogger"""
+        from src.utils.logging import get_logger
+        
+        logger = get_logger("test_cached_module")
+        
+        assert get_logger("test_cached_module") is logger
+        assert logging.getLogger("test_cached_module") is logger
+    
     def test_get_logger_with_dunder_name(self):
         """Test get_logger with __name__"""
         from src.utils.logging import get_logger
@@ -36,13 +36,14 @@ class TestAmbientAIInitialization:
              patch('src.main.ContextManager'), \
              patch('src.main.StateMachine'), \
              patch('src.main.ActionExecutor'), \
-             patch('src.main.Config') as mock_config:
+             patch('src.main.get_config') as mock_get_config:
             
-            mock_config.return_value = Mock()
+            mock_get_config.return_value = Mock()
             from src.main import AmbientAI
             ai = AmbientAI()
             
-            mock_config.assert_called_once()
+            mock_get_config.assert_called_once()
+            assert ai.config is mock_get_config.return_value
 
 
 class TestAmbientAISignalHandling:
@@ -303,6 +304,19 @@ class TestMainFunction:
             mock_ai_class.assert_called_once()
             mock_ai.start_sync.assert_called_once()
     
+    def test_main_function_installs_uvloop(self):
+        """Test main installs uvloop when it is available"""
+        mock_uvloop = Mock()
+        
+        with patch.dict(sys.modules, {'uvloop': mock_uvloop}), \
+             patch('src.main.AmbientAI') as mock_ai_class:
+            mock_ai_class.return_value.start_sync.side_effect = KeyboardInterrupt()
+            
+            from src.main import main
+            main()
+            
+            mock_uvloop.install.assert_called_once()
+    
     def test_main_function_fatal_error(self):
         """Test main function handles fatal errors"""
         with patch('src.main.AmbientAI') as mock_ai_class:
@@ -8,6 +8,14 @@ import asyncio
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
 
 
+def stream_of(*chunks):
+    """Build a process_stream_async replacement yielding the given chunks"""
+    async def process_stream_async(*args, **kwargs):
+        for chunk in chunks:
+            yield chunk
+    return process_stream_async
+
+
 class TestAmbientAIAsyncStart:
     """Test async start() method and main loop"""
     
@@ -24,7 +32,9 @@ class TestAmbientAIAsyncStart:
             # Create mock instances
             vi_inst = Mock()
             vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
             nlu_inst = Mock()
+            nlu_inst.aclose = AsyncMock()
             ctx_inst = Mock()
             sm_inst = Mock()
             ae_inst = Mock()
@@ -44,7 +54,8 @@ class TestAmbientAIAsyncStart:
             vo_inst.play_chime_async = AsyncMock()
             vi_inst.capture_audio_async = AsyncMock(return_value=b"audio_data")
             vi_inst.transcribe_async = AsyncMock(return_value="hello")
-            nlu_inst.process_async = AsyncMock(return_value="Hi there!")
+            nlu_inst.process_stream_async = stream_of("Hi there!")
+            nlu_inst.strip_actions.side_effect = lambda text: text
             nlu_inst.extract_actions.return_value = []
             ctx_inst.get_recent_context.return_value = []
             sm_inst.get_current_state.return_value = "idle"
@@ -70,6 +81,10 @@ class TestAmbientAIAsyncStart:
             
             # Verify welcome message was spoken
             assert vo_inst.speak_async.call_count >= 1
+            
+            # Pooled API connections are released on exit
+            nlu_inst.aclose.assert_awaited_once()
+            vo_inst.aclose.assert_awaited_once()
     
     @pytest.mark.asyncio
     async def test_start_with_wake_word(self, test_config):
@@ -83,7 +98,9 @@ class TestAmbientAIAsyncStart:
             
             vi_inst = Mock()
             vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
             nlu_inst = Mock()
+            nlu_inst.aclose = AsyncMock()
             ctx_inst = Mock()
             sm_inst = Mock()
             ae_inst = Mock()
@@ -113,7 +130,7 @@ class TestAmbientAIAsyncStart:
             vi_inst.wait_for_wake_word_async = wake_word_side_effect
             vi_inst.capture_audio_async = AsyncMock(return_value=b"audio")
             vi_inst.transcribe_async = AsyncMock(return_value="test command")
-            nlu_inst.process_async = AsyncMock(return_value="Response")
+            nlu_inst.process_stream_async = stream_of("Response")
             nlu_inst.extract_actions.return_value = []
             ctx_inst.get_recent_context.return_value = []
             sm_inst.get_current_state.return_value = "idle"
@@ -150,10 +167,12 @@ class TestAmbientAIAsyncStart:
             
             vi_inst = Mock()
             vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
             
             mock_vi.return_value = vi_inst
             mock_vo.return_value = vo_inst
             mock_nlu.return_value = Mock()
+            mock_nlu.return_value.aclose = AsyncMock()
             mock_ctx.return_value = Mock()
             mock_sm.return_value = Mock()
             mock_ae.return_value = Mock()
@@ -186,16 +205,18 @@ class TestAmbientAIAsyncStart:
         """Test that empty transcription continues loop"""
         with patch('src.main.VoiceInput') as mock_vi, \
              patch('src.main.VoiceOutput') as mock_vo, \
-             patch('src.main.NLUCore'), \
+             patch('src.main.NLUCore') as mock_nlu, \
              patch('src.main.ContextManager'), \
              patch('src.main.StateMachine'), \
              patch('src.main.ActionExecutor'):
             
             vi_inst = Mock()
             vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
             
             mock_vi.return_value = vi_inst
             mock_vo.return_value = vo_inst
+            mock_nlu.return_value.aclose = AsyncMock()
             
             test_config.enable_wake_word = False
             
@@ -231,7 +252,9 @@ class TestAmbientAIAsyncStart:
             
             vi_inst = Mock()
             vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
             nlu_inst = Mock()
+            nlu_inst.aclose = AsyncMock()
             ctx_inst = Mock()
             sm_inst = Mock()
             ae_inst = Mock()
@@ -257,7 +280,8 @@ class TestAmbientAIAsyncStart:
                 return "turn on lights"
             
             vi_inst.transcribe_async = transcribe_side_effect
-            nlu_inst.process_async = AsyncMock(return_value="Turning on lights")
+            nlu_inst.process_stream_async = stream_of("Turning on lights")
+            nlu_inst.strip_actions.side_effect = lambda text: text
             nlu_inst.extract_actions.return_value = [{"type": "light", "action": "on"}]
             ae_inst.execute_batch_async = AsyncMock(return_value=[{"success": True}])
             ctx_inst.get_recent_context.return_value = []
@@ -283,7 +307,9 @@ class TestAmbientAIAsyncStart:
             
             vi_inst = Mock()
             vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
             nlu_inst = Mock()
+            nlu_inst.aclose = AsyncMock()
             
             mock_vi.return_value = vi_inst
             mock_vo.return_value = vo_inst
@@ -302,8 +328,9 @@ class TestAmbientAIAsyncStart:
                 if call_count == 1:
                     raise Exception("NLU error")
                 raise KeyboardInterrupt()
+                yield  # Makes this an async generator
             
-            nlu_inst.process_async = process_side_effect
+            nlu_inst.process_stream_async = process_side_effect
             
             from src.main import AmbientAI
             ai = AmbientAI(test_config)
@@ -314,3 +341,160 @@ class TestAmbientAIAsyncStart:
             error_calls = [call for call in vo_inst.speak_async.call_args_list 
                          if "error" in str(call).lower()]
             assert len(error_calls) >= 1
+    
+    @pytest.mark.asyncio
+    async def test_start_speaks_streamed_sentences(self, test_config):
+        """Test each streamed sentence is spoken and actions run on the full text"""
+        with patch('src.main.VoiceInput') as mock_vi, \
+             patch('src.main.VoiceOutput') as mock_vo, \
+             patch('src.main.NLUCore') as mock_nlu, \
+             patch('src.main.ContextManager') as mock_ctx, \
+             patch('src.main.StateMachine'), \
+             patch('src.main.ActionExecutor') as mock_ae:
+            
+            from src.nlu_core import NLUCore
+            
+            vi_inst = Mock()
+            vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
+            nlu_inst = Mock()
+            nlu_inst.aclose = AsyncMock()
+            ctx_inst = Mock()
+            ae_inst = Mock()
+            
+            mock_vi.return_value = vi_inst
+            mock_vo.return_value = vo_inst
+            mock_nlu.return_value = nlu_inst
+            mock_ctx.return_value = ctx_inst
+            mock_ae.return_value = ae_inst
+            
+            test_config.enable_wake_word = False
+            
+            vo_inst.speak_async = AsyncMock()
+            vi_inst.capture_audio_async = AsyncMock(return_value=b"audio")
+            vi_inst.transcribe_async = AsyncMock(side_effect=["lights please", KeyboardInterrupt()])
+            ctx_inst.get_recent_context.return_value = []
+            
+            real_nlu = NLUCore(test_config)
+            action = 'ACTION: {"action_type": "smart_home", "parameters": {"action": "on"}}'
+            nlu_inst.process_stream_async = stream_of("Sure.", "Turning them on.", action)
+            nlu_inst.strip_actions = real_nlu.strip_actions
+            nlu_inst.extract_actions = real_nlu.extract_actions
+            ae_inst.execute_batch_async = AsyncMock(
+                return_value=[{"success": False, "error": "device offline"}]
+            )
+            
+            from src.main import AmbientAI
+            ai = AmbientAI(test_config)
+            
+            await ai.start()
+            
+            spoken = [call.args[0] for call in vo_inst.speak_async.call_args_list[1:]]
+            assert spoken == [
+                "Sure.",
+                "Turning them on.",
+                "However, I encountered some issues: device offline"
+            ]
+            ae_inst.execute_batch_async.assert_awaited_once_with(
+                [{"action_type": "smart_home", "parameters": {"action": "on"}}]
+            )
+    
+    @pytest.mark.asyncio
+    async def test_start_listens_for_next_wake_word_after_reply(self, test_config):
+        """Test the next wake word listen starts once the reply has been spoken"""
+        with patch('src.main.VoiceInput') as mock_vi, \
+             patch('src.main.VoiceOutput') as mock_vo, \
+             patch('src.main.NLUCore') as mock_nlu, \
+             patch('src.main.ContextManager') as mock_ctx, \
+             patch('src.main.StateMachine'), \
+             patch('src.main.ActionExecutor'):
+            
+            vi_inst = Mock()
+            vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
+            nlu_inst = Mock()
+            nlu_inst.aclose = AsyncMock()
+            
+            mock_vi.return_value = vi_inst
+            mock_vo.return_value = vo_inst
+            mock_nlu.return_value = nlu_inst
+            mock_ctx.return_value.get_recent_context.return_value = []
+            
+            test_config.enable_wake_word = True
+            
+            events = []
+            
+            async def speak(text):
+                events.append("speak")
+            
+            async def listen(stop_event=None):
+                events.append("listen")
+                return True
+            
+            vo_inst.speak_async = AsyncMock(side_effect=speak)
+            vo_inst.play_chime_async = AsyncMock()
+            vi_inst.wait_for_wake_word_async = AsyncMock(side_effect=listen)
+            vi_inst.capture_audio_async = AsyncMock(return_value=b"audio")
+            vi_inst.transcribe_async = AsyncMock(side_effect=["hello", KeyboardInterrupt()])
+            nlu_inst.process_stream_async = stream_of("Hi!")
+            nlu_inst.strip_actions.side_effect = lambda text: text
+            nlu_inst.extract_actions.return_value = []
+            
+            from src.main import AmbientAI
+            ai = AmbientAI(test_config)
+            
+            await ai.start()
+            
+            # Welcome, first listen, reply, then the listen for the next command
+            assert events == ["speak", "listen", "speak", "listen"]
+            assert vo_inst.play_chime_async.await_count == 2
+            
+            # Listens can be ended from another thread through stop()
+            stop_event = vi_inst.wait_for_wake_word_async.call_args.kwargs["stop_event"]
+            assert stop_event is ai._wake_stop
+    
+    @pytest.mark.asyncio
+    async def test_start_stops_pending_wake_word_listen(self, test_config):
+        """Test stop() ends a wake word listen blocked in its thread"""
+        with patch('src.main.VoiceInput') as mock_vi, \
+             patch('src.main.VoiceOutput') as mock_vo, \
+             patch('src.main.NLUCore') as mock_nlu, \
+             patch('src.main.ContextManager'), \
+             patch('src.main.StateMachine'), \
+             patch('src.main.ActionExecutor'):
+            
+            vi_inst = Mock()
+            vo_inst = Mock()
+            vo_inst.aclose = AsyncMock()
+            nlu_inst = Mock()
+            nlu_inst.aclose = AsyncMock()
+            
+            mock_vi.return_value = vi_inst
+            mock_vo.return_value = vo_inst
+            mock_nlu.return_value = nlu_inst
+            
+            test_config.enable_wake_word = True
+            
+            from src.main import AmbientAI
+            ai = AmbientAI(test_config)
+            
+            listens = []
+            
+            def wait_for_wake_word(stop_event):
+                # Blocks like the real listen until told to stop
+                listens.append(stop_event)
+                stop_event.wait(timeout=5)
+                return False
+            
+            async def listen(stop_event=None):
+                return await asyncio.to_thread(wait_for_wake_word, stop_event)
+            
+            vo_inst.speak_async = AsyncMock()
+            vi_inst.wait_for_wake_word_async = listen
+            
+            asyncio.get_running_loop().call_later(0.05, ai.stop)
+            await asyncio.wait_for(ai.start(), timeout=2)
+            
+            assert len(listens) == 1
+            assert listens[0].is_set()
+            vi_inst.capture_audio_async.assert_not_called()
@@ -3,6 +3,8 @@ Unit tests for NLU Core
 Tests natural language understanding, action extraction, and intent classification
 """
 
+import logging
+
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from src.nlu_core import NLUCore
@@ -31,6 +33,21 @@ class TestNLUCore:
             assert "ACTION:" in prompt
             assert "smart_home" in prompt
     
+    def test_sync_client_created_lazily(self, test_config):
+        """Test the sync OpenAI client is only built when first used"""
+        with patch('src.nlu_core.OpenAI') as mock_openai, patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            mock_openai.assert_not_called()
+            
+            assert nlu.client is nlu.client
+            mock_openai.assert_called_once_with(api_key=test_config.openai_api_key)
+    
+    async def test_aclose(self, test_config):
+        """Test aclose can be awaited"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            await nlu.aclose()
+    
     def test_custom_system_prompt(self, test_config):
         """Test custom system prompt"""
         custom_prompt = "You are a custom AI assistant"
@@ -114,6 +131,22 @@ class TestNLUCore:
                 # Should return error message
                 assert "sorry" in response.lower() or "trouble" in response.lower()
     
+    def test_process_error_logs_traceback_at_debug(self, test_config, caplog):
+        """Test processing errors log the traceback only at DEBUG level"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            nlu.client = Mock()
+            nlu.client.chat.completions.create.side_effect = Exception("API Error")
+            
+            with caplog.at_level(logging.DEBUG, logger="src.nlu_core"):
+                nlu.process("Test input")
+            
+            error = next(r for r in caplog.records if r.levelno == logging.ERROR)
+            debug = next(r for r in caplog.records if r.levelno == logging.DEBUG)
+            assert error.getMessage() == "NLU processing error: API Error"
+            assert error.exc_info is None
+            assert debug.exc_info is not None
+    
     def test_build_messages_simple(self, test_config):
         """Test building messages for API call"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -147,6 +180,62 @@ class TestNLUCore:
             assert len(messages) == 3
             assert any("state" in msg.get("content", "").lower() for msg in messages)
     
+    def test_build_messages_reuses_state_message(self, test_config):
+        """Test the state message is rebuilt only when state changes"""
+        from src.state_machine import StateMachine
+        sm = StateMachine(test_config)
+        
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            first = nlu._build_messages("One", None, sm.get_current_state())[1]
+            second = nlu._build_messages("Two", None, sm.get_current_state())[1]
+            assert second is first
+            assert "data: {}" in first["content"]
+            
+            sm.set_state_data("last_input", "Two")
+            third = nlu._build_messages("Three", None, sm.get_current_state())[1]
+            assert third is not first
+            assert "'last_input': 'Two'" in third["content"]
+            
+            # Unhashable state is formatted every time
+            devices = ["lights"]
+            nlu._build_messages("Four", None, {"devices_on": devices})
+            devices.append("tv")
+            fifth = nlu._build_messages("Five", None, {"devices_on": devices})[1]
+            assert "'tv'" in fifth["content"]
+    
+    def test_build_messages_keeps_stable_prefix(self, test_config, sample_context_messages):
+        """Test state goes after history so the prompt prefix stays cacheable"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            idle = nlu._build_messages("Test", sample_context_messages, {"state": "idle"})
+            busy = nlu._build_messages("Test", sample_context_messages, {"state": "processing"})
+            
+            prefix_length = 1 + len(sample_context_messages)
+            assert idle[:prefix_length] == busy[:prefix_length]
+            assert idle[-2]["content"] == "Current system state: state: idle"
+            assert idle[-1] == {"role": "user", "content": "Test"}
+    
+    def test_format_state_info_unhashable_values(self, test_config):
+        """Test formatting state with list values"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            formatted = nlu._format_state_info({"devices_on": ["lights", "tv"]})
+            
+            assert formatted == "devices_on: ['lights', 'tv']"
+    
+    def test_format_state_info_state_machine_view(self, test_config):
+        """Test the state machine's read-only data view renders as a dict"""
+        from src.state_machine import StateMachine
+        sm = StateMachine(test_config)
+        sm.set_state_data("room", "kitchen")
+        
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            formatted = nlu._format_state_info(sm.get_current_state())
+            
+            assert formatted == "state: idle, previous_state: None, data: {'room': 'kitchen'}"
+    
     def test_format_state_info(self, test_config):
         """Test state information formatting"""
         state = {"location": "kitchen", "temperature": 72, "lights": "on"}
@@ -211,6 +300,33 @@ class TestNLUCore:
             
             assert len(actions) == 0  # Should skip invalid JSON
     
+    def test_extract_actions_bareword_keys(self, test_config):
+        """Test actions written with unquoted keys are parsed"""
+        response = 'Done. ACTION: {action_type: "smart_home", parameters: {device: "lights", time: "10:30"}}'
+        
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            actions = nlu.extract_actions(response)
+            
+            assert actions == [
+                {"action_type": "smart_home", "parameters": {"device": "lights", "time": "10:30"}}
+            ]
+    
+    def test_extract_actions_nested_and_unbalanced(self, test_config):
+        """Test nested braces are matched and unterminated actions skipped"""
+        response = (
+            'ACTION: {"action_type": "custom", "parameters": {"options": {"level": 2}}} '
+            'then ACTION: {"action_type": "media", "parameters": {"action": "play"}'
+        )
+        
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            actions = nlu.extract_actions(response)
+            
+            assert actions == [
+                {"action_type": "custom", "parameters": {"options": {"level": 2}}}
+            ]
+    
     def test_extract_entities_devices(self, test_config):
         """Test extracting device entities"""
         text = "Turn on the living room lights and lock the door"
@@ -306,6 +422,26 @@ class TestNLUCore:
             assert nlu.classify_intent("Hello there") == "general"
             assert nlu.classify_intent("Thank you") == "general"
     
+    def test_classify_intent_matches_whole_words_by_priority(self, test_config):
+        """Test keywords match whole words and the higher priority intent wins"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            
+            # "set" inside "sunset" is not a control keyword
+            assert nlu.classify_intent("Sunset was lovely") == "general"
+            # Control outranks query even when the query word comes first
+            assert nlu.classify_intent("What should I set it to?") == "control"
+            assert nlu.classify_intent("Please remind me at noon") == "reminder"
+    
+    def test_intent_table_covers_every_mask(self, test_config):
+        """Test each intent bitmask maps to its highest priority intent"""
+        table = NLUCore.INTENT_TABLE
+        
+        assert len(table) == 1 << len(NLUCore.INTENT_KEYWORDS)
+        assert table[0] == "general"
+        assert table[NLUCore.INTENT_LOOKUP["play"]] == "media"
+        assert table[NLUCore.INTENT_LOOKUP["play"] | NLUCore.INTENT_LOOKUP["what"]] == "query"
+    
     def test_confidence_score_high(self, test_config):
         """Test high confidence score"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -341,3 +477,188 @@ class TestNLUCore:
             
             # Should have system + last 5 context messages + new message
             assert len(messages) <= 7  # system + 5 context + current
+    
+    def test_build_messages_context_shapes(self, test_config):
+        """Test history is trimmed and reduced to role and content"""
+        context = [
+            {"role": "user", "content": "Old"},
+            {"role": "user", "content": "Kept", "timestamp": "2024-01-01T00:00:00"},
+            {"role": "assistant", "content": "Reply"}
+        ]
+        test_config.max_context_length = 2
+        
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            messages = nlu._build_messages("Next", context, None)
+            
+            assert messages[1:3] == [
+                {"role": "user", "content": "Kept"},
+                {"role": "assistant", "content": "Reply"}
+            ]
+    
+    @pytest.mark.asyncio
+    async def test_process_async_semantic_cache(self, test_config):
+        """Test equivalent requests are served from the semantic cache"""
+        test_config.enable_semantic_cache = True
+        
+        nlu = NLUCore(test_config)
+        nlu.async_client = Mock()
+        nlu.async_client.embeddings.create = AsyncMock(
+            return_value=Mock(data=[Mock(embedding=[0.6, 0.8])])
+        )
+        nlu.async_client.chat.completions.create = AsyncMock(
+            return_value=Mock(choices=[Mock(message=Mock(content="It's sunny"))])
+        )
+        
+        first = await nlu.process_async("What's the weather?", state={"state": "idle"})
+        second = await nlu.process_async("what is the weather", state={"state": "idle"})
+        
+        assert first == second == "It's sunny"
+        assert nlu.async_client.chat.completions.create.await_count == 1
+        
+        # A different system state is a separate cache scope
+        await nlu.process_async("What's the weather?", state={"state": "processing"})
+        assert nlu.async_client.chat.completions.create.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_process_async_semantic_cache_with_current_input_in_context(self, test_config):
+        """Test paraphrases hit the cache when the caller already added the input to context"""
+        test_config.enable_semantic_cache = True
+        
+        nlu = NLUCore(test_config)
+        nlu.async_client = Mock()
+        nlu.async_client.embeddings.create = AsyncMock(
+            return_value=Mock(data=[Mock(embedding=[0.6, 0.8])])
+        )
+        nlu.async_client.chat.completions.create = AsyncMock(
+            return_value=Mock(choices=[Mock(message=Mock(content="It's sunny"))])
+        )
+        history = [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi there"},
+        ]
+        
+        # AmbientAI adds the user message before reading the context
+        for text in ("What's the weather?", "what is the weather"):
+            context = history + [{"role": "user", "content": text}]
+            assert await nlu.process_async(text, context=context) == "It's sunny"
+        
+        assert nlu.async_client.chat.completions.create.await_count == 1
+        
+        # A different previous exchange is a separate cache scope
+        context = [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Good morning"},
+            {"role": "user", "content": "What's the weather?"},
+        ]
+        await nlu.process_async("What's the weather?", context=context)
+        assert nlu.async_client.chat.completions.create.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_process_async_semantic_cache_skips_actions(self, test_config):
+        """Test near-duplicate action requests are not served from the cache"""
+        test_config.enable_semantic_cache = True
+        
+        nlu = NLUCore(test_config)
+        nlu.async_client = Mock()
+        nlu.async_client.embeddings.create = AsyncMock(
+            return_value=Mock(data=[Mock(embedding=[0.6, 0.8])])
+        )
+        nlu.async_client.chat.completions.create = AsyncMock(side_effect=[
+            Mock(choices=[Mock(message=Mock(content=(
+                'Setting it to 72. ACTION: {"action_type": "smart_home", '
+                '"parameters": {"device": "thermostat", "value": 72}}'
+            )))]),
+            Mock(choices=[Mock(message=Mock(content=(
+                'Setting it to 73. ACTION: {"action_type": "smart_home", '
+                '"parameters": {"device": "thermostat", "value": 73}}'
+            )))]),
+        ])
+        
+        await nlu.process_async("Set the thermostat to 72", state={"state": "idle"})
+        second = await nlu.process_async("set the thermostat to 73", state={"state": "idle"})
+        
+        assert nlu.async_client.chat.completions.create.await_count == 2
+        assert nlu.extract_actions(second)[0]["parameters"]["value"] == 73
+        assert len(nlu.semantic_cache) == 0
+    
+    @pytest.mark.asyncio
+    async def test_process_stream_async_yields_sentences(self, test_config):
+        """Test streamed deltas are regrouped into sentences with actions last"""
+        deltas = [
+            "Sure", ", turning on", " the lights. Anything", " else? ACTION: {\"action_type\": ",
+            "\"smart_home\", \"parameters\": {\"action\": \"on\"}}"
+        ]
+        
+        async def stream():
+            for delta in deltas:
+                yield Mock(choices=[Mock(delta=Mock(content=delta))])
+        
+        nlu = NLUCore(test_config)
+        nlu.async_client = Mock()
+        nlu.async_client.chat.completions.create = AsyncMock(return_value=stream())
+        
+        chunks = [chunk async for chunk in nlu.process_stream_async("Lights on")]
+        
+        assert chunks == [
+            "Sure, turning on the lights.",
+            "Anything else?",
+            'ACTION: {"action_type": "smart_home", "parameters": {"action": "on"}}'
+        ]
+        assert nlu.async_client.chat.completions.create.call_args.kwargs["stream"] is True
+        assert len(nlu.extract_actions(" ".join(chunks))) == 1
+    
+    @pytest.mark.asyncio
+    async def test_process_stream_async_error(self, test_config):
+        """Test a failed stream yields the apology response"""
+        nlu = NLUCore(test_config)
+        nlu.async_client = Mock()
+        nlu.async_client.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
+        
+        chunks = [chunk async for chunk in nlu.process_stream_async("Hello")]
+        
+        assert len(chunks) == 1
+        assert "sorry" in chunks[0].lower()
+    
+    def test_strip_actions(self, test_config):
+        """Test ACTION blocks are removed from spoken text"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            
+            text = 'Done. ACTION: {"action_type": "media", "parameters": {"a": {}}} And more.'
+            
+            assert nlu.strip_actions(text) == "Done. And more."
+            assert nlu.strip_actions('ACTION: {"action_type": "media"}') == ""
+            assert nlu.strip_actions("Plain reply ") == "Plain reply"
+    
+    @pytest.mark.asyncio
+    async def test_process_async_trivial_commands(self, test_config):
+        """Test trivial commands are answered without calling the model"""
+        nlu = NLUCore(test_config)
+        nlu.async_client = Mock()
+        nlu.async_client.chat.completions.create = AsyncMock()
+        
+        assert await nlu.process_async("  Stop! ") == "Okay, stopping."
+        
+        response = await nlu.process_async("What time is it?")
+        assert nlu.extract_actions(response) == [
+            {"action_type": "information", "parameters": {"type": "time"}}
+        ]
+        
+        chunks = [chunk async for chunk in nlu.process_stream_async("help")]
+        assert len(chunks) == 1
+        nlu.async_client.chat.completions.create.assert_not_called()
+    
+    def test_register_trivial(self, test_config):
+        """Test registering trivial phrases and patterns"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            nlu = NLUCore(test_config)
+            nlu.register_trivial("Good night", "Good night!")
+            nlu.register_trivial(r"thanks?( you)?", "You're welcome!")
+            nlu.register_trivial(r"Turn (on|off) the TV", "Done.")
+            
+            assert nlu.trivial_responses["good night"] == "Good night!"
+            assert nlu.process("good night.") == "Good night!"
+            assert nlu.process("Thank you!") == "You're welcome!"
+            assert nlu.process("Turn off the TV") == "Done."
+            assert nlu._match_trivial("thanks for everything") is None
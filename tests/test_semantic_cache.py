@@ -0,0 +1,80 @@
+"""
+Unit tests for Semantic Cache
+Tests similarity lookup, scoping, and LRU eviction
+"""
+
+from src.semantic_cache import SemanticCache
+
+
+class TestSemanticCache:
+    """Test semantic response caching"""
+    
+    def test_lookup_empty_cache(self):
+        """Test lookup on an empty cache misses"""
+        cache = SemanticCache()
+        
+        assert cache.lookup("scope", [1.0, 0.0]) is None
+        assert len(cache) == 0
+    
+    def test_similar_embedding_hits(self):
+        """Test a near-identical embedding returns the cached response"""
+        cache = SemanticCache(threshold=0.95)
+        cache.store("scope", [1.0, 0.0, 0.0], "Cached response")
+        
+        # Scale doesn't matter; embeddings are normalized
+        assert cache.lookup("scope", [2.0, 0.1, 0.0]) == "Cached response"
+    
+    def test_dissimilar_embedding_misses(self):
+        """Test an embedding below the threshold misses"""
+        cache = SemanticCache(threshold=0.95)
+        cache.store("scope", [1.0, 0.0, 0.0], "Cached response")
+        
+        assert cache.lookup("scope", [0.0, 1.0, 0.0]) is None
+    
+    def test_lookup_is_scoped(self):
+        """Test entries are only returned for the matching scope"""
+        cache = SemanticCache()
+        cache.store(("idle", ()), [1.0, 0.0], "Idle response")
+        
+        assert cache.lookup(("processing", ()), [1.0, 0.0]) is None
+        assert cache.lookup(("idle", ()), [1.0, 0.0]) == "Idle response"
+    
+    def test_evicts_least_recently_used(self):
+        """Test the least recently used entry is replaced when full"""
+        cache = SemanticCache(max_entries=2)
+        cache.store("scope", [1.0, 0.0, 0.0], "First")
+        cache.store("scope", [0.0, 1.0, 0.0], "Second")
+        
+        # Touch the first entry so the second becomes least recently used
+        assert cache.lookup("scope", [1.0, 0.0, 0.0]) == "First"
+        
+        cache.store("scope", [0.0, 0.0, 1.0], "Third")
+        
+        assert len(cache) == 2
+        assert cache.lookup("scope", [0.0, 1.0, 0.0]) is None
+        assert cache.lookup("scope", [1.0, 0.0, 0.0]) == "First"
+        assert cache.lookup("scope", [0.0, 0.0, 1.0]) == "Third"
+    
+    def test_matrix_grows_by_doubling(self):
+        """Test the embedding matrix grows as entries are added"""
+        cache = SemanticCache(max_entries=40)
+        
+        for i in range(40):
+            vector = [0.0] * 40
+            vector[i] = 1.0
+            cache.store("scope", vector, f"Response {i}")
+            assert cache._vectors.shape[0] >= len(cache)
+        
+        assert cache._vectors.shape == (40, 40)
+        assert cache.lookup("scope", [0.0] * 39 + [1.0]) == "Response 39"
+        assert cache.lookup("scope", [1.0] + [0.0] * 39) == "Response 0"
+    
+    def test_clear(self):
+        """Test clearing the cache"""
+        cache = SemanticCache()
+        cache.store("scope", [1.0, 0.0], "Cached response")
+        
+        cache.clear()
+        
+        assert len(cache) == 0
+        assert cache.lookup("scope", [1.0, 0.0]) is None
@@ -147,6 +147,20 @@ class TestStateMachine:
         
         assert len(call_count) == 2
     
+    def test_callbacks_only_fire_for_their_state(self, test_config):
+        """Test callbacks are kept per state"""
+        sm = StateMachine(test_config)
+        calls = []
+        
+        sm.register_callback(SystemState.LISTENING, lambda data: calls.append("listening"))
+        sm.register_callback(SystemState.ERROR, lambda data: calls.append("error"))
+        
+        sm.transition_to(SystemState.LISTENING)
+        sm.transition_to(SystemState.PROCESSING)
+        
+        assert calls == ["listening"]
+        assert len(sm.state_callbacks) == len(SystemState)
+    
     def test_callback_error_handling(self, test_config):
         """Test callback errors don't crash system"""
         sm = StateMachine(test_config)
@@ -279,16 +293,28 @@ class TestStateMachine:
         assert SystemState.ERROR.value == "error"
     
     def test_get_current_state_with_data(self, test_config):
-        """Test getting current state returns copy of data"""
+        """Test getting current state returns read-only data"""
         sm = StateMachine(test_config)
         sm.set_state_data("key", "value")
         
         state1 = sm.get_current_state()
-        state1["data"]["key"] = "modified"
+        with pytest.raises(TypeError):
+            state1["data"]["key"] = "modified"
         
         state2 = sm.get_current_state()
         assert state2["data"]["key"] == "value"  # Should not be modified
     
+    def test_get_current_state_data_is_live_view(self, test_config):
+        """Test state data view reflects later updates"""
+        sm = StateMachine(test_config)
+        data = sm.get_current_state()["data"]
+        
+        sm.set_state_data("key", "value")
+        assert data["key"] == "value"
+        
+        sm.clear_state_data()
+        assert len(data) == 0
+    
     def test_state_data_persists_across_transitions(self, test_config):
         """Test state data persists when transitioning"""
         sm = StateMachine(test_config)
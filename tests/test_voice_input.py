@@ -3,6 +3,11 @@ Unit tests for Voice Input
 Tests speech-to-text processing, audio capture, and wake word detection
 """
 
+import io
+import sys
+import threading
+import wave
+
 import pytest
 import numpy as np
 from unittest.mock import Mock, patch, MagicMock, AsyncMock
@@ -28,7 +33,8 @@ def mock_sounddevice():
 def sample_audio_chunk():
     """Generate small sample audio data (reduced size to prevent memory issues)"""
     # Use small array: 1000 samples instead of 16000 to prevent memory leaks
-    return np.zeros(1000, dtype=np.float32)
+    # Quiet tone rather than zeros, so it clears the silence floor
+    return (0.1 * np.sin(np.linspace(0, 100, 1000))).astype(np.float32)
 
 
 class TestVoiceInput:
@@ -45,6 +51,17 @@ class TestVoiceInput:
             assert voice_input.is_recording is False
             assert isinstance(voice_input.audio_buffer, list)
     
+    def test_initialization_precomputes_silence_detection(self, test_config, mock_sounddevice):
+        """Test silence detection constants are derived once from the config"""
+        test_config.silence_threshold = 16384
+        test_config.silence_duration = 1.0
+        test_config.mic_chunk_size = 1000
+        
+        voice_input = VoiceInput(test_config)
+        
+        assert voice_input._silence_limit == 0.5 * 1000 * test_config.mic_channels
+        assert voice_input._silence_chunks_needed == test_config.mic_sample_rate // 1000
+    
     def test_initialization_with_wake_word(self, test_config, mock_sounddevice):
         """Test initialization with wake word enabled"""
         test_config.enable_wake_word = True
@@ -65,6 +82,19 @@ class TestVoiceInput:
             assert voice_input.is_ready() is True
             mock_sounddevice.query_devices.assert_called()
     
+    def test_is_ready_caches_success(self, test_config, mock_sounddevice):
+        """Test devices are enumerated once until the cache is invalidated"""
+        voice_input = VoiceInput(test_config)
+        
+        assert voice_input.is_ready() is True
+        assert voice_input.is_ready() is True
+        assert mock_sounddevice.query_devices.call_count == 1
+        
+        voice_input.invalidate_device_cache()
+        mock_sounddevice.query_devices.return_value = []
+        assert voice_input.is_ready() is False
+        assert mock_sounddevice.query_devices.call_count == 2
+    
     def test_is_ready_failure(self, test_config):
         """Test is_ready when no devices available"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -114,6 +144,18 @@ class TestVoiceInput:
             assert text == "Hello world"
             mock_client.audio.transcriptions.create.assert_called_once()
     
+    def test_clients_created_lazily(self, test_config, mock_sounddevice):
+        """Test OpenAI clients are only built on first use"""
+        with patch('src.voice_input.OpenAI') as mock_openai, \
+             patch('src.voice_input.AsyncOpenAI') as mock_async_openai:
+            voice_input = VoiceInput(test_config)
+            mock_openai.assert_not_called()
+            mock_async_openai.assert_not_called()
+            
+            assert voice_input.async_client is voice_input.async_client
+            mock_async_openai.assert_called_once_with(api_key=test_config.openai_api_key)
+            mock_openai.assert_not_called()
+    
     def test_transcribe_empty_audio(self, test_config, mock_sounddevice):
         """Test transcription with empty audio"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -149,6 +191,66 @@ class TestVoiceInput:
             
             assert text == "Async transcription"
     
+    @pytest.mark.asyncio
+    async def test_transcribe_batch_async(self, test_config, mock_sounddevice, sample_audio_chunk):
+        """Test clips are transcribed concurrently and returned in order"""
+        with patch('src.voice_input.OpenAI'), patch('src.voice_input.AsyncOpenAI') as mock_async_openai:
+            mock_client = AsyncMock()
+            mock_async_openai.return_value = mock_client
+            mock_client.audio.transcriptions.create.side_effect = ["first ", "second "]
+            
+            voice_input = VoiceInput(test_config)
+            texts = await voice_input.transcribe_batch_async(
+                [sample_audio_chunk, np.array([]), sample_audio_chunk]
+            )
+            
+            assert texts == ["first", "", "second"]
+            assert mock_client.audio.transcriptions.create.await_count == 2
+            mock_async_openai.assert_called_once()
+    
+    def test_local_whisper_transcribes_without_api(self, test_config, mock_sounddevice, sample_audio_chunk):
+        """Test use_local_whisper loads an int8 model and skips the API"""
+        test_config.use_local_whisper = True
+        fake_module = MagicMock()
+        model = fake_module.WhisperModel.return_value
+        model.transcribe.return_value = ([Mock(text=" hello"), Mock(text=" world ")], None)
+        
+        with patch.dict(sys.modules, {'faster_whisper': fake_module}), \
+             patch('src.voice_input.OpenAI') as mock_openai:
+            voice_input = VoiceInput(test_config)
+            text = voice_input.transcribe(sample_audio_chunk)
+        
+        assert text == "hello world"
+        fake_module.WhisperModel.assert_called_once_with(
+            test_config.local_whisper_model_size, compute_type="int8"
+        )
+        samples = model.transcribe.call_args.args[0]
+        assert samples.dtype == np.float32 and samples.ndim == 1
+        mock_openai.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_local_whisper_async(self, test_config, mock_sounddevice, sample_audio_chunk):
+        """Test async transcription also uses the local model"""
+        test_config.use_local_whisper = True
+        fake_module = MagicMock()
+        fake_module.WhisperModel.return_value.transcribe.return_value = ([Mock(text="hi")], None)
+        
+        with patch.dict(sys.modules, {'faster_whisper': fake_module}), \
+             patch('src.voice_input.AsyncOpenAI') as mock_async_openai:
+            voice_input = VoiceInput(test_config)
+            assert await voice_input.transcribe_async(sample_audio_chunk) == "hi"
+        
+        mock_async_openai.assert_not_called()
+    
+    def test_local_whisper_missing_falls_back_to_api(self, test_config, mock_sounddevice):
+        """Test a missing faster-whisper package leaves the API path in place"""
+        test_config.use_local_whisper = True
+        
+        with patch.dict(sys.modules, {'faster_whisper': None}):
+            voice_input = VoiceInput(test_config)
+        
+        assert voice_input.local_model is None
+    
     @pytest.mark.asyncio
     async def test_transcribe_async_empty(self, test_config, mock_sounddevice):
         """Test async transcription with empty audio"""
@@ -171,6 +273,96 @@ class TestVoiceInput:
             assert len(wav_bytes) > 0
             assert wav_bytes[:4] == b'RIFF'
     
+    def test_numpy_to_wav_pcm_samples(self, test_config, mock_sounddevice):
+        """Test samples are scaled to 16-bit PCM"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_input = VoiceInput(test_config)
+            audio = np.array([0.0, 0.5, -0.5, 1.0, -1.0], dtype=np.float64)
+            
+            wav_bytes = voice_input._numpy_to_wav(audio)
+            
+            with wave.open(io.BytesIO(wav_bytes), 'rb') as wav_file:
+                samples = np.frombuffer(wav_file.readframes(5), dtype=np.int16)
+            assert samples.tolist() == [0, 16383, -16383, 32767, -32767]
+    
+    @pytest.mark.asyncio
+    async def test_transcribe_skips_silent_audio(self, test_config, mock_sounddevice):
+        """Test near-silent captures never reach the API"""
+        with patch('src.voice_input.OpenAI') as mock_openai, \
+             patch('src.voice_input.AsyncOpenAI') as mock_async_openai:
+            voice_input = VoiceInput(test_config)
+            silence = np.full(1000, 1e-5, dtype=np.float32)
+            
+            assert voice_input.transcribe(silence) == ""
+            assert await voice_input.transcribe_async(silence) == ""
+        
+        mock_openai.assert_not_called()
+        mock_async_openai.assert_not_called()
+    
+    def test_transcribe_downmixes_and_downsamples(self, test_config, mock_sounddevice):
+        """Test 48 kHz stereo audio is uploaded as 16 kHz mono"""
+        test_config.mic_sample_rate = 48000
+        test_config.mic_channels = 2
+        
+        with patch('src.voice_input.OpenAI') as mock_openai:
+            mock_client = Mock()
+            mock_openai.return_value = mock_client
+            mock_client.audio.transcriptions.create.return_value = "ok"
+            
+            voice_input = VoiceInput(test_config)
+            frames = np.tile(np.array([[0.2, 0.6]], dtype=np.float32), (48000, 1))
+            
+            assert voice_input.transcribe(frames.ravel()) == "ok"
+            
+            audio_file = mock_client.audio.transcriptions.create.call_args.kwargs['file']
+            with wave.open(io.BytesIO(audio_file.getvalue()), 'rb') as wav_file:
+                assert wav_file.getframerate() == 16000
+                assert wav_file.getnchannels() == 1
+                samples = np.frombuffer(wav_file.readframes(16000), dtype=np.int16)
+            assert len(samples) == 16000
+            assert np.all(samples == int(np.float32(0.4) * 32767))
+    
+    @pytest.mark.asyncio
+    async def test_transcribe_ragged_and_tiny_clips(self, test_config, mock_sounddevice):
+        """Test partial frames are dropped and clips that resample to nothing are skipped"""
+        test_config.mic_sample_rate = 48000
+        test_config.mic_channels = 2
+        
+        with patch('src.voice_input.OpenAI') as mock_openai, \
+             patch('src.voice_input.AsyncOpenAI') as mock_async_openai:
+            voice_input = VoiceInput(test_config)
+            
+            # Odd-length stereo buffer: the trailing half frame is dropped
+            audio = voice_input._to_whisper_format(np.full(7, 0.5, dtype=np.float32))
+            assert len(audio) == 1
+            
+            # Fewer frames than the decimation factor
+            tiny = np.full(3, 0.5, dtype=np.float32)
+            assert voice_input.transcribe(tiny) == ""
+            assert await voice_input.transcribe_async(tiny) == ""
+        
+        mock_openai.assert_not_called()
+        mock_async_openai.assert_not_called()
+    
+    def test_to_whisper_format_interpolates_fractional_rates(self, test_config, mock_sounddevice):
+        """Test non-integer rate ratios are resampled by interpolation"""
+        test_config.mic_sample_rate = 44100
+        voice_input = VoiceInput(test_config)
+        
+        audio = voice_input._to_whisper_format(np.linspace(0, 1, 44100))
+        
+        assert audio.dtype == np.float32
+        assert len(audio) == 16000
+        assert np.all(np.diff(audio) > 0)
+    
+    def test_to_whisper_format_passthrough(self, test_config, mock_sounddevice, sample_audio_chunk):
+        """Test 16 kHz mono audio is passed through unchanged"""
+        voice_input = VoiceInput(test_config)
+        
+        audio = voice_input._to_whisper_format(sample_audio_chunk)
+        
+        np.testing.assert_array_equal(audio, sample_audio_chunk.astype(np.float32))
+    
     def test_wait_for_wake_word_no_detector(self, test_config, mock_sounddevice):
         """Test wake word waiting with no detector"""
         test_config.enable_wake_word = False
@@ -181,6 +373,69 @@ class TestVoiceInput:
             result = voice_input.wait_for_wake_word()
             assert result is True
     
+    def test_wait_for_wake_word_streams_sliding_window(self, test_config, mock_sounddevice):
+        """Test the detector sees a sliding window of blocks from one stream"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_input = VoiceInput(test_config)
+            voice_input.wake_word_detector = Mock()
+            voice_input.wake_word_detector.detect.side_effect = [False] * 5 + [True]
+            
+            block_size = int(voice_input.sample_rate * 0.25)
+            streams = []
+            stored_callback = [None]
+            
+            class MockInputStream:
+                def __init__(self, callback, **kwargs):
+                    stored_callback[0] = callback
+                    streams.append(kwargs)
+                
+                def __enter__(self):
+                    return self
+                
+                def __exit__(self, *args):
+                    pass
+            
+            def mock_sleep(ms):
+                block = np.full((block_size, 1), len(mock_sleep.calls), dtype=np.float32)
+                mock_sleep.calls.append(ms)
+                stored_callback[0](block, block_size, None, None)
+            mock_sleep.calls = []
+            
+            with patch('src.voice_input.sd.InputStream', MockInputStream):
+                with patch('src.voice_input.sd.sleep', side_effect=mock_sleep):
+                    assert voice_input.wait_for_wake_word() is True
+            
+            assert len(streams) == 1
+            assert streams[0]['blocksize'] == block_size
+            windows = [c.args[0] for c in voice_input.wake_word_detector.detect.call_args_list]
+            assert [len(w) for w in windows] == [block_size * n for n in (1, 2, 3, 4, 4, 4)]
+            assert windows[-1][0] == 2 and windows[-1][-1] == 5
+    
+    def test_wait_for_wake_word_timeout(self, test_config, mock_sounddevice):
+        """Test wake word waiting gives up after the timeout"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_input = VoiceInput(test_config)
+            voice_input.wake_word_detector = Mock()
+            voice_input.wake_word_detector.detect.return_value = False
+            
+            with patch('src.voice_input.sd.sleep'), \
+                 patch('src.voice_input.time.monotonic', side_effect=[0.0, 0.5, 1.5]):
+                assert voice_input.wait_for_wake_word(timeout=1.0) is False
+            
+            voice_input.wake_word_detector.detect.assert_not_called()
+    
+    def test_wait_for_wake_word_stop_event(self, test_config, mock_sounddevice):
+        """Test wake word waiting ends when the stop event is set"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_input = VoiceInput(test_config)
+            voice_input.wake_word_detector = Mock()
+            stop = threading.Event()
+            
+            with patch('src.voice_input.sd.sleep', side_effect=lambda ms: stop.set()):
+                assert voice_input.wait_for_wake_word(stop_event=stop) is False
+            
+            voice_input.wake_word_detector.detect.assert_not_called()
+    
     def test_cleanup(self, test_config, mock_sounddevice):
         """Test cleanup"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -286,6 +541,108 @@ class TestVoiceInputEdgeCases:
                     assert isinstance(audio, np.ndarray)
                     assert len(audio) > 0  # Should have captured some audio
     
+    def test_record_until_silence_resets_on_loud_blocks(self, test_config, mock_sounddevice):
+        """Test loud blocks of any size reset the silence count"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_input = VoiceInput(test_config)
+            silence_blocks = int(
+                voice_input.silence_duration * voice_input.sample_rate / voice_input.chunk_size
+            )
+            
+            blocks = (
+                [np.full((1024, 1), 0.5, dtype=np.float32)] * 3
+                + [np.full((512, 1), -0.5, dtype=np.float32)] * 2
+            )
+            stored_callback = [None]
+            
+            class MockInputStream:
+                def __init__(self, callback, **kwargs):
+                    stored_callback[0] = callback
+                
+                def __enter__(self):
+                    return self
+                
+                def __exit__(self, *args):
+                    pass
+            
+            def mock_sleep(ms):
+                block = blocks.pop(0) if blocks else np.zeros((1024, 1), dtype=np.float32)
+                stored_callback[0](block, len(block), None, None)
+            
+            with patch('src.voice_input.sd.InputStream', MockInputStream):
+                with patch('src.voice_input.sd.sleep', side_effect=mock_sleep):
+                    audio = voice_input._record_until_silence()
+            
+            assert len(audio) == 3 * 1024 + 2 * 512 + silence_blocks * 1024
+    
+    def test_record_until_silence_grows_buffer(self, test_config, mock_sounddevice):
+        """Test recordings longer than the initial buffer keep every block in order"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_input = VoiceInput(test_config)
+            
+            loud = [np.full((1024, 1), 0.1 * (i + 1), dtype=np.float32) for i in range(5)]
+            blocks = list(loud)
+            stored_callback = [None]
+            
+            class MockInputStream:
+                def __init__(self, callback, **kwargs):
+                    stored_callback[0] = callback
+                
+                def __enter__(self):
+                    return self
+                
+                def __exit__(self, *args):
+                    pass
+            
+            def mock_sleep(ms):
+                block = blocks.pop(0) if blocks else np.zeros((1024, 1), dtype=np.float32)
+                stored_callback[0](block, len(block), None, None)
+            
+            # Initial buffer holds fewer samples than a single block
+            with patch('src.voice_input.RECORD_BUFFER_SECONDS', 0.01), \
+                 patch('src.voice_input.sd.InputStream', MockInputStream), \
+                 patch('src.voice_input.sd.sleep', side_effect=mock_sleep):
+                audio = voice_input._record_until_silence()
+            
+            np.testing.assert_array_equal(audio[:5 * 1024], np.concatenate(loud).ravel())
+            assert not audio[5 * 1024:].any()
+    
+    def test_record_until_silence_scores_batched_blocks(self, test_config, mock_sounddevice):
+        """Test several blocks per poll are scored together, trailing quiet counted"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_input = VoiceInput(test_config)
+            silence_blocks = int(
+                voice_input.silence_duration * voice_input.sample_rate / voice_input.chunk_size
+            )
+            
+            quiet = np.zeros((1024, 1), dtype=np.float32)
+            loud = np.full((1024, 1), 0.5, dtype=np.float32)
+            blocks = [quiet, loud, quiet] * 4
+            stored_callback = [None]
+            
+            class MockInputStream:
+                def __init__(self, callback, **kwargs):
+                    stored_callback[0] = callback
+                
+                def __enter__(self):
+                    return self
+                
+                def __exit__(self, *args):
+                    pass
+            
+            def mock_sleep(ms):
+                for _ in range(3):
+                    block = blocks.pop(0) if blocks else quiet
+                    stored_callback[0](block, len(block), None, None)
+            
+            with patch('src.voice_input.sd.InputStream', MockInputStream):
+                with patch('src.voice_input.sd.sleep', side_effect=mock_sleep):
+                    audio = voice_input._record_until_silence()
+            
+            # Stops on the first poll with enough quiet chunks after the last loud one
+            polls = -(-(11 + silence_blocks) // 3)
+            assert len(audio) == polls * 3 * 1024
+    
     def test_record_until_silence_with_audio_warnings(self, test_config, mock_sounddevice):
         """Test _record_until_silence handles audio callback warnings"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -3,44 +3,38 @@ Unit tests for Voice Output
 Tests text-to-speech synthesis, audio playback, and caching
 """
 
+import asyncio
 import pytest
 import numpy as np
 import io
 import sys
+import wave
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock, AsyncMock, mock_open
 
-# Mock pydub before importing voice_output (Python 3.14 compatibility)
-sys.modules['pydub'] = MagicMock()
-sys.modules['pydub.AudioSegment'] = MagicMock()
-
 from src.voice_output import VoiceOutput
 
+pytestmark = pytest.mark.usefixtures("no_ffmpeg")
+
 
 @pytest.fixture
-def mock_sounddevice():
+def mock_sounddevice(playback_stream):
     """Mock sounddevice module"""
     with patch('src.voice_output.sd') as mock_sd:
         mock_sd.query_devices.return_value = [
             {'name': 'Default Speaker', 'max_output_channels': 2}
         ]
-        mock_sd.play = Mock()
-        mock_sd.wait = Mock()
+        mock_sd.OutputStream = playback_stream
         yield mock_sd
 
 
 @pytest.fixture
-def mock_audio_segment():
-    """Mock AudioSegment"""
-    with patch('src.voice_output.AudioSegment') as mock_segment:
-        mock_audio = Mock()
-        mock_audio.get_array_of_samples.return_value = np.random.randint(
-            -32768, 32767, 1000, dtype=np.int16  # Reduced from 16000 to 1000
-        )
-        mock_audio.sample_width = 2  # 16-bit
-        mock_audio.channels = 1  # Mono
-        mock_segment.from_mp3.return_value = mock_audio
-        yield mock_segment
+def mock_soundfile():
+    """Mock soundfile"""
+    with patch('src.voice_output.sf') as mock_sf:
+        samples = np.random.uniform(-1, 1, 1000).astype(np.float32)
+        mock_sf.read.return_value = (samples, 24000)
+        yield mock_sf
 
 
 @pytest.fixture
@@ -63,6 +57,40 @@ class TestVoiceOutput:
             assert voice_output.tts_speed == test_config.tts_speed
             assert isinstance(voice_output.audio_cache, dict)
     
+    def test_clients_created_on_first_use(self, test_config, mock_sounddevice):
+        """Test OpenAI clients are built lazily, the async one on a pooled connection"""
+        pool = Mock()
+        
+        with patch('src.voice_output.OpenAI') as mock_openai, \
+             patch('src.voice_output.AsyncOpenAI') as mock_async_openai, \
+             patch('src.voice_output.build_http_client', return_value=pool):
+            voice_output = VoiceOutput(test_config)
+            mock_openai.assert_not_called()
+            mock_async_openai.assert_not_called()
+            
+            assert voice_output.async_client is voice_output.async_client
+        
+        mock_openai.assert_not_called()
+        mock_async_openai.assert_called_once_with(
+            api_key=test_config.openai_api_key, http_client=pool
+        )
+    
+    @pytest.mark.asyncio
+    async def test_aclose_closes_pool(self, test_config, mock_sounddevice):
+        """Test aclose closes the pooled connections once the async client exists"""
+        pool = AsyncMock()
+        
+        with patch('src.voice_output.AsyncOpenAI'), \
+             patch('src.voice_output.build_http_client', return_value=pool):
+            voice_output = VoiceOutput(test_config)
+            await voice_output.aclose()
+            pool.aclose.assert_not_awaited()
+            
+            voice_output.async_client
+            await voice_output.aclose()
+        
+        pool.aclose.assert_awaited_once()
+    
     def test_is_ready_success(self, test_config, mock_sounddevice):
         """Test is_ready when devices available"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -71,6 +99,19 @@ class TestVoiceOutput:
             assert voice_output.is_ready() is True
             mock_sounddevice.query_devices.assert_called()
     
+    def test_is_ready_caches_success(self, test_config, mock_sounddevice):
+        """Test devices are enumerated once until the cache is invalidated"""
+        voice_output = VoiceOutput(test_config)
+        
+        assert voice_output.is_ready() is True
+        assert voice_output.is_ready() is True
+        assert mock_sounddevice.query_devices.call_count == 1
+        
+        voice_output.invalidate_device_cache()
+        mock_sounddevice.query_devices.return_value = []
+        assert voice_output.is_ready() is False
+        assert mock_sounddevice.query_devices.call_count == 2
+    
     def test_is_ready_failure(self, test_config):
         """Test is_ready when no devices available"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -88,9 +129,9 @@ class TestVoiceOutput:
             voice_output.speak("")
             voice_output.speak("   ")
             
-            mock_sounddevice.play.assert_not_called()
+            assert mock_sounddevice.OutputStream.played == []
     
-    def test_speak_success(self, test_config, mock_sounddevice, mock_audio_segment, sample_mp3_bytes):
+    def test_speak_success(self, test_config, mock_sounddevice, mock_soundfile, sample_mp3_bytes):
         """Test successful speech generation and playback"""
         with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
             mock_client = Mock()
@@ -100,13 +141,45 @@ class TestVoiceOutput:
             mock_client.audio.speech.create.return_value = mock_response
             
             voice_output = VoiceOutput(test_config)
-            voice_output.speak("Hello world", use_cache=False)
+            voice_output.speak("Hello world")
             
             mock_client.audio.speech.create.assert_called_once()
-            mock_sounddevice.play.assert_called_once()
-            mock_sounddevice.wait.assert_called_once()
+            assert len(mock_sounddevice.OutputStream.played) == 1
+    
+    def test_speak_requests_pcm_at_native_rate(self, test_config, mock_sounddevice, mock_soundfile):
+        """Test speech is requested as PCM and played at the TTS rate without MP3 decoding"""
+        pcm = np.array([0, 16384, -16384, -32768], dtype=np.int16).tobytes()
+        
+        with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
+            mock_client = Mock()
+            mock_openai.return_value = mock_client
+            mock_client.audio.speech.create.return_value = Mock(content=pcm)
+            
+            voice_output = VoiceOutput(test_config)
+            voice_output.speak("Hello world")
+        
+        assert mock_client.audio.speech.create.call_args.kwargs['response_format'] == 'pcm'
+        played = mock_sounddevice.OutputStream.played[-1]
+        assert played.dtype == np.int16
+        assert played.tolist() == [0, 16384, -16384, -32768]
+        assert mock_sounddevice.OutputStream.call_args.kwargs['samplerate'] == 24000
+        mock_soundfile.read.assert_not_called()
+    
+    def test_decode_wav_response(self, test_config, mock_sounddevice):
+        """Test WAV responses are parsed with the wave module"""
+        test_config.tts_response_format = "wav"
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(24000)
+            wav_file.writeframes(np.array([16384, -16384], dtype=np.int16).tobytes())
+        
+        voice_output = VoiceOutput(test_config)
+        
+        assert voice_output._decode_audio(buffer.getvalue()).tolist() == [16384, -16384]
     
-    def test_speak_with_caching(self, test_config, mock_sounddevice, mock_audio_segment, sample_mp3_bytes):
+    def test_speak_with_caching(self, test_config, mock_sounddevice, mock_soundfile, sample_mp3_bytes):
         """Test speech with caching enabled"""
         test_config.enable_caching = True
         
@@ -127,7 +200,7 @@ class TestVoiceOutput:
             
             assert len(voice_output.audio_cache) == 1
     
-    def test_speak_error_handling(self, test_config, mock_sounddevice, mock_audio_segment):
+    def test_speak_error_handling(self, test_config, mock_sounddevice, mock_soundfile):
         """Test speech error handling"""
         with patch('openai.OpenAI') as mock_openai, patch('openai.AsyncOpenAI'):
             mock_client = Mock()
@@ -138,7 +211,7 @@ class TestVoiceOutput:
             voice_output.speak("Test", use_cache=False)
     
     @pytest.mark.asyncio
-    async def test_speak_async(self, test_config, mock_sounddevice, mock_audio_segment, sample_mp3_bytes):
+    async def test_speak_async(self, test_config, mock_sounddevice, mock_soundfile, sample_mp3_bytes):
         """Test async speech generation"""
         with patch('src.voice_output.OpenAI'), patch('src.voice_output.AsyncOpenAI') as mock_async_openai:
             mock_client = AsyncMock()
@@ -148,10 +221,178 @@ class TestVoiceOutput:
             mock_client.audio.speech.create.return_value = mock_response
             
             voice_output = VoiceOutput(test_config)
-            await voice_output.speak_async("Hello async", use_cache=False)
+            await voice_output.speak_async("Hello async")
             
             mock_client.audio.speech.create.assert_called_once()
     
+    def test_speak_streams_uncached_speech(self, test_config, mock_sounddevice):
+        """Test uncached speech is streamed to the output stream chunk by chunk"""
+        chunks = [b'\x00\x01' * 2048, b'\x02\x03' * 100]
+        
+        with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
+            mock_client = MagicMock()
+            mock_openai.return_value = mock_client
+            response = mock_client.audio.speech.with_streaming_response.create.return_value.__enter__.return_value
+            response.iter_bytes.return_value = iter(chunks)
+            
+            voice_output = VoiceOutput(test_config)
+            voice_output.speak("Hello world", use_cache=False)
+        
+        create_kwargs = mock_client.audio.speech.with_streaming_response.create.call_args.kwargs
+        assert create_kwargs['response_format'] == 'pcm'
+        stream_kwargs = mock_sounddevice.OutputStream.call_args.kwargs
+        assert stream_kwargs['samplerate'] == 24000
+        assert stream_kwargs['dtype'] == 'int16'
+        assert stream_kwargs['latency'] == 'low'
+        assert stream_kwargs['callback'] == voice_output._fill_output
+        # The chunks are queued as they arrive, then an empty end marker
+        assert [audio.tobytes() for audio in mock_sounddevice.OutputStream.played] == chunks + [b'']
+        assert len(voice_output.audio_cache) == 0
+    
+    @pytest.mark.asyncio
+    async def test_speak_async_streams_long_text(self, test_config, mock_sounddevice):
+        """Test long text is streamed on the async client even when caching is requested"""
+        chunks = [b'\x00\x01' * 2048, b'\x02\x03' * 100]
+        
+        async def iter_bytes(chunk_size):
+            for chunk in chunks:
+                yield chunk
+        
+        with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI') as mock_async_openai:
+            mock_client = MagicMock()
+            mock_async_openai.return_value = mock_client
+            response = mock_client.audio.speech.with_streaming_response.create.return_value.__aenter__.return_value
+            response.iter_bytes = iter_bytes
+            
+            voice_output = VoiceOutput(test_config)
+            await voice_output.speak_async("word " * 100)
+        
+        create_kwargs = mock_client.audio.speech.with_streaming_response.create.call_args.kwargs
+        assert create_kwargs['response_format'] == 'pcm'
+        assert [audio.tobytes() for audio in mock_sounddevice.OutputStream.played] == chunks + [b'']
+        mock_client.audio.speech.create.assert_not_called()
+        # The sync client (and its connection pool) is never built
+        mock_openai.assert_not_called()
+    
+    def test_local_tts_speaks_short_phrases(self, test_config, mock_sounddevice):
+        """Test short phrases use the local Piper voice, resampled to the stream rate"""
+        test_config.use_local_tts = True
+        fake_piper = MagicMock()
+        voice = fake_piper.PiperVoice.load.return_value
+        voice.synthesize.return_value = [
+            Mock(audio_int16_array=np.full(2205, 1000, dtype=np.int16), sample_rate=22050)
+        ]
+        
+        with patch.dict(sys.modules, {'piper': fake_piper}), \
+             patch('src.voice_output.OpenAI') as mock_openai:
+            voice_output = VoiceOutput(test_config)
+            voice_output.speak("Okay", use_cache=False)
+        
+        fake_piper.PiperVoice.load.assert_called_once_with(test_config.local_tts_model)
+        played = mock_sounddevice.OutputStream.played[-1]
+        assert played.dtype == np.int16
+        assert len(played) == 2400
+        mock_openai.assert_not_called()
+    
+    def test_local_tts_fallback_on_api_error(self, test_config, mock_sounddevice):
+        """Test long text uses the API and falls back to the local voice on failure"""
+        test_config.use_local_tts = True
+        test_config.tts_response_format = "wav"
+        fake_piper = MagicMock()
+        voice = fake_piper.PiperVoice.load.return_value
+        voice.synthesize.return_value = [
+            Mock(audio_int16_array=np.array([5, 6], dtype=np.int16), sample_rate=24000)
+        ]
+        
+        with patch.dict(sys.modules, {'piper': fake_piper}), \
+             patch('src.voice_output.OpenAI') as mock_openai:
+            mock_openai.return_value.audio.speech.create.side_effect = Exception("API Error")
+            voice_output = VoiceOutput(test_config)
+            audio = voice_output._generate_speech("This sentence is longer than the local limit.")
+        
+        mock_openai.return_value.audio.speech.create.assert_called_once()
+        assert audio.tolist() == [5, 6]
+    
+    @pytest.mark.asyncio
+    async def test_local_tts_async(self, test_config, mock_sounddevice):
+        """Test async generation also routes short phrases locally"""
+        test_config.use_local_tts = True
+        fake_piper = MagicMock()
+        fake_piper.PiperVoice.load.return_value.synthesize.return_value = []
+        
+        with patch.dict(sys.modules, {'piper': fake_piper}), \
+             patch('src.voice_output.AsyncOpenAI') as mock_async_openai:
+            voice_output = VoiceOutput(test_config)
+            audio = await voice_output._generate_speech_async("Yes")
+        
+        assert len(audio) == 0
+        mock_async_openai.assert_not_called()
+    
+    def test_local_tts_missing_uses_api(self, test_config, mock_sounddevice):
+        """Test a missing piper package leaves the API path in place"""
+        test_config.use_local_tts = True
+        
+        with patch.dict(sys.modules, {'piper': None}):
+            voice_output = VoiceOutput(test_config)
+        
+        assert voice_output.local_tts is None
+        assert voice_output._should_stream("Okay", use_cache=False)
+    
+    def test_speak_buffers_when_not_pcm(self, test_config, mock_sounddevice, mock_soundfile, sample_mp3_bytes):
+        """Test non-PCM formats use the buffered path"""
+        test_config.tts_response_format = "mp3"
+        
+        with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
+            mock_client = Mock()
+            mock_openai.return_value = mock_client
+            mock_client.audio.speech.create.return_value = Mock(content=sample_mp3_bytes)
+            
+            voice_output = VoiceOutput(test_config)
+            voice_output.speak("Hello world", use_cache=False)
+        
+        mock_client.audio.speech.create.assert_called_once()
+        assert len(mock_sounddevice.OutputStream.played) == 1
+    
+    @pytest.mark.asyncio
+    async def test_chime_then_speak_overlaps_synthesis(self, test_config, mock_sounddevice):
+        """Test speech synthesis starts before the chime and plays after it"""
+        played = mock_sounddevice.OutputStream.played
+        played_at_request = []
+        pcm = np.array([16384], dtype=np.int16).tobytes()
+        
+        async def create(**kwargs):
+            played_at_request.append(len(played))
+            return Mock(content=pcm)
+        
+        with patch('src.voice_output.AsyncOpenAI') as mock_async_openai:
+            mock_client = AsyncMock()
+            mock_async_openai.return_value = mock_client
+            mock_client.audio.speech.create.side_effect = create
+            
+            voice_output = VoiceOutput(test_config)
+            await voice_output.chime_then_speak("Yes?")
+            await voice_output.chime_then_speak("Yes?")
+        
+        # The request is made before or during the chime, never after it
+        assert played_at_request[0] <= 1
+        assert ["chime" if len(audio) > 1 else "speech" for audio in played] == [
+            "chime", "speech", "chime", "speech"
+        ]
+        assert mock_client.audio.speech.create.await_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_chime_then_speak_error(self, test_config, mock_sounddevice):
+        """Test synthesis errors are logged after the chime"""
+        with patch('src.voice_output.AsyncOpenAI') as mock_async_openai:
+            mock_client = AsyncMock()
+            mock_async_openai.return_value = mock_client
+            mock_client.audio.speech.create.side_effect = Exception("API Error")
+            
+            voice_output = VoiceOutput(test_config)
+            await voice_output.chime_then_speak("Yes?")
+        
+        assert len(mock_sounddevice.OutputStream.played) == 1
+    
     @pytest.mark.asyncio
     async def test_speak_async_empty(self, test_config, mock_sounddevice):
         """Test async speak with empty text"""
@@ -166,23 +407,101 @@ class TestVoiceOutput:
             
             voice_output.play_chime("wake")
             
-            mock_sounddevice.play.assert_called_once()
-            call_args = mock_sounddevice.play.call_args
-            assert isinstance(call_args[0][0], np.ndarray)
+            assert len(mock_sounddevice.OutputStream.played) == 1
+            assert isinstance(mock_sounddevice.OutputStream.played[0], np.ndarray)
+    
+    def test_playback_reuses_output_stream(self, test_config, mock_sounddevice):
+        """Test one output stream is opened, reused and closed on cleanup"""
+        voice_output = VoiceOutput(test_config)
+        
+        voice_output.play_chime("wake")
+        voice_output._play_audio(np.array([0.5], dtype=np.float32))
+        
+        stream = voice_output._stream
+        mock_sounddevice.OutputStream.assert_called_once()
+        stream.start.assert_called_once()
+        assert len(mock_sounddevice.OutputStream.played) == 2
+        assert mock_sounddevice.OutputStream.played[-1].dtype == np.int16
+        
+        voice_output.cleanup()
+        stream.close.assert_called_once()
+    
+    def test_playback_error_reopens_stream(self, test_config, mock_sounddevice):
+        """Test a stalled stream is closed so the next playback reopens it"""
+        voice_output = VoiceOutput(test_config)
+        open_stream = mock_sounddevice.OutputStream.side_effect
+        stalled = MagicMock()
+        mock_sounddevice.OutputStream.side_effect = lambda **kwargs: stalled
+        
+        with patch('src.voice_output.PLAYBACK_TIMEOUT_MARGIN', 0.01):
+            with pytest.raises(TimeoutError):
+                voice_output.play_chime("wake")
+        
+        mock_sounddevice.OutputStream.side_effect = open_stream
+        voice_output.play_chime("wake")
+        
+        stalled.close.assert_called_once()
+        assert mock_sounddevice.OutputStream.call_count == 2
+        assert len(mock_sounddevice.OutputStream.played) == 1
+    
+    @pytest.mark.asyncio
+    async def test_play_audio_async_waits_without_thread(self, test_config, mock_sounddevice):
+        """Test async playback awaits the stream callback instead of using a worker thread"""
+        voice_output = VoiceOutput(test_config)
+        
+        with patch('src.voice_output.asyncio.to_thread') as to_thread:
+            await voice_output._play_audio_async(np.array([1, 2, 3], dtype=np.int16))
+            await voice_output.play_chime_async("success")
+        
+        to_thread.assert_not_called()
+        assert [len(audio) for audio in mock_sounddevice.OutputStream.played] == [
+            3, len(voice_output._chimes["success"])
+        ]
+        assert len(voice_output._pending_audio) == 0
+    
+    def test_fill_output_spans_entries(self, test_config):
+        """Test the stream callback continues across queued arrays and pads with silence"""
+        voice_output = VoiceOutput(test_config)
+        done = []
+        voice_output._pending_audio.append([np.array([1, 2], dtype=np.int16), 0, lambda: done.append("a")])
+        voice_output._pending_audio.append([np.array([3, 4, 5], dtype=np.int16), 0, lambda: done.append("b")])
+        
+        outdata = np.full((4, 1), 9, dtype=np.int16)
+        voice_output._fill_output(outdata, 4, None, None)
+        assert outdata[:, 0].tolist() == [1, 2, 3, 4]
+        assert done == ["a"]
+        
+        voice_output._fill_output(outdata, 4, None, None)
+        assert outdata[:, 0].tolist() == [5, 0, 0, 0]
+        assert done == ["a", "b"]
+    
+    def test_chimes_prerendered(self, test_config, mock_sounddevice):
+        """Test chimes are rendered once as int16 and reused"""
+        with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
+            voice_output = VoiceOutput(test_config)
+            
+            voice_output.play_chime("error")
+            voice_output.play_chime("error")
+            
+            first, second = mock_sounddevice.OutputStream.played
+            assert first is second is voice_output._chimes["error"]
+            assert first.dtype == np.int16
+            assert len(first) == int(0.2 * voice_output.sample_rate)
+            assert first[0] == 0 and first[-1] == 0
     
     def test_play_chime_success(self, test_config, mock_sounddevice):
         """Test playing success chime"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
             voice_output = VoiceOutput(test_config)
             voice_output.play_chime("success")
-            mock_sounddevice.play.assert_called_once()
+            assert len(mock_sounddevice.OutputStream.played) == 1
     
     def test_play_chime_error(self, test_config, mock_sounddevice):
         """Test playing error chime"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
             voice_output = VoiceOutput(test_config)
             voice_output.play_chime("error")
-            mock_sounddevice.play.assert_called_once()
+            assert len(mock_sounddevice.OutputStream.played) == 1
     
     @pytest.mark.asyncio
     async def test_play_chime_async(self, test_config, mock_sounddevice):
@@ -190,33 +509,26 @@ class TestVoiceOutput:
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
             voice_output = VoiceOutput(test_config)
             await voice_output.play_chime_async("wake")
-            mock_sounddevice.play.assert_called_once()
+            assert len(mock_sounddevice.OutputStream.played) == 1
     
     def test_mp3_to_numpy_mono(self, test_config, mock_sounddevice):
         """Test MP3 to numpy conversion - mono"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
-            with patch('src.voice_output.AudioSegment') as mock_segment:
-                mock_audio = Mock()
-                mock_audio.get_array_of_samples.return_value = np.array([100, 200, 300])
-                mock_audio.sample_width = 2
-                mock_audio.channels = 1
-                mock_segment.from_mp3.return_value = mock_audio
+            with patch('src.voice_output.sf') as mock_sf:
+                mock_sf.read.return_value = (np.array([0.1, 0.2, 0.3], dtype=np.float32), 24000)
                 
                 voice_output = VoiceOutput(test_config)
                 audio_data = voice_output._mp3_to_numpy(b'fake_mp3')
                 
                 assert isinstance(audio_data, np.ndarray)
                 assert len(audio_data) == 3
+                assert mock_sf.read.call_args.kwargs['dtype'] == 'float32'
     
     def test_mp3_to_numpy_stereo(self, test_config, mock_sounddevice):
         """Test MP3 to numpy conversion - stereo"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
-            with patch('src.voice_output.AudioSegment') as mock_segment:
-                mock_audio = Mock()
-                mock_audio.get_array_of_samples.return_value = np.array([100, 200, 300, 400])
-                mock_audio.sample_width = 2
-                mock_audio.channels = 2
-                mock_segment.from_mp3.return_value = mock_audio
+            with patch('src.voice_output.sf') as mock_sf:
+                mock_sf.read.return_value = (np.array([[0.1, 0.2], [0.3, 0.4]], dtype=np.float32), 24000)
                 
                 voice_output = VoiceOutput(test_config)
                 audio_data = voice_output._mp3_to_numpy(b'fake_mp3')
@@ -224,6 +536,84 @@ class TestVoiceOutput:
                 assert isinstance(audio_data, np.ndarray)
                 assert len(audio_data) == 2
     
+    def test_mp3_to_numpy_stereo_downmix_values(self, test_config, mock_sounddevice):
+        """Test stereo samples are averaged into float32 mono"""
+        with patch('src.voice_output.sf') as mock_sf:
+            mock_sf.read.return_value = (np.array([[0.5, 0.0], [-1.0, 1.0]], dtype=np.float32), 24000)
+            
+            voice_output = VoiceOutput(test_config)
+            audio_data = voice_output._mp3_to_numpy(b'fake_mp3')
+        
+        assert audio_data.dtype == np.float32
+        np.testing.assert_allclose(audio_data, [0.25, 0.0])
+    
+    def test_mp3_to_numpy_resamples(self, test_config, mock_sounddevice):
+        """Test MP3 audio at another rate is resampled to the playback rate"""
+        with patch('src.voice_output.sf') as mock_sf:
+            mock_sf.read.return_value = (np.zeros(12000, dtype=np.float32), 12000)
+            
+            voice_output = VoiceOutput(test_config)
+            audio_data = voice_output._mp3_to_numpy(b'fake_mp3')
+        
+        assert audio_data.dtype == np.float32
+        assert len(audio_data) == 24000
+    
+    def test_resample_polyphase_filter_designed_once(self, test_config):
+        """Test scipy resampling reuses the FIR taps designed for a source rate"""
+        fake_signal = MagicMock()
+        fake_signal.firwin.return_value = np.ones(3)
+        fake_signal.resample_poly.return_value = np.array([40000.0, -1.6])
+        
+        with patch.dict(sys.modules, {'scipy': MagicMock(signal=fake_signal), 'scipy.signal': fake_signal}):
+            voice_output = VoiceOutput(test_config)
+            samples = np.array([1, 2], dtype=np.int16)
+            first = voice_output._resample(samples, 22050)
+            voice_output._resample(samples, 22050)
+        
+        fake_signal.firwin.assert_called_once()
+        args = fake_signal.resample_poly.call_args
+        assert args.args[1:] == (160, 147)
+        assert args.kwargs['window'] is fake_signal.firwin.return_value
+        assert first.dtype == np.int16
+        assert first.tolist() == [32767, -1]
+    
+    def test_resample_without_scipy_interpolates(self, test_config):
+        """Test resampling falls back to linear interpolation without scipy"""
+        with patch.dict(sys.modules, {'scipy.signal': None}):
+            voice_output = VoiceOutput(test_config)
+            resampled = voice_output._resample(np.zeros(22050, dtype=np.float32), 22050)
+        
+        assert resampled.dtype == np.float32
+        assert len(resampled) == 24000
+        assert voice_output._resample_filters == {22050: None}
+    
+    def test_mp3_to_numpy_ffmpeg_pipe(self, test_config, mock_sounddevice):
+        """Test MP3 decoding goes through one piped ffmpeg call without soundfile"""
+        decoded = np.array([0.25, -0.5, 0.75], dtype=np.float32)
+        
+        with patch('src.voice_output.shutil.which', return_value='/usr/bin/ffmpeg'), \
+             patch('src.voice_output.subprocess.run') as mock_run, \
+             patch('src.voice_output.sf', False):
+            mock_run.return_value = Mock(stdout=decoded.tobytes())
+            
+            voice_output = VoiceOutput(test_config)
+            audio_data = voice_output._mp3_to_numpy(b'fake_mp3')
+        
+        np.testing.assert_array_equal(audio_data, decoded)
+        command = mock_run.call_args.args[0]
+        assert command[0] == '/usr/bin/ffmpeg'
+        assert command[command.index('-ar') + 1] == '24000'
+        assert command[command.index('-ac') + 1] == '1'
+        assert mock_run.call_args.kwargs['input'] == b'fake_mp3'
+    
+    def test_mp3_to_numpy_without_decoder(self, test_config, mock_sounddevice):
+        """Test MP3 decoding fails clearly with neither soundfile nor ffmpeg"""
+        with patch('src.voice_output.sf', False):
+            voice_output = VoiceOutput(test_config)
+            
+            with pytest.raises(RuntimeError, match="soundfile"):
+                voice_output._mp3_to_numpy(b'fake_mp3')
+    
     def test_clear_cache(self, test_config, mock_sounddevice):
         """Test clearing audio cache"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -238,7 +628,7 @@ class TestVoiceOutput:
             
             assert len(voice_output.audio_cache) == 0
     
-    def test_preload_phrases(self, test_config, mock_sounddevice, mock_audio_segment, sample_mp3_bytes):
+    def test_preload_phrases(self, test_config, mock_sounddevice, mock_soundfile, sample_mp3_bytes):
         """Test preloading phrases"""
         with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
             mock_client = Mock()
@@ -256,11 +646,11 @@ class TestVoiceOutput:
             assert len(voice_output.audio_cache) == 3
     
     @pytest.mark.asyncio
-    async def test_preload_phrases_async(self, test_config, mock_sounddevice, mock_audio_segment, sample_mp3_bytes):
+    async def test_preload_phrases_async(self, test_config, mock_sounddevice, mock_soundfile, sample_mp3_bytes):
         """Test async phrase preloading"""
-        with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
-            mock_client = Mock()
-            mock_openai.return_value = mock_client
+        with patch('src.voice_output.OpenAI'), patch('src.voice_output.AsyncOpenAI') as mock_async_openai:
+            mock_client = AsyncMock()
+            mock_async_openai.return_value = mock_client
             mock_response = Mock()
             mock_response.content = sample_mp3_bytes
             mock_client.audio.speech.create.return_value = mock_response
@@ -271,6 +661,33 @@ class TestVoiceOutput:
             
             assert len(voice_output.audio_cache) == 1
     
+    @pytest.mark.asyncio
+    async def test_preload_phrases_async_concurrent(self, test_config, mock_sounddevice):
+        """Test uncached phrases are synthesized concurrently and failures are skipped"""
+        in_flight = []
+        peak = [0]
+        
+        async def create(**kwargs):
+            in_flight.append(kwargs['input'])
+            peak[0] = max(peak[0], len(in_flight))
+            await asyncio.sleep(0)
+            in_flight.remove(kwargs['input'])
+            if kwargs['input'] == "bad":
+                raise Exception("TTS API Error")
+            return Mock(content=np.zeros(2, dtype=np.int16).tobytes())
+        
+        with patch('src.voice_output.OpenAI'), patch('src.voice_output.AsyncOpenAI') as mock_async_openai:
+            mock_client = AsyncMock()
+            mock_async_openai.return_value = mock_client
+            mock_client.audio.speech.create.side_effect = create
+            
+            voice_output = VoiceOutput(test_config)
+            await voice_output.preload_phrases_async(["one", "two", "bad", "one"])
+        
+        assert peak[0] == 3
+        assert mock_client.audio.speech.create.await_count == 3
+        assert len(voice_output.audio_cache) == 2
+    
     def test_get_cache_key(self, test_config, mock_sounddevice):
         """Test cache key generation"""
         with patch('openai.OpenAI'), patch('openai.AsyncOpenAI'):
@@ -283,34 +700,125 @@ class TestVoiceOutput:
             assert key1 == key2
             assert key1 != key3
     
-    def test_save_audio(self, test_config, mock_sounddevice, mock_audio_segment, sample_mp3_bytes):
+    def test_get_cache_key_uses_full_text(self, test_config, mock_sounddevice):
+        """Test phrases sharing a long prefix get distinct cache keys"""
+        voice_output = VoiceOutput(test_config)
+        prefix = "x" * 100
+        
+        assert voice_output._get_cache_key(prefix + "a") != voice_output._get_cache_key(prefix + "b")
+    
+    def test_get_cache_key_is_fixed_size_digest(self, test_config, mock_sounddevice):
+        """Test cache keys are 16-byte digests that depend on the voice"""
+        key = VoiceOutput(test_config)._get_cache_key("Hello " * 500)
+        test_config.tts_voice = "echo" if test_config.tts_voice != "echo" else "alloy"
+        
+        assert isinstance(key, bytes) and len(key) == 16
+        assert VoiceOutput(test_config)._get_cache_key("Hello " * 500) != key
+    
+    def test_get_cache_key_normalizes_unicode(self, test_config, mock_sounddevice):
+        """Test composed and decomposed spellings share a cache key"""
+        voice_output = VoiceOutput(test_config)
+        
+        assert voice_output._get_cache_key("caf\u00e9") == voice_output._get_cache_key("cafe\u0301")
+    
+    def test_audio_cache_stores_int16(self, test_config, mock_sounddevice):
+        """Test float audio is quantized to int16 when cached"""
+        voice_output = VoiceOutput(test_config)
+        
+        voice_output._cache_put("key", np.array([0.5, -2.0], dtype=np.float32))
+        
+        cached = voice_output._cache_get("key")
+        assert cached.dtype == np.int16
+        assert cached.tolist() == [16383, -32767]
+    
+    def test_audio_cache_is_bounded_lru(self, test_config, mock_sounddevice):
+        """Test the in-memory cache evicts the least recently used entry"""
+        test_config.max_audio_cache_entries = 2
+        voice_output = VoiceOutput(test_config)
+        
+        voice_output._cache_put("a", np.zeros(1, dtype=np.float32))
+        voice_output._cache_put("b", np.zeros(1, dtype=np.float32))
+        voice_output._cache_get("a")
+        voice_output._cache_put("c", np.zeros(1, dtype=np.float32))
+        
+        assert list(voice_output.audio_cache) == ["a", "c"]
+    
+    def test_disk_cache_survives_restart(self, test_config, mock_sounddevice, tmp_path):
+        """Test cached speech is reloaded from disk by a new instance"""
+        test_config.tts_disk_cache = True
+        test_config.audio_save_path = str(tmp_path)
+        pcm = np.array([16384, -16384], dtype=np.int16).tobytes()
+        
+        with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
+            mock_client = Mock()
+            mock_openai.return_value = mock_client
+            mock_client.audio.speech.create.return_value = Mock(content=pcm)
+            
+            VoiceOutput(test_config).preload_phrases(["Hello"])
+            restarted = VoiceOutput(test_config)
+            restarted.speak("Hello")
+        
+        assert mock_client.audio.speech.create.call_count == 1
+        assert mock_sounddevice.OutputStream.played[-1].tolist() == [16384, -16384]
+        assert len(list((tmp_path / "tts_cache").glob("*.s16"))) == 1
+    
+    def test_save_audio(self, test_config, mock_sounddevice, tmp_path):
         """Test saving audio to file"""
-        test_config.audio_save_path = "/tmp/audio"
+        test_config.audio_save_path = str(tmp_path / "audio")
+        pcm = np.array([0, 16384, -16384, 32767], dtype=np.int16).tobytes()
         
         with patch('src.voice_output.OpenAI') as mock_openai, patch('src.voice_output.AsyncOpenAI'):
             mock_client = Mock()
             mock_openai.return_value = mock_client
-            mock_response = Mock()
-            mock_response.content = sample_mp3_bytes
-            mock_client.audio.speech.create.return_value = mock_response
+            mock_client.audio.speech.create.return_value = Mock(content=pcm)
             
-            mock_wav_file = MagicMock()
-            mock_wav_context = MagicMock()
-            mock_wav_context.__enter__.return_value = mock_wav_file
-            mock_wav_context.__exit__.return_value = None
+            voice_output = VoiceOutput(test_config)
+            output_path = voice_output.save_audio("Test text", "test_file")
+        
+        assert isinstance(output_path, Path)
+        assert "test_file.wav" in str(output_path)
+        with wave.open(str(output_path), 'rb') as wav_file:
+            assert wav_file.getnchannels() == 1
+            assert wav_file.getsampwidth() == 2
+            assert wav_file.getframerate() == 24000
+            samples = np.frombuffer(wav_file.readframes(4), dtype=np.int16)
+        assert samples.tolist() == [0, 16384, -16384, 32767]
+    
+    def test_save_audio_does_not_import_sounddevice(self, test_config, tmp_path):
+        """Test writing speech to a file never loads the audio device library"""
+        test_config.audio_save_path = str(tmp_path)
+        
+        with patch('src.voice_output.sd', None), \
+             patch('src.voice_output._sounddevice') as load_sd:
+            voice_output = VoiceOutput(test_config)
+            with patch.object(voice_output, '_generate_speech',
+                              return_value=np.zeros(4, dtype=np.int16)):
+                voice_output.save_audio("Quiet", "quiet")
+        
+        load_sd.assert_not_called()
+    
+    def test_sounddevice_imported_on_first_use(self):
+        """Test the sounddevice accessor imports the module once and keeps it"""
+        import src.voice_output as voice_output_module
+        
+        with patch('src.voice_output.sd', None):
+            module = voice_output_module._sounddevice()
             
-            with patch('pathlib.Path.mkdir'), \
-                 patch('wave.open', return_value=mock_wav_context):
-                voice_output = VoiceOutput(test_config)
-                
-                output_path = voice_output.save_audio("Test text", "test_file")
-                
-                assert isinstance(output_path, Path)
-                assert "test_file.wav" in str(output_path)
-                mock_wav_file.setnchannels.assert_called_once_with(1)
-                mock_wav_file.setsampwidth.assert_called_once_with(2)
-                mock_wav_file.setframerate.assert_called_once()
-                mock_wav_file.writeframes.assert_called_once()
+            assert module is sys.modules['sounddevice']
+            assert voice_output_module.sd is module
+    
+    def test_save_audio_clips_loud_samples(self, test_config, mock_sounddevice, tmp_path):
+        """Test samples outside [-1, 1] are clipped instead of wrapping"""
+        test_config.audio_save_path = str(tmp_path)
+        
+        voice_output = VoiceOutput(test_config)
+        with patch.object(voice_output, '_generate_speech',
+                          return_value=np.array([1.5, -2.0], dtype=np.float32)):
+            output_path = voice_output.save_audio("Loud", "loud")
+        
+        with wave.open(str(output_path), 'rb') as wav_file:
+            samples = np.frombuffer(wav_file.readframes(2), dtype=np.int16)
+        assert samples.tolist() == [32767, -32767]
     
     def test_cleanup(self, test_config, mock_sounddevice):
         """Test cleanup"""